@@ -0,0 +1,73 @@
+# benchmarks/compare.py
+"""
+Compares two benchmark result files and flags regressions:
+
+    python -m benchmarks.compare baseline.json results.json --threshold 0.05
+
+Exits with status 1 if any configuration got slower (pages/sec or p90
+latency) or used more memory than the threshold allows.
+"""
+import argparse
+import json
+import sys
+
+# (metric, True if higher is better)
+METRICS = [
+    ("pages_per_second", True),
+    ("latency_p90", False),
+    ("peak_child_rss_mb", False),
+    ("peak_rss_mb", False),
+]
+
+
+def _runs_by_key(results):
+    return {(r["format"], r["executor"]): r for r in results["runs"]}
+
+
+def compare(baseline, current, threshold):
+    """
+    Returns a list of (key, metric, old, new, change, regressed) rows.
+    """
+    rows = []
+    base_runs = _runs_by_key(baseline)
+    for key, run in sorted(_runs_by_key(current).items()):
+        base = base_runs.get(key)
+        if base is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            old, new = base.get(metric), run.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change < -threshold if higher_is_better else change > threshold
+            rows.append((key, metric, old, new, change, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help="allowed relative change before flagging (default: 0.05)")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    regressions = 0
+    for (fmt, executor), metric, old, new, change, regressed in compare(
+            baseline, current, args.threshold):
+        flag = "REGRESSION" if regressed else ""
+        print(f"{fmt:>5}/{executor:<8} {metric:<18} {old:>10} -> {new:<10} {change:+7.1%} {flag}")
+        regressions += regressed
+    if regressions:
+        print(f"{regressions} regression(s) beyond {args.threshold:.0%}.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# benchmarks/corpus.py
+"""
+Synthetic page corpus for benchmarks. Pages are rendered from known text
+with PIL, so runs are reproducible offline and OCR output can be scored
+against the ground truth.
+"""
+import os
+import random
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# Page sizes in inches
+PAGE_SIZES = {
+    "a4": (8.27, 11.69),
+    "letter": (8.5, 11.0),
+    "receipt": (3.15, 8.0),
+}
+
+# Fraction of pixels flipped to black
+NOISE_LEVELS = {
+    "clean": 0.0,
+    "light": 0.002,
+    "heavy": 0.01,
+}
+
+WORDS = (
+    "invoice total amount due date customer account number payment terms "
+    "shipping address order quantity description unit price tax subtotal "
+    "balance reference page report summary section table figure results "
+    "analysis method sample value period quarter annual revenue cost"
+).split()
+
+FONT_POINTS = 11
+
+
+def _font(size_px):
+    for name in ("DejaVuSans.ttf", "Arial.ttf", "LiberationSans-Regular.ttf"):
+        try:
+            return ImageFont.truetype(name, size_px)
+        except OSError:
+            pass
+    try:
+        return ImageFont.load_default(size=size_px)
+    except TypeError:
+        # Pillow < 10.1 only has the small bitmap font
+        return ImageFont.load_default()
+
+
+def make_text(rng, lines, words_per_line):
+    """
+    Returns deterministic pseudo-text for one page.
+    """
+    return "\n".join(
+        " ".join(rng.choice(WORDS) for _ in range(words_per_line))
+        for _ in range(lines)
+    )
+
+
+def render_page(text, size="a4", dpi=300, noise="clean", seed=0):
+    """
+    Renders text onto a white page and returns a grayscale PIL image.
+    """
+    width_in, height_in = PAGE_SIZES[size]
+    img = Image.new("L", (int(width_in * dpi), int(height_in * dpi)), 255)
+    draw = ImageDraw.Draw(img)
+    font_px = max(8, int(FONT_POINTS * dpi / 72))
+    margin = int(0.75 * dpi)
+    y = margin
+    for line in text.splitlines():
+        draw.text((margin, y), line, fill=0, font=_font(font_px))
+        y += int(font_px * 1.6)
+
+    level = NOISE_LEVELS[noise]
+    if level:
+        rng = random.Random(seed)
+        pixels = img.load()
+        for _ in range(int(img.width * img.height * level)):
+            pixels[rng.randrange(img.width), rng.randrange(img.height)] = 0
+        img = img.filter(ImageFilter.GaussianBlur(radius=dpi / 300))
+    return img
+
+
+def build_corpus(folder, pages=4, sizes=("a4",), dpis=(300,), noises=("clean",),
+                 pdf_pages=0, seed=1234):
+    """
+    Writes PNG pages (and optionally one multi-page PDF) to folder.
+    Returns {image_path: ground_truth_text}; the PDF maps to the texts of
+    all its pages joined by form feeds.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    truth = {}
+    n = 0
+    for size in sizes:
+        for dpi in dpis:
+            for noise in noises:
+                for _ in range(pages):
+                    lines = 12 if size == "receipt" else 40
+                    words = 4 if size == "receipt" else 10
+                    text = make_text(rng, lines, words)
+                    path = os.path.join(folder, f"page_{n:04d}_{size}_{dpi}dpi_{noise}.png")
+                    render_page(text, size, dpi, noise, seed=seed + n).save(
+                        path, dpi=(dpi, dpi)
+                    )
+                    truth[path] = text
+                    n += 1
+
+    if pdf_pages:
+        texts = [make_text(rng, 40, 10) for _ in range(pdf_pages)]
+        images = [render_page(t, "a4", 200, "clean", seed=seed + i) for i, t in enumerate(texts)]
+        path = os.path.join(folder, "multipage.pdf")
+        images[0].save(path, save_all=True, append_images=images[1:], resolution=200)
+        truth[path] = "\f".join(texts)
+    return truth
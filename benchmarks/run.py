@@ -0,0 +1,204 @@
+# benchmarks/run.py
+"""
+Benchmark harness:
+
+    python -m benchmarks.run --out results.json
+    python -m benchmarks.compare baseline.json results.json
+
+Builds a synthetic corpus (see benchmarks/corpus.py), then runs the batch
+pipeline once per output format and execution mode. Each configuration
+runs in a fresh subprocess so its peak RSS is measured on its own. No
+network access is needed.
+"""
+import argparse
+import difflib
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks.corpus import NOISE_LEVELS, PAGE_SIZES, build_corpus
+
+
+def _split(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers (None if empty).
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return round(ordered[rank], 4)
+
+
+def peak_rss_mb():
+    """
+    Returns (self, children) peak resident set size in MB, or None where
+    the resource module is unavailable.
+    """
+    if resource is None:
+        return None, None
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    scale = 1 / 1024 if sys.platform != "darwin" else 1 / (1024 * 1024)
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return round(own, 1), round(children, 1)
+
+
+def word_accuracy(expected, actual):
+    """
+    Similarity of the OCR'd words to the ground truth, 0-1.
+    """
+    return difflib.SequenceMatcher(None, expected.split(), actual.split()).ratio()
+
+
+def run_one(corpus_dir, output_format, executor, workers):
+    """
+    Runs one configuration in this process and returns its measurements.
+    """
+    from ocr.pipeline import BatchProcessor
+
+    with open(os.path.join(corpus_dir, "truth.json"), encoding="utf-8") as f:
+        truth = json.load(f)
+    files = sorted(truth)
+
+    with tempfile.TemporaryDirectory(prefix="ocr_bench_out_") as out_dir:
+        processor = BatchProcessor(files, out_dir, output_format=output_format,
+                                   workers=workers, executor=executor)
+        started = time.perf_counter()
+        done = processor.run()
+        wall = time.perf_counter() - started
+
+        with open(os.path.join(out_dir, "ocr_report.json"), encoding="utf-8") as f:
+            rows = json.load(f)["pages"]
+        latencies = [
+            sum(row[stage] for stage in ("rasterize", "load", "preprocess", "ocr", "write"))
+            for row in rows if row["status"] != "error"
+        ]
+
+        accuracy = None
+        if output_format == "txt":
+            scores = []
+            for path, text in truth.items():
+                if path.endswith(".pdf"):
+                    continue
+                out = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + ".txt")
+                if os.path.exists(out):
+                    with open(out, encoding="utf-8") as f:
+                        scores.append(word_accuracy(text, f.read()))
+            accuracy = round(sum(scores) / len(scores), 4) if scores else None
+
+    own_rss, children_rss = peak_rss_mb()
+    return {
+        "format": output_format,
+        "executor": executor,
+        "workers": workers,
+        "pages": done.pages,
+        "errors": done.errors,
+        "wall_seconds": round(wall, 3),
+        "pages_per_second": round(done.pages / wall, 3) if wall > 0 else 0.0,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p90": percentile(latencies, 90),
+        "latency_p99": percentile(latencies, 99),
+        "peak_rss_mb": own_rss,
+        "peak_child_rss_mb": children_rss,
+        "word_accuracy": accuracy,
+        "stage_seconds": done.stats["stage_seconds"] if done.stats else None,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Offline OCR throughput benchmarks.")
+    parser.add_argument("--out", default="bench_results.json", help="results JSON file")
+    parser.add_argument("--formats", default="txt,hocr,pdf")
+    parser.add_argument("--executors", default="serial,thread,process")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--pages", type=int, default=4,
+                        help="pages per (size, dpi, noise) combination")
+    parser.add_argument("--sizes", default="a4,receipt", help=f"of {sorted(PAGE_SIZES)}")
+    parser.add_argument("--dpis", default="150,300")
+    parser.add_argument("--noise", default="clean,heavy", help=f"of {sorted(NOISE_LEVELS)}")
+    parser.add_argument("--pdf-pages", type=int, default=8,
+                        help="pages in the synthetic multi-page PDF (0 to skip)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--corpus", help="reuse or keep the corpus in this folder")
+    # Internal: run a single configuration and print its JSON
+    parser.add_argument("--one", nargs=2, metavar=("FORMAT", "EXECUTOR"), help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.one:
+        print(json.dumps(run_one(args.corpus, args.one[0], args.one[1], args.workers)))
+        return 0
+
+    corpus_dir = args.corpus or tempfile.mkdtemp(prefix="ocr_bench_corpus_")
+    if not os.path.exists(os.path.join(corpus_dir, "truth.json")):
+        truth = build_corpus(
+            corpus_dir,
+            pages=args.pages,
+            sizes=_split(args.sizes),
+            dpis=[int(d) for d in _split(args.dpis)],
+            noises=_split(args.noise),
+            pdf_pages=args.pdf_pages,
+            seed=args.seed,
+        )
+        with open(os.path.join(corpus_dir, "truth.json"), "w", encoding="utf-8") as f:
+            json.dump(truth, f)
+
+    runs = []
+    for output_format in _split(args.formats):
+        for executor in _split(args.executors):
+            cmd = [sys.executable, "-m", "benchmarks.run", "--corpus", corpus_dir,
+                   "--workers", str(args.workers), "--one", output_format, executor]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"{output_format}/{executor} failed:\n{proc.stderr}", file=sys.stderr)
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            runs.append(result)
+            print(f"{output_format:>5}/{executor:<8} {result['pages_per_second']:8.2f} pages/s  "
+                  f"p90 {result['latency_p90'] or 0:.3f}s  "
+                  f"rss {result['peak_child_rss_mb'] or result['peak_rss_mb']} MB")
+
+    try:
+        from ocr.engine import tesseract_version
+        version = tesseract_version()
+    except Exception:
+        version = None
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "tesseract": version,
+            "args": {k: v for k, v in vars(args).items() if k != "one"},
+        },
+        "runs": runs,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
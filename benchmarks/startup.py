@@ -0,0 +1,103 @@
+# benchmarks/startup.py
+"""
+Import-time budget for cold starts:
+
+    python -m benchmarks.startup --budget-ms 400
+
+Imports each entry point (the GUI's main window, the command line) in a
+fresh interpreter several times and compares the median with the budget.
+Also checks that none of the libraries loaded on first use (PDF, OCR and
+imaging packages) were pulled in by the import. Exits with status 1 if
+either check fails, listing the slowest imports.
+"""
+import argparse
+import importlib.util
+import json
+import statistics
+import subprocess
+import sys
+
+# Entry points imported at startup; the GUI is skipped without PySide6
+ENTRY_MODULES = ["gui.main_window", "ocr.cli"]
+
+# Must not be imported until a run needs them (see ocr.optional)
+LAZY_MODULES = ["PIL", "pytesseract", "tesserocr", "pdf2image", "PyPDF2", "numpy", "watchdog"]
+
+DEFAULT_BUDGET_MS = 400
+
+# Imports the module, then prints its import time and which lazy modules got loaded
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"ms": elapsed * 1000,
+                  "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, repeat):
+    """
+    Returns (median ms, lazy modules loaded) for importing a module in
+    `repeat` fresh interpreters.
+    """
+    times, loaded = [], set()
+    for _ in range(repeat):
+        code = _PROBE.format(module=module, lazy=LAZY_MODULES)
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                              check=True)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        times.append(result["ms"])
+        loaded.update(result["loaded"])
+    return statistics.median(times), sorted(loaded)
+
+
+def slowest_imports(module, count=10):
+    """
+    Returns the `count` slowest imports (cumulative ms, name) under a
+    module, from python -X importtime.
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[1]) / 1000, parts[2].strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup",
+                                     description="Checks cold import times against a budget.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="allowed median import time per entry point "
+                             f"(default: {DEFAULT_BUDGET_MS})")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh imports per entry point")
+    parser.add_argument("--modules", default=",".join(ENTRY_MODULES))
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for module in [m.strip() for m in args.modules.split(",") if m.strip()]:
+        if module.startswith("gui.") and importlib.util.find_spec("PySide6") is None:
+            print(f"{module:<18} skipped (PySide6 not installed)")
+            continue
+        ms, loaded = measure(module, args.repeat)
+        over = ms > args.budget_ms
+        flag = "OVER BUDGET" if over else ""
+        print(f"{module:<18} {ms:8.1f} ms  (budget {args.budget_ms:.0f} ms) {flag}")
+        if loaded:
+            print(f"{'':<18} loaded at import: {', '.join(loaded)}")
+        if over or loaded:
+            failures += 1
+            for cumulative, name in slowest_imports(module):
+                print(f"{'':<18} {cumulative:8.1f} ms  {name}")
+    if failures:
+        print(f"{failures} entry point(s) failed the startup budget.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,7 @@ import tempfile
 from pathlib import Path
 
 from PySide6.QtCore import (
-    Qt, QSettings, QThread, Signal
+    Qt, QSettings, QThread, QTimer, Signal
 )
 from PySide6.QtGui import (
     QAction, QDragEnterEvent, QDropEvent
@@ -11,11 +11,20 @@ from PySide6.QtGui import (
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QFileDialog, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QCheckBox, QMessageBox, QMenuBar,
-    QPlainTextEdit, QProgressBar, QComboBox
+    QPlainTextEdit, QProgressBar, QComboBox, QSpinBox, QInputDialog,
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
 )
 
-from gui.worker import OCRWorker
-from ocr.pdf_utils import PDF_SUPPORT, convert_from_path
+from gui.worker import LOG_VIEW_MAX_LINES, JobQueueMonitor, OCRWorker, TesseractProbe
+from ocr.autotune import AutoTuner
+from ocr.cache import DEFAULT_CACHE_MAX_BYTES, OCRCache
+from ocr.discovery import get_files_in_folder, iter_inputs
+from ocr.engine import OEM_MODES, PSM_MODES, EngineOptions, default_worker_count
+from ocr.languages import DEFAULT_LANG, split_langs
+from ocr.metrics import format_duration
+from ocr.preprocess import PreprocessOptions
+from ocr.scheduler import PRIORITIES
+from ocr.watch import FolderWatcher
 from config.settings import (
     create_qsettings
 )
@@ -23,6 +32,12 @@ from resources.theme import (
     DARK_THEME_QSS, apply_theme
 )
 
+# Full run log written to the output folder when enabled in Preferences
+LOG_FILE_NAME = "ocr_log.txt"
+
+# Columns of the job queue panel
+QUEUE_COLUMNS = ["Job", "Priority", "State", "Progress", "Pages", "Errors"]
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -67,15 +82,50 @@ class MainWindow(QMainWindow):
         row_opts = QHBoxLayout()
         self.chk_subfolders = QCheckBox("Include Subfolders")
         self.chk_concatenate = QCheckBox("Concatenate")
+        self.chk_cache = QCheckBox("Use OCR Cache")
+        self.chk_cache.setToolTip("Reuse results for pages that were already OCR'd with the same settings.")
         row_opts.addWidget(self.chk_subfolders)
         row_opts.addWidget(self.chk_concatenate)
+        self.chk_resume = QCheckBox("Resume")
+        self.chk_resume.setToolTip("Skip pages an interrupted run into the same output folder already finished.")
+        self.chk_text_layer = QCheckBox("Use PDF Text Layer")
+        self.chk_text_layer.setToolTip("Take the existing text of born-digital or already OCR'd PDF pages instead of OCRing them (TXT and PDF output).")
+        row_opts.addWidget(self.chk_cache)
+        row_opts.addWidget(self.chk_resume)
+        self.chk_only_changed = QCheckBox("Only New/Changed")
+        self.chk_only_changed.setToolTip("Skip files that haven't changed since an earlier run into the same output folder.")
+        row_opts.addWidget(self.chk_text_layer)
+        row_opts.addWidget(self.chk_only_changed)
+
+        lbl_workers = QLabel("Workers:")
+        lbl_workers.setToolTip("Number of OCR processes to run in parallel.")
+        self.spin_workers = QSpinBox()
+        self.spin_workers.setRange(1, max(64, default_worker_count()))
+        self.spin_workers.setValue(default_worker_count())
+        lbl_memory = QLabel("MB/Worker:")
+        lbl_memory.setToolTip("Memory each OCR worker may use. Larger images are OCR'd in tiles or shrunk.")
+        self.spin_memory = QSpinBox()
+        self.spin_memory.setRange(0, 1024 * 1024)
+        self.spin_memory.setSingleStep(256)
+        self.spin_memory.setSpecialValueText("Auto")
+        self.chk_autotune = QCheckBox("Autotune")
+        self.chk_autotune.setToolTip("Find how many of the workers to use, and how many Tesseract threads each, "
+                                     "for the most pages per second. Remembered for this computer.")
+        row_opts.addStretch()
+        row_opts.addWidget(lbl_workers)
+        row_opts.addWidget(self.spin_workers)
+        row_opts.addWidget(self.chk_autotune)
+        row_opts.addWidget(lbl_memory)
+        row_opts.addWidget(self.spin_memory)
         main_layout.addLayout(row_opts)
 
         # Row 4: format + concat name
         row_fmt = QHBoxLayout()
         lbl_fmt = QLabel("Output Format:")
         self.cmb_format = QComboBox()
-        self.cmb_format.addItems(["Plain Text", "HOCR (HTML)", "Searchable PDF"])
+        self.cmb_format.addItems(["Plain Text", "HOCR (HTML)", "Searchable PDF", "Word Boxes"])
+        self.cmb_format.setItemData(3, "Every word with its position and confidence, in a compact "
+                                       "columnar .words file for indexers.", Qt.ToolTipRole)
         self.cmb_format.currentIndexChanged.connect(self.on_format_change)
 
         lbl_concat = QLabel("Concatenated File Name:")
@@ -87,7 +137,60 @@ class MainWindow(QMainWindow):
         row_fmt.addWidget(self.txt_concat_file)
         main_layout.addLayout(row_fmt)
 
-        # Row 5: progress + run
+        # Row 5: preprocessing
+        row_pre = QHBoxLayout()
+        lbl_pre = QLabel("Preprocess:")
+        lbl_pre.setToolTip("Clean up images before OCR. Usually faster, and often more accurate on photos.")
+        lbl_dpi = QLabel("Max DPI:")
+        self.spin_target_dpi = QSpinBox()
+        self.spin_target_dpi.setRange(0, 1200)
+        self.spin_target_dpi.setSingleStep(50)
+        self.spin_target_dpi.setSpecialValueText("Off")
+        self.spin_target_dpi.setToolTip("Downscale images scanned above this DPI.")
+        self.chk_grayscale = QCheckBox("Grayscale")
+        lbl_binarize = QLabel("Binarize:")
+        self.cmb_binarize = QComboBox()
+        self.cmb_binarize.addItems(["Off", "Otsu", "Adaptive"])
+        self.chk_deskew = QCheckBox("Deskew")
+
+        row_pre.addWidget(lbl_pre)
+        row_pre.addWidget(lbl_dpi)
+        row_pre.addWidget(self.spin_target_dpi)
+        row_pre.addWidget(self.chk_grayscale)
+        row_pre.addWidget(lbl_binarize)
+        row_pre.addWidget(self.cmb_binarize)
+        row_pre.addWidget(self.chk_deskew)
+        row_pre.addStretch()
+        main_layout.addLayout(row_pre)
+
+        # Row 5b: Tesseract settings
+        row_engine = QHBoxLayout()
+        lbl_lang = QLabel("Language:")
+        self.txt_lang = QLineEdit()
+        self.txt_lang.setPlaceholderText(DEFAULT_LANG)
+        self.txt_lang.setToolTip("Tesseract language(s), e.g. eng+deu+fra. Every extra language makes OCR slower.")
+        lbl_psm = QLabel("PSM:")
+        self.spin_psm = QSpinBox()
+        self.spin_psm.setRange(PSM_MODES[0], PSM_MODES[-1])
+        self.spin_psm.setToolTip("Tesseract page segmentation mode (3 = automatic).")
+        lbl_oem = QLabel("OEM:")
+        self.spin_oem = QSpinBox()
+        self.spin_oem.setRange(OEM_MODES[0], OEM_MODES[-1])
+        self.spin_oem.setToolTip("Tesseract OCR engine mode (3 = default).")
+        self.chk_detect_lang = QCheckBox("Detect Language/Orientation")
+        self.chk_detect_lang.setToolTip("Quick pre-pass per page: OCR it upright, with only the listed languages it needs.")
+
+        row_engine.addWidget(lbl_lang)
+        row_engine.addWidget(self.txt_lang)
+        row_engine.addWidget(lbl_psm)
+        row_engine.addWidget(self.spin_psm)
+        row_engine.addWidget(lbl_oem)
+        row_engine.addWidget(self.spin_oem)
+        row_engine.addWidget(self.chk_detect_lang)
+        row_engine.addStretch()
+        main_layout.addLayout(row_engine)
+
+        # Row 6: progress + run
         row_run = QHBoxLayout()
         self.progress_bar = QProgressBar()
 
@@ -96,13 +199,69 @@ class MainWindow(QMainWindow):
         self.btn_run.setStyleSheet("background-color: green; color: white;")
 
         self.btn_run.clicked.connect(self.run_ocr)
+
+        self.btn_watch = QPushButton("Watch Folder")
+        self.btn_watch.setToolTip("Keep running and OCR new or modified files in the input "
+                                  "folder (or the default input folder) as they arrive.")
+        self.btn_watch.clicked.connect(self.watch_folder)
+
+        self.btn_cancel = QPushButton("Cancel")
+        self.btn_cancel.setEnabled(False)
+        self.btn_cancel.clicked.connect(self.cancel_ocr)
+
+        self.lbl_stats = QLabel("")
+        self.lbl_stats.setToolTip("Throughput and estimated time left for the current run.")
+
         row_run.addWidget(self.progress_bar)
+        row_run.addWidget(self.lbl_stats)
         row_run.addWidget(self.btn_run)
+        row_run.addWidget(self.btn_watch)
+        row_run.addWidget(self.btn_cancel)
         main_layout.addLayout(row_run)
 
+        # Row 7: job queue (several batches at once on one shared pool)
+        row_queue = QHBoxLayout()
+        lbl_priority = QLabel("Priority:")
+        self.cmb_priority = QComboBox()
+        self.cmb_priority.addItems([p.capitalize() for p in PRIORITIES])
+        self.cmb_priority.setToolTip("Higher-priority jobs get free workers first; equal ones share them.")
+        self.btn_queue = QPushButton("Add to Queue")
+        self.btn_queue.setToolTip("Run the current selection as a queued job, alongside other jobs.")
+        self.btn_queue.clicked.connect(self.add_to_queue)
+        self.btn_job_pause = QPushButton("Pause")
+        self.btn_job_pause.clicked.connect(lambda: self.control_job("pause"))
+        self.btn_job_resume = QPushButton("Resume")
+        self.btn_job_resume.clicked.connect(lambda: self.control_job("resume"))
+        self.btn_job_cancel = QPushButton("Cancel Job")
+        self.btn_job_cancel.clicked.connect(lambda: self.control_job("cancel"))
+        self.btn_job_priority = QPushButton("Set Priority")
+        self.btn_job_priority.setToolTip("Give the selected job the priority chosen on the left.")
+        self.btn_job_priority.clicked.connect(lambda: self.control_job("set_priority"))
+
+        row_queue.addWidget(lbl_priority)
+        row_queue.addWidget(self.cmb_priority)
+        row_queue.addWidget(self.btn_queue)
+        row_queue.addStretch()
+        row_queue.addWidget(self.btn_job_pause)
+        row_queue.addWidget(self.btn_job_resume)
+        row_queue.addWidget(self.btn_job_cancel)
+        row_queue.addWidget(self.btn_job_priority)
+        main_layout.addLayout(row_queue)
+
+        self.table_jobs = QTableWidget(0, len(QUEUE_COLUMNS))
+        self.table_jobs.setHorizontalHeaderLabels(QUEUE_COLUMNS)
+        self.table_jobs.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table_jobs.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table_jobs.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table_jobs.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table_jobs.setMaximumHeight(140)
+        main_layout.addWidget(self.table_jobs)
+
         # Logging area
         self.log_area = QPlainTextEdit()
         self.log_area.setReadOnly(True)
+        # Oldest lines are dropped; the full log can go to a file instead
+        self.log_area.setMaximumBlockCount(LOG_VIEW_MAX_LINES)
         main_layout.addWidget(self.log_area)
 
         # Menus
@@ -121,6 +280,13 @@ class MainWindow(QMainWindow):
         self.apply_saved_theme()
 
         self.ocr_thread = None
+        self.watcher = None
+        self.job_monitor = None  # created with the first queued job
+
+        # Tesseract is probed once the event loop runs, i.e. after the
+        # window is shown
+        self.tesseract_probe = None
+        QTimer.singleShot(0, self.probe_tesseract)
 
     def create_menus(self):
         menubar = QMenuBar(self)
@@ -138,6 +304,23 @@ class MainWindow(QMainWindow):
         act_default_output.triggered.connect(self.set_default_output_folder)
         self.menu_preferences.addAction(act_default_output)
 
+        # OCR cache
+        act_cache_size = QAction("Set OCR Cache Size...", self)
+        act_cache_size.triggered.connect(self.set_cache_size)
+        self.menu_preferences.addAction(act_cache_size)
+
+        act_clear_cache = QAction("Clear OCR Cache", self)
+        act_clear_cache.triggered.connect(self.clear_cache)
+        self.menu_preferences.addAction(act_clear_cache)
+
+        # Full log file
+        self.save_log_action = QAction(f"Save Full Log to Output Folder ({LOG_FILE_NAME})",
+                                       self, checkable=True)
+        self.save_log_action.setChecked(self.settings.value("save_full_log", False, type=bool))
+        self.save_log_action.toggled.connect(
+            lambda checked: self.settings.setValue("save_full_log", checked))
+        self.menu_preferences.addAction(self.save_log_action)
+
         # Theme menu
         self.menu_theme = self.menu_preferences.addMenu("Theme")
 
@@ -173,6 +356,45 @@ class MainWindow(QMainWindow):
             self.settings.setValue("default_output_folder", default_out)
             QMessageBox.information(self, "Saved", f"Default output folder set to:\n{default_out}")
 
+    def probe_tesseract(self):
+        self.tesseract_probe = TesseractProbe(self)
+        self.tesseract_probe.found_signal.connect(self.tesseract_found)
+        self.tesseract_probe.missing_signal.connect(self.tesseract_missing)
+        self.tesseract_probe.start()
+
+    def tesseract_found(self, version, languages):
+        if languages is None:
+            self.log(f"Tesseract {version} found.")
+            return
+        self.log(f"Tesseract {version} found ({len(languages)} language(s) installed).")
+        lang = self.txt_lang.text().strip() or DEFAULT_LANG
+        missing = [part for part in split_langs(lang) if part not in languages]
+        if missing:
+            self.log(f"Tesseract language data not installed: {', '.join(missing)}")
+
+    def tesseract_missing(self, error):
+        self.log(f"Tesseract not found ({error}). Install it, or set TESSERACT_CMD to "
+                 "the tesseract executable, before running OCR.")
+
+    def create_cache(self):
+        max_mb = self.settings.value("cache_max_mb", DEFAULT_CACHE_MAX_BYTES // (1024 * 1024), type=int)
+        return OCRCache(max_bytes=max_mb * 1024 * 1024)
+
+    def set_cache_size(self):
+        current = self.settings.value("cache_max_mb", DEFAULT_CACHE_MAX_BYTES // (1024 * 1024), type=int)
+        max_mb, ok = QInputDialog.getInt(
+            self, "OCR Cache Size", "Maximum cache size (MB):", current, 1, 1024 * 1024
+        )
+        if ok:
+            self.settings.setValue("cache_max_mb", max_mb)
+
+    def clear_cache(self):
+        if self.ocr_thread is not None and self.ocr_thread.isRunning():
+            QMessageBox.warning(self, "OCR Running", "Wait for the current run to finish first.")
+            return
+        removed = self.create_cache().clear()
+        QMessageBox.information(self, "Cache Cleared", f"Removed {removed} cached result(s).")
+
     def set_theme(self, theme: str):
         for a in [self.light_action, self.dark_action, self.system_action]:
             a.setChecked(False)
@@ -197,7 +419,8 @@ class MainWindow(QMainWindow):
         info = (
             "<h2>OCR Bulk Processor</h2>"
             "<p>This application streamlines OCR for multiple images or PDFs, "
-            "with an option to produce plain text, HOCR (HTML), or multi-page searchable PDF.</p>"
+            "with an option to produce plain text, HOCR (HTML), multi-page searchable PDF, "
+            "or word boxes with positions and confidences.</p>"
             "<p>Features include:</p>"
             "<ul>"
             "<li>Easy drag-and-drop support</li>"
@@ -217,12 +440,49 @@ class MainWindow(QMainWindow):
         last_concat = self.settings.value("last_concat_state", False, type=bool)
         last_concat_file = self.settings.value("last_concat_file", "all_ocr_results.txt")
         last_format = self.settings.value("last_format", "Plain Text")
+        last_cache = self.settings.value("last_use_cache", True, type=bool)
+        last_resume = self.settings.value("last_resume", False, type=bool)
+        last_text_layer = self.settings.value("last_use_text_layer", True, type=bool)
+        last_only_changed = self.settings.value("last_only_changed", False, type=bool)
+        last_target_dpi = self.settings.value("last_target_dpi", 0, type=int)
+        last_grayscale = self.settings.value("last_grayscale", False, type=bool)
+        last_binarize = self.settings.value("last_binarize", "Off")
+        last_deskew = self.settings.value("last_deskew", False, type=bool)
+        last_lang = self.settings.value("last_lang", DEFAULT_LANG)
+        last_psm = self.settings.value("last_psm", 3, type=int)
+        last_oem = self.settings.value("last_oem", 3, type=int)
+        last_detect_lang = self.settings.value("last_detect_lang", False, type=bool)
+        last_workers = self.settings.value("last_workers", default_worker_count(), type=int)
+        last_memory = self.settings.value("last_memory_budget_mb", 0, type=int)
+        last_autotune = self.settings.value("last_autotune", False, type=bool)
+        last_priority = self.settings.value("last_priority", "Normal")
 
         self.txt_input.setText(last_in)
         self.txt_output.setText(last_out)
         self.chk_subfolders.setChecked(last_sub)
         self.chk_concatenate.setChecked(last_concat)
         self.txt_concat_file.setText(last_concat_file)
+        self.spin_workers.setValue(last_workers)
+        self.spin_memory.setValue(last_memory)
+        self.chk_autotune.setChecked(last_autotune)
+        self.chk_cache.setChecked(last_cache)
+        self.chk_resume.setChecked(last_resume)
+        self.chk_text_layer.setChecked(last_text_layer)
+        self.chk_only_changed.setChecked(last_only_changed)
+        self.spin_target_dpi.setValue(last_target_dpi)
+        self.chk_grayscale.setChecked(last_grayscale)
+        self.chk_deskew.setChecked(last_deskew)
+        self.txt_lang.setText(last_lang)
+        self.spin_psm.setValue(last_psm)
+        self.spin_oem.setValue(last_oem)
+        self.chk_detect_lang.setChecked(last_detect_lang)
+        idx_bin = self.cmb_binarize.findText(last_binarize)
+        if idx_bin >= 0:
+            self.cmb_binarize.setCurrentIndex(idx_bin)
+
+        idx_priority = self.cmb_priority.findText(last_priority)
+        if idx_priority >= 0:
+            self.cmb_priority.setCurrentIndex(idx_priority)
 
         idx = self.cmb_format.findText(last_format)
         if idx >= 0:
@@ -235,6 +495,22 @@ class MainWindow(QMainWindow):
         self.settings.setValue("last_concat_state", self.chk_concatenate.isChecked())
         self.settings.setValue("last_concat_file", self.txt_concat_file.text())
         self.settings.setValue("last_format", self.cmb_format.currentText())
+        self.settings.setValue("last_workers", self.spin_workers.value())
+        self.settings.setValue("last_memory_budget_mb", self.spin_memory.value())
+        self.settings.setValue("last_autotune", self.chk_autotune.isChecked())
+        self.settings.setValue("last_use_cache", self.chk_cache.isChecked())
+        self.settings.setValue("last_resume", self.chk_resume.isChecked())
+        self.settings.setValue("last_use_text_layer", self.chk_text_layer.isChecked())
+        self.settings.setValue("last_only_changed", self.chk_only_changed.isChecked())
+        self.settings.setValue("last_target_dpi", self.spin_target_dpi.value())
+        self.settings.setValue("last_grayscale", self.chk_grayscale.isChecked())
+        self.settings.setValue("last_binarize", self.cmb_binarize.currentText())
+        self.settings.setValue("last_deskew", self.chk_deskew.isChecked())
+        self.settings.setValue("last_lang", self.txt_lang.text().strip())
+        self.settings.setValue("last_psm", self.spin_psm.value())
+        self.settings.setValue("last_oem", self.spin_oem.value())
+        self.settings.setValue("last_detect_lang", self.chk_detect_lang.isChecked())
+        self.settings.setValue("last_priority", self.cmb_priority.currentText())
 
     def on_format_change(self):
         # Auto-set extension in the concatenated filename
@@ -247,6 +523,9 @@ class MainWindow(QMainWindow):
         elif "HOCR" in fmt:           # "HOCR (HTML)"
             if not fname.lower().endswith(".hocr"):
                 self.txt_concat_file.setText("all_ocr_results.hocr")
+        elif fmt.startswith("Word"):  # "Word Boxes"
+            if not fname.lower().endswith(".words"):
+                self.txt_concat_file.setText("all_ocr_results.words")
         else:                         # "Searchable PDF"
             if not fname.lower().endswith(".pdf"):
                 self.txt_concat_file.setText("all_ocr_results.pdf")
@@ -278,26 +557,77 @@ class MainWindow(QMainWindow):
                 existing.append(u.toLocalFile())
             self.txt_input.setText("|".join(existing))
 
-    def run_ocr(self):
+    def selected_inputs(self):
+        """
+        Returns (inputs, output_dir) for a run, falling back to the default
+        folders, or None (after warning) if the selection can't be run.
+        """
         input_str = self.txt_input.text().strip()
-        output_dir = self.txt_output.text().strip()
-        subfolders = self.chk_subfolders.isChecked()
-        do_concat = self.chk_concatenate.isChecked()
 
         # Try default input if none provided
         if not input_str:
             def_in = self.settings.value("default_input_folder", "")
             if def_in and os.path.isdir(def_in):
-                # gather images
-                file_list = self.get_files_in_folder(def_in, subfolders)
-                if not file_list:
-                    QMessageBox.warning(self, "No Images Found", "No images found in default folder.")
-                    return
-                input_str = "|".join(file_list)
+                input_str = def_in
             else:
                 QMessageBox.warning(self, "No Input", "Please select images or set a valid default folder.")
-                return
+                return None
+
+        output_dir = self.resolve_output_dir(self.txt_output.text().strip())
+        if output_dir is None:
+            return None
+
+        if self.chk_only_changed.isChecked() and self.chk_concatenate.isChecked():
+            QMessageBox.warning(self, "Only New/Changed",
+                                "Only New/Changed can't be combined with Concatenate.")
+            return None
+        return input_str.split("|"), output_dir
 
+    def run_ocr(self):
+        selected = self.selected_inputs()
+        if selected is None:
+            return
+        inputs, output_dir = selected
+        do_concat = self.chk_concatenate.isChecked()
+
+        # Folders are scanned by the worker, off the GUI thread, and files
+        # are OCR'd as soon as they are found
+        items = iter_inputs(inputs, self.chk_subfolders.isChecked())
+
+        # PDFs are passed through as-is; the worker rasterizes them lazily,
+        # page by page, so nothing heavy happens on the GUI thread.
+        self.start_worker(items, output_dir, do_concat, self.chk_only_changed.isChecked())
+
+    def watch_folder(self):
+        """
+        Keeps OCRing new or modified files in the input folder (or the
+        default input folder) as they arrive, until Cancel is pressed.
+        Files already done in an earlier run or watch are skipped.
+        """
+        folder = self.txt_input.text().strip() or self.settings.value("default_input_folder", "")
+        if not folder or not os.path.isdir(folder):
+            QMessageBox.warning(self, "No Folder",
+                                "Select a single input folder or set a valid default folder to watch.")
+            return
+        output_dir = self.resolve_output_dir(self.txt_output.text().strip())
+        if output_dir is None:
+            return
+        if self.chk_concatenate.isChecked():
+            QMessageBox.warning(self, "Watch Folder", "Watching can't be combined with Concatenate.")
+            return
+
+        self.watcher = FolderWatcher(folder, self.chk_subfolders.isChecked(), ignore=[output_dir])
+        if not self.start_worker(self.watcher.iter_ready(), output_dir, False, True,
+                                 continuous=True):
+            self.watcher = None
+            return
+        self.log(f"Watching {folder} ({self.watcher.mode}). Press Cancel to stop.")
+
+    def resolve_output_dir(self, output_dir):
+        """
+        Returns the output folder to use, falling back to the default one,
+        and creates it. Returns None (after warning) if there is none.
+        """
         # Try default output if none provided
         if not output_dir:
             def_out = self.settings.value("default_output_folder", "")
@@ -305,59 +635,51 @@ class MainWindow(QMainWindow):
                 output_dir = def_out
             else:
                 QMessageBox.warning(self, "No Output Folder", "Please select output or set a default.")
-                return
-
-        # Build final list
-        items = []
-        for it in input_str.split("|"):
-            it = it.strip()
-            if os.path.isdir(it):
-                items.extend(self.get_files_in_folder(it, subfolders))
-            else:
-                items.append(it)
-
-        if not items:
-            QMessageBox.warning(self, "No Files", "No valid images or PDFs found.")
-            return
+                return None
 
         # Ensure out dir
         Path(output_dir).mkdir(parents=True, exist_ok=True)
+        return output_dir
 
-        # Convert PDF input to images if PDF2Image installed
-        final_list = []
-        for f in items:
-            ext = os.path.splitext(f)[1].lower()
-            if ext == ".pdf":
-                if not PDF_SUPPORT:
-                    self.log("PDF support not installed; skipping " + os.path.basename(f))
-                    continue
-                # convert
-                try:
-                    pages = convert_from_path(f)
-                    for idx, im in enumerate(pages):
-                        tmp = os.path.join(output_dir, f"{os.path.basename(f)}_page_{idx}.png")
-                        im.save(tmp, "PNG")
-                        final_list.append(tmp)
-                    self.log(f"Converted {os.path.basename(f)} -> {len(pages)} image(s).")
-                except Exception as e:
-                    self.log(f"Failed to convert PDF {f}: {e}")
-            else:
-                final_list.append(f)
-
-        if not final_list:
-            QMessageBox.warning(self, "No Valid Images", "No valid images left after PDF skipping.")
-            return
-
+    def batch_options(self, do_concat, only_changed):
+        """
+        Returns the BatchProcessor options chosen in the window, apart from
+        the inputs, output folder and workers.
+        """
         # Determine format
         fmt_choice = self.cmb_format.currentText()
         if fmt_choice.startswith("Plain"):
             out_fmt = "txt"
         elif "HOCR" in fmt_choice:
             out_fmt = "hocr"
+        elif fmt_choice.startswith("Word"):
+            out_fmt = "words"
         else:
             out_fmt = "pdf"
 
-        concat_name = self.txt_concat_file.text().strip()
+        return dict(
+            concatenate=do_concat,
+            output_format=out_fmt,
+            concat_filename=self.txt_concat_file.text().strip(),
+            cache=self.create_cache() if self.chk_cache.isChecked() else None,
+            resume=self.chk_resume.isChecked(),
+            preprocess=self.preprocess_options(),
+            use_text_layer=self.chk_text_layer.isChecked(),
+            only_changed=only_changed,
+            engine_options=self.engine_options(),
+            memory_budget=self.spin_memory.value() * 1024 * 1024 or None,
+        )
+
+    def start_worker(self, items, output_dir, do_concat, only_changed, continuous=False):
+        """
+        Starts a run in the background. Returns False (after warning) if
+        the chosen options can't be used.
+        """
+        try:
+            options = self.batch_options(do_concat, only_changed)
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Settings", str(e))
+            return False
 
         # Save current settings
         self.save_settings()
@@ -365,37 +687,148 @@ class MainWindow(QMainWindow):
         # Clear log
         self.log_area.clear()
         self.progress_bar.setValue(0)
+        self.lbl_stats.setText("")
 
         # Spawn background thread
         self.ocr_thread = OCRWorker(
-            file_list=final_list,
+            file_list=items,
             output_dir=output_dir,
-            concatenate=do_concat,
-            output_format=out_fmt,
-            concat_filename=concat_name
+            workers=self.spin_workers.value(),
+            autotune=AutoTuner() if self.chk_autotune.isChecked() else None,
+            continuous=continuous,
+            log_path=os.path.join(output_dir, LOG_FILE_NAME) if self.save_log_action.isChecked() else None,
+            **options
         )
         self.ocr_thread.progress_signal.connect(self.log)
         self.ocr_thread.done_signal.connect(self.ocr_done)
         self.ocr_thread.progress_bar_signal.connect(self.progress_bar.setValue)
+        self.ocr_thread.stats_signal.connect(self.show_stats)
 
         self.btn_run.setEnabled(False)
+        self.btn_watch.setEnabled(False)
+        self.btn_cancel.setEnabled(True)
         self.ocr_thread.start()
+        return True
+
+    def add_to_queue(self):
+        """
+        Queues the current selection as a job. Jobs run alongside each
+        other (and alongside Run OCR) on one pool whose size is the
+        Workers value when the first job was added.
+        """
+        selected = self.selected_inputs()
+        if selected is None:
+            return
+        inputs, output_dir = selected
+        self.save_settings()
+
+        if self.job_monitor is None:
+            workers = self.spin_workers.value()
+            self.job_monitor = JobQueueMonitor(workers, "process" if workers > 1 else "thread", self)
+            self.job_monitor.progress_signal.connect(self.log)
+            self.job_monitor.jobs_signal.connect(self.show_jobs)
+
+        name = os.path.basename(os.path.normpath(inputs[0])) or inputs[0]
+        if len(inputs) > 1:
+            name += f" (+{len(inputs) - 1})"
+        try:
+            job = self.job_monitor.submit(
+                iter_inputs(inputs, self.chk_subfolders.isChecked()),
+                output_dir,
+                PRIORITIES[self.cmb_priority.currentIndex()],
+                name,
+                **self.batch_options(self.chk_concatenate.isChecked(),
+                                     self.chk_only_changed.isChecked())
+            )
+        except ValueError as e:
+            QMessageBox.warning(self, "Add to Queue", str(e))
+            return
+        self.log(f"Queued {job.name} as {job.id} ({PRIORITIES[job.priority]} priority).")
+
+    def show_jobs(self, snapshots):
+        selected = self.selected_job()
+        self.table_jobs.setRowCount(len(snapshots))
+        for row, job in enumerate(snapshots):
+            values = [job["name"], job["priority"].capitalize(), job["state"].capitalize(),
+                      f"{job['progress']}%", str(job["pages"]), str(job["errors"])]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col == 0:
+                    item.setData(Qt.UserRole, job["id"])
+                    item.setToolTip(job["error"] or job["output_dir"])
+                self.table_jobs.setItem(row, col, item)
+            if job["id"] == selected:
+                self.table_jobs.selectRow(row)
+
+    def selected_job(self):
+        """
+        Returns the id of the job selected in the queue panel, or None.
+        """
+        row = self.table_jobs.currentRow()
+        item = self.table_jobs.item(row, 0) if row >= 0 else None
+        return item.data(Qt.UserRole) if item is not None else None
+
+    def control_job(self, action):
+        job_id = self.selected_job()
+        if self.job_monitor is None or job_id is None:
+            QMessageBox.information(self, "Job Queue", "Select a job in the queue first.")
+            return
+        queue = self.job_monitor.queue
+        if action == "set_priority":
+            queue.set_priority(job_id, PRIORITIES[self.cmb_priority.currentIndex()])
+        else:
+            getattr(queue, action)(job_id)
+        self.job_monitor.flush()
+
+    def closeEvent(self, event):
+        # Queued jobs stop after their current pages; finished output stays
+        if self.job_monitor is not None:
+            self.job_monitor.shutdown()
+        super().closeEvent(event)
+
+    def show_stats(self, stats):
+        text = f"{stats.pages_per_second:.1f} pages/s"
+        if stats.eta_seconds is not None:
+            text += f" · ETA {format_duration(stats.eta_seconds)}"
+        self.lbl_stats.setText(text)
+        if stats.queue_depths:
+            self.lbl_stats.setToolTip("Pages waiting per stage: " + ", ".join(
+                f"{stage} {depth}" for stage, depth in stats.queue_depths.items()))
+
+    def preprocess_options(self):
+        binarize = self.cmb_binarize.currentText()
+        return PreprocessOptions(
+            target_dpi=self.spin_target_dpi.value() or None,
+            grayscale=self.chk_grayscale.isChecked(),
+            binarize=None if binarize == "Off" else binarize.lower(),
+            deskew=self.chk_deskew.isChecked(),
+        )
+
+    def engine_options(self):
+        return EngineOptions(
+            lang=self.txt_lang.text().strip() or DEFAULT_LANG,
+            psm=self.spin_psm.value(),
+            oem=self.spin_oem.value(),
+            detect=self.chk_detect_lang.isChecked(),
+        )
+
+    def cancel_ocr(self):
+        if self.ocr_thread is not None:
+            self.log("Cancelling...")
+            self.ocr_thread.cancel()
+            self.btn_cancel.setEnabled(False)
+        if self.watcher is not None:
+            self.watcher.stop()
 
     def ocr_done(self):
         self.log("All OCR tasks completed.")
+        self.watcher = None
         self.btn_run.setEnabled(True)
+        self.btn_watch.setEnabled(True)
+        self.btn_cancel.setEnabled(False)
 
     def get_files_in_folder(self, folder: str, recurse: bool):
-        exts = ["*.png", "*.jpg", "*.jpeg", "*.bmp", "*.gif", "*.tif", "*.tiff", "*.pdf"]
-        paths = []
-        p = Path(folder)
-        if recurse:
-            for e in exts:
-                paths.extend(p.rglob(e))
-        else:
-            for e in exts:
-                paths.extend(p.glob(e))
-        return [str(x) for x in sorted(paths)]
+        return get_files_in_folder(folder, recurse)
 
     def log(self, msg: str):
         self.log_area.appendPlainText(msg)
\ No newline at end of file
@@ -1,131 +1,189 @@
-from PySide6.QtCore import QThread, Signal
-import os
-import tempfile
+from collections import deque
 
-from ocr.engine import ocr_preserve_format
-from ocr.pdf_utils import PDF_MERGE_SUPPORT, merge_pdfs
-from PyPDF2 import PdfMerger  # used only if PDF_MERGE_SUPPORT is True
+from PySide6.QtCore import QObject, QThread, QTimer, Signal
+
+from ocr.engine import available_languages, tesseract_version
+from ocr.jobs import JobQueue
+from ocr.pipeline import BatchProcessor, LogEvent, ProgressEvent, StatsEvent
+
+# How often queued log lines and progress are pushed to the GUI (10 Hz)
+FLUSH_INTERVAL_MS = 100
+
+# Log lines kept for the GUI between flushes, and in the log view
+LOG_VIEW_MAX_LINES = 5000
+
+
+class TesseractProbe(QThread):
+    """
+    Looks up the Tesseract version and installed languages off the GUI
+    thread, once the window is up, so a slow or missing binary doesn't
+    hold back startup. Both are cached in ocr.engine, so the first run
+    doesn't probe again.
+    """
+    found_signal = Signal(str, object)  # version, set of languages (None if unknown)
+    missing_signal = Signal(str)        # why Tesseract couldn't be run
+
+    def run(self):
+        try:
+            version = tesseract_version()
+        except Exception as e:
+            self.missing_signal.emit(str(e) or type(e).__name__)
+            return
+        self.found_signal.emit(version, available_languages())
 
 
 class OCRWorker(QThread):
     """
-    Background worker for OCR tasks. Creates single-page outputs,
-    then merges them if needed (for PDF).
+    Background worker for OCR tasks. Thin adapter that runs an
+    ocr.pipeline.BatchProcessor on its own thread and forwards its
+    events as Qt signals.
+
+    Events are not signalled one by one: log lines, the progress percent
+    and the latest stats are queued and flushed on a GUI-thread timer, so
+    fast pages or a large pool can't flood the event loop. If log_path is
+    given, every log line is also streamed to that file.
     """
-    progress_signal = Signal(str)      # log messages to the GUI
+    progress_signal = Signal(str)      # log lines to the GUI, several joined by "\n"
     done_signal = Signal()             # emitted when all tasks complete
     progress_bar_signal = Signal(int)  # used to update progress bar
+    stats_signal = Signal(object)      # latest ocr.pipeline.StatsEvent
 
     def __init__(self, file_list, output_dir, concatenate,
-                 output_format, concat_filename):
+                 output_format, concat_filename, workers=None, cache=None,
+                 resume=False, preprocess=None, use_text_layer=True, only_changed=False,
+                 engine_options=None, memory_budget=None, autotune=None, continuous=False,
+                 log_path=None):
         super().__init__()
-        self.file_list = file_list
-        self.output_dir = output_dir
-        self.concatenate = concatenate
-        self.output_format = output_format  # "txt", "hocr", or "pdf"
-        self.concat_filename = concat_filename
-        self.cancelled = False
+        self.processor = BatchProcessor(
+            file_list,
+            output_dir,
+            concatenate=concatenate,
+            output_format=output_format,
+            concat_filename=concat_filename,
+            workers=workers,
+            cache=cache,
+            resume=resume,
+            preprocess=preprocess,
+            use_text_layer=use_text_layer,
+            only_changed=only_changed,
+            engine_options=engine_options,
+            memory_budget=memory_budget,
+            autotune=autotune,
+            continuous=continuous,
+        )
+        self.log_path = log_path
+        self._log_file = None
+
+        # Filled by the worker thread, drained by flush() on the GUI thread.
+        # Only the newest lines are kept if the GUI falls behind.
+        self._lines = deque(maxlen=LOG_VIEW_MAX_LINES)
+        self._percent = None
+        self._stats = None
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self.flush)
+        self.started.connect(self._flush_timer.start)
+        self.finished.connect(self.on_finished)
+
+    def cancel(self):
+        """
+        Stops the run after the page currently being consumed.
+        Pending pool tasks are cancelled.
+        """
+        self.processor.cancel()
+
+    def on_event(self, event):
+        if isinstance(event, LogEvent):
+            self._lines.append(event.message)
+            if self._log_file is not None:
+                self._log_file.write(event.message + "\n")
+        elif isinstance(event, ProgressEvent):
+            self._percent = event.percent
+        elif isinstance(event, StatsEvent):
+            self._stats = event
+
+    def flush(self):
+        """
+        Sends everything queued since the last flush. Runs on the GUI thread.
+        """
+        lines = []
+        while self._lines:
+            lines.append(self._lines.popleft())
+        if lines:
+            self.progress_signal.emit("\n".join(lines))
+        percent, self._percent = self._percent, None
+        if percent is not None:
+            self.progress_bar_signal.emit(percent)
+        stats, self._stats = self._stats, None
+        if stats is not None:
+            self.stats_signal.emit(stats)
+
+    def on_finished(self):
+        self._flush_timer.stop()
+        self.flush()
+        self.done_signal.emit()
 
     def run(self):
-        total_files = len(self.file_list)
-        if total_files == 0:
-            self.done_signal.emit()
-            return
-
-        # For text-based concatenation
-        text_buffer = []
-        # For HOCR/PDF concatenation
-        binary_buffer = []
-
-        # If we need to do PDF merging, store single-page PDFs in a temp folder
-        single_page_pdfs = []
-
-        for i, path in enumerate(self.file_list):
-            if self.cancelled:
-                break
-
-            filename = os.path.basename(path)
-            self.progress_bar_signal.emit(int((i + 1) / total_files * 100))
-            self.progress_signal.emit(f"Extracting from {filename}...")
-
+        if self.log_path:
             try:
-                result = ocr_preserve_format(path, self.output_format)
-            except Exception as e:
-                self.progress_signal.emit(f"ERROR on {filename}: {e}")
-                continue
-
-            self.progress_signal.emit("OCR done.")
-
-            # If not concatenating:
-            if not self.concatenate:
-                base_name, _ = os.path.splitext(filename)
-                if self.output_format == "txt":
-                    out_path = os.path.join(self.output_dir, base_name + ".txt")
-                    with open(out_path, "w", encoding="utf-8") as f:
-                        f.write(result)
-                elif self.output_format == "hocr":
-                    out_path = os.path.join(self.output_dir, base_name + ".hocr")
-                    with open(out_path, "wb") as f:
-                        f.write(result)
-                else:
-                    # single-page PDF
-                    out_path = os.path.join(self.output_dir, base_name + "_ocr.pdf")
-                    with open(out_path, "wb") as f:
-                        f.write(result)
-            else:
-                # If concatenating
-                if self.output_format == "txt":
-                    text_buffer.append(f"--- OCR from {filename} ---\n{result}\n")
-                elif self.output_format == "hocr":
-                    # HOCR is tricky to merge. We'll store each page, then write the last one.
-                    binary_buffer.append(result)
-                else:
-                    # PDF => produce a single-page PDF in a temp folder
-                    temp_dir = tempfile.gettempdir()
-                    single_page_path = os.path.join(temp_dir, f"__ocr_tmp_{i}.pdf")
-                    with open(single_page_path, "wb") as f:
-                        f.write(result)
-                    single_page_pdfs.append(single_page_path)
-
-        self.progress_bar_signal.emit(100)
-
-        if self.concatenate:
-            final_path = os.path.join(self.output_dir, self.concat_filename)
-            if self.output_format == "txt":
-                with open(final_path, "w", encoding="utf-8") as f:
-                    f.write("\n".join(text_buffer))
-                self.progress_signal.emit(f"All text combined into: {final_path}")
-
-            elif self.output_format == "hocr":
-                # We only write the last HOCR page
-                if binary_buffer:
-                    with open(final_path, "wb") as f:
-                        f.write(binary_buffer[-1])
-                    self.progress_signal.emit(
-                        f"(HOCR) Wrote only the last page to: {final_path}"
-                    )
-
-            else:
-                # PDF merging
-                if not PDF_MERGE_SUPPORT:
-                    # If PyPDF2 isn't installed, we can only write the last PDF
-                    if single_page_pdfs:
-                        last_pdf = single_page_pdfs[-1]
-                        with open(final_path, "wb") as fout, open(last_pdf, "rb") as fin:
-                            fout.write(fin.read())
-                        self.progress_signal.emit(
-                            f"No PyPDF2 installed. Wrote last PDF only -> {final_path}"
-                        )
-                else:
-                    # Merge single-page PDFs
-                    merger = PdfMerger()
-                    for pdf_page in single_page_pdfs:
-                        merger.append(pdf_page)
-                    try:
-                        merger.write(final_path)
-                        merger.close()
-                        self.progress_signal.emit(f"Merged multi-page PDF -> {final_path}")
-                    except Exception as e:
-                        self.progress_signal.emit(f"PDF merge error: {e}")
-
-        self.done_signal.emit()
+                self._log_file = open(self.log_path, "w", encoding="utf-8", buffering=1)
+            except OSError as e:
+                self._lines.append(f"Could not open log file {self.log_path}: {e}")
+        try:
+            self.processor.run(self.on_event)
+        finally:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+
+class JobQueueMonitor(QObject):
+    """
+    GUI adapter for an ocr.jobs.JobQueue: several batches run at once on
+    one shared pool, each on its own thread. Like OCRWorker, their log
+    lines are queued and flushed on a GUI-thread timer, prefixed with the
+    job's name, together with a snapshot of every job for the queue panel.
+    """
+    progress_signal = Signal(str)  # log lines to the GUI, several joined by "\n"
+    jobs_signal = Signal(object)   # list of Job.snapshot() dicts
+
+    def __init__(self, workers, executor="process", parent=None):
+        super().__init__(parent)
+        self.queue = JobQueue(workers, executor, on_event=self.on_event)
+        self._lines = deque(maxlen=LOG_VIEW_MAX_LINES)
+        self._snapshots = None
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self.flush)
+        self._flush_timer.start()
+
+    def on_event(self, job, event):
+        # Called on the job's thread
+        if isinstance(event, LogEvent):
+            self._lines.append(f"[{job.name}] {event.message}")
+
+    def submit(self, file_list, output_dir, priority, name, **options):
+        job = self.queue.submit(file_list, output_dir, priority, name, **options)
+        self.flush()
+        return job
+
+    def flush(self):
+        """
+        Sends queued log lines and the jobs' current state. Runs on the GUI thread.
+        """
+        lines = []
+        while self._lines:
+            lines.append(self._lines.popleft())
+        if lines:
+            self.progress_signal.emit("\n".join(lines))
+        snapshots = [job.snapshot() for job in self.queue.jobs()]
+        if snapshots != self._snapshots:
+            self._snapshots = snapshots
+            self.jobs_signal.emit(snapshots)
+
+    def shutdown(self):
+        """
+        Cancels all jobs, waits for them to stop and closes the pool.
+        """
+        self._flush_timer.stop()
+        self.queue.shutdown()
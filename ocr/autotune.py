@@ -0,0 +1,272 @@
+# ocr/autotune.py
+"""
+Concurrency autotuner: finds how many OCR workers, and how many OpenMP
+threads per Tesseract, give this machine the most pages per second:
+
+    processor = BatchProcessor(files, "out", workers=16, autotune=AutoTuner())
+
+The worker count is a ceiling: the pool is created that large and the
+tuner only changes how many of its workers take pages. Each setting is
+measured over a window of OCR'd pages, then its neighbours are tried
+(more or fewer workers, or half the workers with twice the threads) and
+the tuner moves to one that is clearly faster, until none is or
+MAX_TRIALS settings have been measured. The memory the run takes is
+sampled as well; settings expected to go over the RAM ceiling are
+skipped, and one that does go over is backed off at once.
+
+The result is saved per machine in the GUI's settings (when PySide6 is
+installed). Later runs start from it and only tune again if it has
+become clearly slower.
+"""
+import json
+import os
+import socket
+import time
+from dataclasses import asdict, dataclass
+
+from ocr.tiling import AUTO_BUDGET_SHARE, available_memory, total_memory
+
+# Pages measured per setting, at least; two per worker with more workers
+MIN_WINDOW_PAGES = 4
+# A neighbouring setting must be this much faster to move to it
+MIN_GAIN = 0.05
+# Settings measured per run at most, the starting one included
+MAX_TRIALS = 8
+# OpenMP threads per Tesseract that are tried
+THREAD_CHOICES = (1, 2, 4)
+# A saved setting is tuned again below this share of its saved speed
+RETUNE_BELOW = 0.75
+
+SETTINGS_GROUP = "autotune"
+
+MB = 1024 ** 2
+
+
+@dataclass(frozen=True)
+class TunePoint:
+    """
+    One concurrency setting: how many workers take pages at once, and
+    Tesseract's OpenMP threads in each.
+    """
+    workers: int
+    threads: int = 1
+
+    def describe(self):
+        return f"{self.workers} worker(s) x {self.threads} thread(s)"
+
+
+def machine_key():
+    """
+    Names this machine in the saved settings: host name, cores and RAM.
+    """
+    host = "".join(c if c.isalnum() or c in "-_" else "_" for c in socket.gethostname())
+    return f"{host or 'local'}_{os.cpu_count() or 1}cpu_{round(total_memory() / 1024 ** 3)}gb"
+
+
+def _qsettings():
+    # QSettings comes with PySide6, which headless installs may not have
+    try:
+        from config.settings import create_qsettings
+    except ImportError:
+        return None
+    return create_qsettings()
+
+
+def load_tuned(key=None):
+    """
+    Returns (TunePoint, pages per second) saved for this machine, or None.
+    """
+    settings = _qsettings()
+    if settings is None:
+        return None
+    value = settings.value(f"{SETTINGS_GROUP}/{key or machine_key()}")
+    if not value:
+        return None
+    try:
+        saved = json.loads(value)
+        point = TunePoint(int(saved["workers"]), int(saved["threads"]))
+        return point, float(saved["pages_per_second"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def save_tuned(point, pages_per_second, key=None):
+    """
+    Saves a tuned setting for this machine. Returns False if there is
+    nowhere to save it (PySide6 not installed).
+    """
+    settings = _qsettings()
+    if settings is None:
+        return False
+    value = dict(asdict(point), pages_per_second=round(pages_per_second, 3))
+    settings.setValue(f"{SETTINGS_GROUP}/{key or machine_key()}", json.dumps(value))
+    settings.sync()
+    return True
+
+
+class AutoTuner:
+    """
+    Hill-climbs over TunePoints while a batch runs. The OCR stage calls
+    start() with its pool size, then page_done() for every page OCR'd;
+    whenever either returns a TunePoint, the pool switches to it. Only
+    pages Tesseract actually ran on count (not cached or text-layer ones).
+    """
+
+    def __init__(self, memory_limit=None, window_pages=MIN_WINDOW_PAGES, max_trials=MAX_TRIALS,
+                 persist=True):
+        # Bytes the whole run may take; by default the share the memory budgets assume
+        self.memory_limit = memory_limit or int(total_memory() * AUTO_BUDGET_SHARE)
+        self.window_pages = window_pages
+        self.max_trials = max_trials
+        self.persist = persist
+        self.log = lambda message: None
+        self.max_workers = 1
+        self.cores = 1
+        self.current = self.best = TunePoint(1)
+        self.rates = {}  # TunePoint -> measured pages per second
+        self.too_big = set()
+        self.per_worker_bytes = 0
+        self.trials = 0
+        self.tuning = False
+        self._saved_rate = None
+        self._baseline = None
+        self._peak_used = 0
+        self._settle = 0
+        self._count = 0
+        self._window_start = 0.0
+
+    def start(self, max_workers):
+        """
+        Returns the TunePoint to begin with: the one saved for this machine
+        if it fits, else every worker with one thread each.
+        """
+        self.max_workers = max(1, max_workers)
+        self.cores = max(os.cpu_count() or 1, self.max_workers)
+        self.rates, self.too_big = {}, set()
+        self.per_worker_bytes = 0
+        self.trials = 0
+        self._saved_rate = None
+        # Measured before the pool starts, so later drops are the run's
+        self._baseline = available_memory()
+        point = TunePoint(self.max_workers)
+        saved = load_tuned() if self.persist else None
+        if saved is not None and self._fits(saved[0]):
+            point, self._saved_rate = saved
+            self.log(f"Autotune: starting from the saved {point.describe()} "
+                     f"({self._saved_rate:.2f} pages/s)")
+        self.best = point
+        self.tuning = True
+        # The first pages also pay for starting the worker processes
+        return self._switch(point, in_flight=point.workers)
+
+    def page_done(self, in_flight=0):
+        """
+        Records one OCR'd page; in_flight is how many pages are submitted
+        and not yet done. Returns the TunePoint to switch to, or None.
+        """
+        if not self.tuning:
+            return None
+        now = time.perf_counter()
+        used = self._memory_used()
+        if used is not None and used > self.memory_limit:
+            return self._back_off(used, in_flight)
+        if self._settle:
+            # Submitted under the previous setting
+            self._settle -= 1
+            self._window_start = now
+            return None
+        self._count += 1
+        if self._count < max(self.window_pages, self.current.workers * 2):
+            return None
+
+        rate = self._count / max(now - self._window_start, 1e-6)
+        self.rates[self.current] = rate
+        self.trials += 1
+        if self._peak_used:
+            self.per_worker_bytes = max(self.per_worker_bytes,
+                                        self._peak_used // self.current.workers)
+        self.log(f"Autotune: {self.current.describe()}: {rate:.2f} pages/s")
+        if self.current != self.best and rate > self.rates.get(self.best, 0) * (1 + MIN_GAIN):
+            self.best = self.current
+
+        if self._saved_rate is not None:
+            if rate >= self._saved_rate * RETUNE_BELOW:
+                return self._finish()
+            self.log("Autotune: the saved setting is slower than before; tuning again")
+            self._saved_rate = None
+
+        point = self._next_point()
+        if point is None or self.trials >= self.max_trials:
+            return self._finish()
+        return self._switch(point, in_flight)
+
+    def _fits(self, point):
+        return (1 <= point.workers <= self.max_workers
+                and point.threads in THREAD_CHOICES
+                and point.workers * point.threads <= self.cores
+                and point not in self.too_big
+                and self.per_worker_bytes * point.workers <= self.memory_limit)
+
+    def _next_point(self):
+        """
+        Returns the next untried neighbour of the best setting, or None.
+        """
+        workers, threads = self.best.workers, self.best.threads
+        step = max(1, workers // 4)
+        for point in (TunePoint(workers + step, threads), TunePoint(workers - step, threads),
+                      TunePoint(workers // 2, threads * 2), TunePoint(workers * 2, threads // 2)):
+            if point not in self.rates and self._fits(point):
+                return point
+        return None
+
+    def _switch(self, point, in_flight):
+        self.current = point
+        self._settle = in_flight
+        self._count = 0
+        self._peak_used = 0
+        self._window_start = time.perf_counter()
+        return point
+
+    def _memory_used(self):
+        if self._baseline is None:
+            return None
+        available = available_memory()
+        if available is None:
+            return None
+        used = max(0, self._baseline - available)
+        self._peak_used = max(self._peak_used, used)
+        return used
+
+    def _back_off(self, used, in_flight):
+        """
+        Leaves a setting that took more than the RAM ceiling for one with
+        proportionally fewer workers.
+        """
+        self.too_big.add(self.current)
+        self.per_worker_bytes = max(self.per_worker_bytes, used // self.current.workers)
+        self.log(f"Autotune: {self.current.describe()} took {used // MB} MB, over the "
+                 f"{self.memory_limit // MB} MB ceiling")
+        self._saved_rate = None
+        if self.current.workers == 1:
+            self.tuning = False
+            self.log("Autotune: already at one worker; stopped tuning")
+            return None
+        if self.current == self.best:
+            workers = int(self.current.workers * self.memory_limit / used)
+            workers = max(1, min(workers, self.current.workers - 1))
+            self.best = TunePoint(workers, self.current.threads)
+        return self._switch(self.best, in_flight)
+
+    def _finish(self):
+        """
+        Stops tuning at the best setting measured and saves it.
+        """
+        self.tuning = False
+        rate = self.rates.get(self.best)
+        if rate is None:
+            # The best is a backed-off setting that was never measured
+            return self._switch(self.best, 0) if self.best != self.current else None
+        saved = self.persist and save_tuned(self.best, rate)
+        self.log(f"Autotune: settled on {self.best.describe()} ({rate:.2f} pages/s)"
+                 + ("; saved for later runs" if saved else ""))
+        return self._switch(self.best, 0) if self.best != self.current else None
@@ -0,0 +1,148 @@
+# ocr/cache.py
+import hashlib
+import os
+import tempfile
+
+# Default upper bound for the on-disk cache (1 GiB)
+DEFAULT_CACHE_MAX_BYTES = 1024 ** 3
+
+
+def default_cache_dir():
+    """
+    Returns the per-user folder used for cached OCR results.
+    """
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "OcrBulkProcessor", "ocr_cache")
+
+
+class OCRCache:
+    """
+    Persistent, content-addressed cache of OCR results.
+
+    Entries are keyed by a SHA-256 of the image bytes plus the Tesseract
+    config, output format and Tesseract version, so a changed page or a
+    Tesseract upgrade never returns a stale result. Once the cache grows
+    beyond max_bytes, the least recently used entries are evicted.
+
+    Not safe to share between processes; the worker only touches it from
+    its own thread.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._total_bytes = None  # computed on first write
+        # Content digests by (path, size, mtime), so the pages of one
+        # multi-frame file don't re-hash it for every frame
+        self._file_digests = {}
+
+    def file_digest(self, image_path):
+        st = os.stat(image_path)
+        memo_key = (os.path.abspath(image_path), st.st_size, st.st_mtime)
+        digest = self._file_digests.get(memo_key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(image_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            digest = h.hexdigest()
+            if len(self._file_digests) > 1024:
+                self._file_digests.clear()
+            self._file_digests[memo_key] = digest
+        return digest
+
+    def key(self, image_path, output_format, config, version, frame=0):
+        """
+        Returns the cache key for one image (or one frame of it).
+        """
+        digest = hashlib.sha256(self.file_digest(image_path).encode("ascii"))
+        for part in (config, output_format, version, frame):
+            digest.update(b"\0" + str(part).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key, output_format):
+        """
+        Returns the cached result (str for "txt", bytes otherwise) or None.
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Bump the mtime so eviction is least-recently-used
+            os.utime(path)
+        except OSError:
+            return None
+        return data.decode("utf-8") if output_format == "txt" else data
+
+    def put(self, key, output_format, result):
+        """
+        Stores a result, then evicts old entries if over the size limit.
+        """
+        data = result.encode("utf-8") if output_format == "txt" else result
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        if self._total_bytes is None:
+            self._total_bytes = self.size()
+        else:
+            self._total_bytes += len(data)
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def size(self):
+        """
+        Returns the total size of all cached results in bytes.
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Deletes least recently used entries until the cache fits max_bytes.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def clear(self):
+        """
+        Deletes every cached result. Returns the number of entries removed.
+        """
+        removed = 0
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        self._total_bytes = 0
+        return removed
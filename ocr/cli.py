@@ -0,0 +1,397 @@
+# ocr/cli.py
+"""
+Headless command line entry point: python -m ocr --help
+
+Takes the same options as the GUI and drives the same pipeline, without
+importing Qt. Progress is reported on stdout as one JSON object per line:
+
+  {"event": "log", "message": "..."}
+  {"event": "progress", "percent": 42}
+  {"event": "page", "index": 0, "name": "scan.png", "output": "out/scan.txt"}
+  {"event": "error", "index": 3, "name": "bad.png", "message": "..."}
+  {"event": "stats", "pages": 41, "pages_per_second": 3.2, "eta_seconds": 12.5, "bytes": 1048576,
+   "queues": {"rasterized": 2, "ocr": 8, "write": 0}}
+  {"event": "done", "pages": 41, "errors": 1, "cancelled": false, "output": null, "stats": {...}}
+
+With --queue-dir, every event also carries the "job" it belongs to.
+With --coordinator, pages are OCR'd by `python -m ocr --worker` processes,
+possibly on other machines (see ocr.cluster).
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+
+from ocr.autotune import AutoTuner
+from ocr.cache import DEFAULT_CACHE_MAX_BYTES, OCRCache
+from ocr.cluster import (
+    DEFAULT_PORT, Coordinator, RemoteWorker, WorkerRejected, is_loopback, parse_address
+)
+from ocr.discovery import iter_inputs
+from ocr.engine import (
+    ENGINE_BACKENDS, OEM_MODES, PSM_MODES, EngineOptions, default_worker_count,
+    set_tesseract_cmd
+)
+from ocr.jobs import JobQueue, QueueDirectory
+from ocr.languages import DEFAULT_LANG
+from ocr.pipeline import (
+    EXECUTORS, BatchProcessor, DoneEvent, ErrorEvent, LogEvent, PageEvent, ProgressEvent,
+    StatsEvent
+)
+from ocr.preprocess import BINARIZE_METHODS, PreprocessOptions
+from ocr.watch import DEFAULT_SETTLE_SECONDS, FolderWatcher
+
+OUTPUT_FORMATS = ["txt", "hocr", "pdf", "words"]
+
+
+def emit(event: str, **fields):
+    """
+    Writes one machine-readable progress line to stdout.
+    """
+    fields = {"event": event, **fields}
+    sys.stdout.write(json.dumps(fields) + "\n")
+    sys.stdout.flush()
+
+
+def emit_event(event, **extra):
+    """
+    Writes a pipeline event as a progress line, with any extra fields.
+    """
+    if isinstance(event, LogEvent):
+        emit("log", message=event.message, **extra)
+    elif isinstance(event, ProgressEvent):
+        emit("progress", percent=event.percent, **extra)
+    elif isinstance(event, PageEvent):
+        emit("page", index=event.index, name=event.name, output=event.output_path, **extra)
+    elif isinstance(event, ErrorEvent):
+        emit("error", index=event.index, name=event.name, message=str(event.error), **extra)
+    elif isinstance(event, StatsEvent):
+        emit("stats", pages=event.pages, pages_per_second=round(event.pages_per_second, 3),
+             eta_seconds=None if event.eta_seconds is None else round(event.eta_seconds, 1),
+             bytes=event.bytes_processed, queues=event.queue_depths, **extra)
+    elif isinstance(event, DoneEvent):
+        emit("done", pages=event.pages, errors=event.errors,
+             cancelled=event.cancelled, output=event.output_path, stats=event.stats, **extra)
+
+
+def gui_setting(key):
+    """
+    Returns a value saved by the GUI (e.g. default_input_folder), or None
+    when it isn't set or PySide6 isn't installed.
+    """
+    try:
+        from config.settings import create_qsettings
+    except ImportError:
+        return None
+    return create_qsettings().value(key) or None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m ocr",
+        description="Batch OCR of images and PDFs without the GUI.",
+    )
+    parser.add_argument("inputs", nargs="*",
+                        help="image/PDF files or folders to process (default: the GUI's "
+                             "default input folder)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="include subfolders of input folders")
+    parser.add_argument("-o", "--output-dir",
+                        help="folder where OCR results are written (default: the GUI's "
+                             "default output folder)")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="txt",
+                        help="output format; words = word boxes and confidences in a "
+                             "columnar file (default: txt)")
+    parser.add_argument("-c", "--concatenate", action="store_true",
+                        help="combine all results into a single output file")
+    parser.add_argument("--concat-filename",
+                        help="name of the concatenated file (default: all_ocr_results.<format>)")
+    parser.add_argument("-w", "--workers", type=int, default=default_worker_count(),
+                        help="number of parallel OCR workers (default: CPU count)")
+    parser.add_argument("--executor", choices=EXECUTORS,
+                        help="where OCR runs (default: process pool if workers > 1)")
+    parser.add_argument("--engine", choices=ENGINE_BACKENDS, default="auto",
+                        help="OCR backend; auto prefers a persistent tesserocr instance "
+                             "and falls back to pytesseract (default: auto)")
+    parser.add_argument("--target-dpi", type=int,
+                        help="downscale images above this DPI before OCR")
+    parser.add_argument("--grayscale", action="store_true",
+                        help="convert images to grayscale before OCR")
+    parser.add_argument("--binarize", choices=BINARIZE_METHODS,
+                        help="binarize images before OCR")
+    parser.add_argument("--deskew", action="store_true",
+                        help="straighten skewed scans before OCR")
+    parser.add_argument("--memory-budget-mb", type=int,
+                        help="memory each OCR worker may use; larger images are OCR'd in "
+                             "tiles or shrunk (default: half the RAM split between workers)")
+    parser.add_argument("--autotune", action="store_true",
+                        help="find how many of the --workers to use, and how many Tesseract "
+                             "threads each, for the most pages per second; remembered for "
+                             "this machine when PySide6 is installed")
+    parser.add_argument("--max-memory-mb", type=int,
+                        help="with --autotune, RAM the whole run may take (default: half "
+                             "the RAM)")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip pages an earlier, interrupted run in the same output "
+                             "folder already finished")
+    parser.add_argument("--only-changed", action="store_true",
+                        help="skip inputs that are unchanged since an earlier run into the "
+                             "same output folder")
+    parser.add_argument("-l", "--lang", default=DEFAULT_LANG,
+                        help=f"Tesseract language(s), e.g. eng+deu+fra (default: {DEFAULT_LANG})")
+    parser.add_argument("--psm", type=int, choices=PSM_MODES, default=3,
+                        help="Tesseract page segmentation mode (default: 3)")
+    parser.add_argument("--oem", type=int, choices=OEM_MODES, default=3,
+                        help="Tesseract OCR engine mode (default: 3)")
+    parser.add_argument("--detect-lang", action="store_true",
+                        help="run a quick orientation/script pre-pass per page and OCR it "
+                             "with only the languages of --lang it needs")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and OCR new or modified files in the input "
+                             "folder as they arrive, until interrupted")
+    parser.add_argument("--settle-seconds", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="with --watch, how long a file must stay unchanged before "
+                             "it is picked up")
+    parser.add_argument("--queue-dir",
+                        help="run as a job queue: process every <name>.job.json dropped into "
+                             "this folder, by priority, on one shared pool of --workers")
+    parser.add_argument("--coordinator", metavar="[HOST:]PORT",
+                        help="OCR on remote workers: listen here for --worker processes and "
+                             "hand them pages; --workers is then the total number of worker "
+                             f"slots to keep busy (e.g. :{DEFAULT_PORT}). Any host but "
+                             "127.0.0.1 needs --token")
+    parser.add_argument("--worker", metavar="HOST:PORT",
+                        help="run as an OCR worker with --workers slots for the coordinator "
+                             "at HOST:PORT, until interrupted")
+    parser.add_argument("--token", default=os.environ.get("OCR_CLUSTER_TOKEN"),
+                        help="shared secret workers must present to the coordinator "
+                             "(default: $OCR_CLUSTER_TOKEN)")
+    parser.add_argument("--force-ocr", action="store_true",
+                        help="OCR every PDF page, even ones that already have a text layer")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not read or write the OCR result cache")
+    parser.add_argument("--cache-dir", help="OCR cache folder (default: per-user cache)")
+    parser.add_argument("--cache-max-mb", type=int,
+                        default=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024),
+                        help="maximum OCR cache size in MB")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="delete all cached OCR results and exit")
+    parser.add_argument("--tesseract-cmd", help="path to the tesseract executable")
+    return parser
+
+
+def processor_options(args, cache):
+    """
+    Returns the BatchProcessor options given on the command line, apart
+    from the inputs, output folder, workers and executor.
+    """
+    return dict(
+        concatenate=args.concatenate,
+        output_format=args.format,
+        concat_filename=args.concat_filename,
+        cache=None if args.no_cache else cache,
+        backend=args.engine,
+        resume=args.resume,
+        # Watching skips files an earlier run or watch already did
+        only_changed=args.only_changed or args.watch,
+        engine_options=EngineOptions(lang=args.lang, psm=args.psm, oem=args.oem,
+                                     detect=args.detect_lang),
+        use_text_layer=not args.force_ocr,
+        memory_budget=args.memory_budget_mb * 1024 * 1024 if args.memory_budget_mb else None,
+        preprocess=PreprocessOptions(
+            target_dpi=args.target_dpi,
+            grayscale=args.grayscale,
+            binarize=args.binarize,
+            deskew=args.deskew,
+        ),
+    )
+
+
+def parse_job(spec):
+    """
+    Turns a loaded <name>.job.json into JobQueue.submit arguments. Its
+    "args" are the command line of a single run, e.g.
+    {"args": ["scans", "-o", "out", "-f", "pdf"], "priority": "high"}.
+    """
+    parser = build_parser()
+    try:
+        args = parser.parse_args([str(arg) for arg in spec.get("args", [])])
+    except SystemExit:
+        raise ValueError(f"invalid job arguments: {spec.get('args')}")
+    if not args.inputs or not args.output_dir:
+        raise ValueError("a job needs inputs and --output-dir")
+    if args.watch or args.queue_dir or args.coordinator or args.worker:
+        raise ValueError("--watch, --queue-dir, --coordinator and --worker can't be used "
+                         "in a job")
+    os.makedirs(args.output_dir, exist_ok=True)
+    cache = OCRCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+    return (iter_inputs(args.inputs, args.recursive), args.output_dir,
+            processor_options(args, cache))
+
+
+def start_coordinator(args, log):
+    """
+    Returns a Coordinator listening on args.coordinator.
+    """
+    coordinator = Coordinator(parse_address(args.coordinator), token=args.token, log=log)
+    host, port = coordinator.address
+    log(f"Waiting for workers on {host}:{port}; start them with "
+        f"python -m ocr --worker <this host>:{port}")
+    return coordinator
+
+
+def run_queue(args):
+    """
+    Serves the job queue in args.queue_dir until interrupted.
+    """
+    log = lambda message: emit("log", message=message)
+    if args.coordinator:
+        executor = start_coordinator(args, log)
+    else:
+        executor = args.executor if args.executor in ("thread", "process") else "process"
+    jobs = JobQueue(args.workers, executor,
+                    on_event=lambda job, event: emit_event(event, job=job.name))
+    folder = QueueDirectory(args.queue_dir, jobs, parse_job, log=log)
+
+    def request_stop(signum, frame):
+        folder.stop()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    try:
+        folder.run()
+    finally:
+        if args.coordinator:
+            executor.shutdown()
+    return 0
+
+
+def run_worker(args):
+    """
+    Serves the coordinator at args.worker until interrupted.
+    """
+    executor = args.executor if args.executor in ("thread", "process") else "process"
+    worker = RemoteWorker(
+        parse_address(args.worker, default_host="localhost"), args.workers,
+        token=args.token, executor=executor,
+        memory_budget=args.memory_budget_mb * 1024 * 1024 if args.memory_budget_mb else None,
+        log=lambda message: emit("log", message=message))
+
+    def request_stop(signum, frame):
+        worker.stop()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    try:
+        worker.run()
+    except WorkerRejected as e:
+        emit("error", message=f"The coordinator refused this worker: {e}")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    cache = OCRCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+    if args.clear_cache:
+        emit("cache_cleared", removed=cache.clear())
+        return 0
+    if args.tesseract_cmd:
+        set_tesseract_cmd(args.tesseract_cmd)
+    if args.coordinator and args.executor:
+        parser.error("--coordinator and --executor can't be combined")
+    if args.autotune and (args.coordinator or args.worker or args.queue_dir):
+        parser.error("--autotune needs a local pool of its own; it can't be combined with "
+                     "--coordinator, --worker or --queue-dir")
+    if args.max_memory_mb and not args.autotune:
+        parser.error("--max-memory-mb needs --autotune")
+    try:
+        for address in (args.coordinator, args.worker):
+            if address:
+                parse_address(address)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.coordinator and not args.token and not is_loopback(parse_address(args.coordinator)[0]):
+        parser.error("--coordinator needs --token (or OCR_CLUSTER_TOKEN) unless it listens on "
+                     "127.0.0.1")
+    if args.worker:
+        if args.inputs or args.queue_dir or args.watch or args.coordinator:
+            parser.error("--worker takes its pages from the coordinator")
+        return run_worker(args)
+    if args.queue_dir:
+        if args.inputs or args.watch:
+            parser.error("--queue-dir takes its inputs from job files")
+        return run_queue(args)
+
+    args.inputs = args.inputs or [p for p in [gui_setting("default_input_folder")] if p]
+    args.output_dir = args.output_dir or gui_setting("default_output_folder")
+    if not args.inputs:
+        parser.error("no inputs given")
+    if not args.output_dir:
+        parser.error("--output-dir is required")
+    if (args.only_changed or args.watch) and args.concatenate:
+        parser.error("--only-changed and --watch can't be combined with --concatenate")
+    if args.watch and (len(args.inputs) != 1 or not os.path.isdir(args.inputs[0])):
+        parser.error("--watch needs exactly one input folder")
+    try:
+        options = processor_options(args, cache)
+    except ValueError as e:
+        parser.error(str(e))
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    watcher = None
+    if args.watch:
+        watcher = FolderWatcher(args.inputs[0], args.recursive, ignore=[args.output_dir],
+                                settle_seconds=args.settle_seconds)
+        inputs = watcher.iter_ready()
+        emit("log", message=f"Watching {args.inputs[0]} ({watcher.mode}); "
+                            f"press Ctrl+C to stop.")
+    else:
+        # Folders are scanned by the pipeline while the first files are OCR'd
+        inputs = iter_inputs(args.inputs, args.recursive)
+
+    coordinator = None
+    if args.coordinator:
+        # Logs go through the processor once it exists
+        pending_logs = []
+        coordinator = start_coordinator(args, pending_logs.append)
+    autotune = None
+    if args.autotune:
+        autotune = AutoTuner(memory_limit=args.max_memory_mb * 1024 * 1024
+                             if args.max_memory_mb else None)
+    processor = BatchProcessor(inputs, args.output_dir, workers=args.workers,
+                               executor=coordinator or args.executor, autotune=autotune,
+                               continuous=args.watch, **options)
+    if coordinator is not None:
+        coordinator.log = processor.log
+        for message in pending_logs:
+            processor.log(message)
+
+    # Ctrl+C / SIGTERM finish the current page and stop cleanly
+    def request_cancel(signum, frame):
+        processor.cancel()
+        if watcher is not None:
+            watcher.stop()
+        if coordinator is not None:
+            # Pages waiting for a worker would otherwise hold up the stop
+            coordinator.shutdown()
+
+    signal.signal(signal.SIGINT, request_cancel)
+    signal.signal(signal.SIGTERM, request_cancel)
+
+    try:
+        done = processor.run(emit_event)
+    finally:
+        if coordinator is not None:
+            coordinator.shutdown()
+    if done.cancelled:
+        # Interrupting is how a watch ends
+        return 0 if args.watch else 130
+    if not processor.found and not processor.skipped:
+        emit("error", message="No valid images or PDFs found.")
+        return 1
+    # Failed pages are left for --resume; a script should notice them
+    return 1 if done.errors else 0
@@ -0,0 +1,658 @@
+# ocr/cluster.py
+"""
+OCR spread over several machines: a coordinator hands out pages over TCP
+to worker processes on other nodes (or on the same one):
+
+    # on each worker node
+    python -m ocr --worker coordinator-host:7788 --workers 8 --token SECRET
+    # on the coordinator
+    python -m ocr scans/ -o out -f pdf -c --coordinator :7788 --workers 32 --token SECRET
+
+Coordinator is a concurrent.futures.Executor, so a BatchProcessor runs
+unchanged on top of it: discovery, PDF rasterizing, the cache, the
+manifest and the ordered concatenated output stay on the coordinator,
+while each page's ocr_timed call runs on whichever worker has a free
+slot. Pages are sent as file bytes, so no shared filesystem is needed.
+The frames of a multi-page TIFF or GIF share one copy of the file: a
+worker that was sent the file for an earlier frame is told to reuse it.
+
+Every message is a uint32 header length, a uint32 payload length, a JSON
+header and an optional binary payload (a page, or a result). Both sides
+send a heartbeat every HEARTBEAT_SECONDS. A worker that stays silent for
+LOST_AFTER_SECONDS or disconnects is dropped, and its pages go back to
+the front of the queue, up to MAX_ATTEMPTS times each.
+"""
+import hmac
+import inspect
+import ipaddress
+import itertools
+import json
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+from ocr.engine import (
+    EngineOptions, default_worker_count, limit_tesseract_threads, ocr_timed, process_pool,
+    tesserocr_support
+)
+from ocr.preprocess import PreprocessOptions
+from ocr.tiling import default_memory_budget
+
+DEFAULT_PORT = 7788
+PROTOCOL_VERSION = 2
+
+HEARTBEAT_SECONDS = 2.0
+# Silence after which the other side counts as gone
+LOST_AFTER_SECONDS = 10.0
+# A page whose worker is lost this many times fails instead of being retried
+MAX_ATTEMPTS = 3
+# How long a worker waits between attempts to reach the coordinator
+RECONNECT_SECONDS = 2.0
+
+_FRAME = struct.Struct("<II")
+MAX_HEADER_BYTES = 1024 * 1024
+# Largest page image or result accepted in one message
+MAX_PAYLOAD_BYTES = 1024 ** 3
+# Limits before the peer has said hello (and shown the token)
+MAX_HELLO_BYTES = 64 * 1024
+
+
+class RemoteError(Exception):
+    """OCR failed on a worker (or the page was lost too often)."""
+
+
+class WorkerRejected(Exception):
+    """The coordinator refused the worker (wrong token or protocol)."""
+
+
+def parse_address(text, default_host=""):
+    """
+    Parses "host:port", ":port" or "port" into (host, port). An empty host
+    means every interface when listening.
+    """
+    host, _, port = text.rpartition(":")
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError(f"Invalid address {text!r}; expected [HOST:]PORT")
+    if not 0 <= port <= 65535:
+        raise ValueError(f"Invalid port in {text!r}")
+    return host or default_host, port
+
+
+def is_loopback(host):
+    """
+    True if every address a host name resolves to is a loopback address.
+    An empty host (every interface) is not.
+    """
+    if not host:
+        return False
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except OSError:
+        return False
+    return all(ipaddress.ip_address(info[4][0].split("%")[0]).is_loopback for info in infos)
+
+
+def send_message(sock, header, payload=b""):
+    data = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_FRAME.pack(len(data), len(payload)) + data)
+    if payload:
+        sock.sendall(payload)
+
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    got = 0
+    while got < size:
+        n = sock.recv_into(view[got:], size - got)
+        if not n:
+            raise ConnectionError("connection closed")
+        got += n
+    return bytes(buf)
+
+
+def recv_message(sock, max_header=MAX_HEADER_BYTES, max_payload=MAX_PAYLOAD_BYTES):
+    """
+    Returns the next (header, payload) from a socket. Frames above the
+    limits are refused before anything is allocated for them.
+    """
+    header_len, payload_len = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    if header_len > max_header:
+        raise ConnectionError("message header too large")
+    if payload_len > max_payload:
+        raise ConnectionError("message payload too large")
+    header = json.loads(_recv_exact(sock, header_len))
+    if not isinstance(header, dict):
+        raise ValueError("malformed message header")
+    payload = _recv_exact(sock, payload_len) if payload_len else b""
+    return header, payload
+
+
+class _Connection:
+    """One end of a coordinator/worker connection; sends are serialized."""
+
+    def __init__(self, sock, name, slots=0):
+        self.sock = sock
+        self.name = name
+        self.slots = slots
+        self.tasks = {}  # task id -> _Task sent and not yet answered
+        self.alive = True
+        self.last_file = None  # id of the file this worker was sent last
+        self._send_lock = threading.Lock()
+
+    def send(self, header, payload=b""):
+        with self._send_lock:
+            send_message(self.sock, header, payload)
+
+    def send_task(self, task):
+        """
+        Sends a page, without the file's bytes if this worker was sent
+        the same file (an earlier frame of it) last.
+        """
+        with self._send_lock:
+            if task.file_id == self.last_file:
+                send_message(self.sock, dict(task.header, file=task.file_id, reuse=True))
+            else:
+                send_message(self.sock, dict(task.header, file=task.file_id), task.payload)
+                self.last_file = task.file_id
+
+    def close(self):
+        self.alive = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+@dataclass(eq=False)
+class _Task:
+    header: dict
+    payload: bytes
+    file_id: int
+    future: Future = field(default_factory=Future)
+    started: bool = False
+    attempts: int = 0
+
+    @property
+    def id(self):
+        return self.header["id"]
+
+
+class Coordinator(Executor):
+    """
+    Executor that runs ocr_timed calls on remote workers (see RemoteWorker).
+    Listens on `address` until shut down; workers may come and go at any
+    time, and pages wait in order until one has a free slot. Other
+    functions can't be submitted.
+
+    log(message) is called from the coordinator's threads when workers
+    connect or are lost.
+
+    Workers receive the pages' contents, so listening anywhere but on
+    loopback needs a token.
+    """
+
+    # Each worker tiles or shrinks pages against its own memory budget
+    remote = True
+
+    def __init__(self, address=("127.0.0.1", DEFAULT_PORT), token=None, log=None,
+                 max_attempts=MAX_ATTEMPTS, heartbeat_seconds=HEARTBEAT_SECONDS,
+                 lost_after_seconds=LOST_AFTER_SECONDS):
+        if not token and not is_loopback(address[0]):
+            raise ValueError(f"Listening on {address[0] or 'every interface'} without a token "
+                             f"would hand pages to anyone who connects; set a token or "
+                             f"listen on 127.0.0.1")
+        self.token = token
+        self.log = log or (lambda message: None)
+        self.max_attempts = max_attempts
+        self.heartbeat_seconds = heartbeat_seconds
+        self.lost_after_seconds = lost_after_seconds
+        self._server = socket.create_server(address)
+        # Lets the accept loop notice shutdown()
+        self._server.settimeout(1.0)
+        self.address = self._server.getsockname()[:2]
+        self._lock = threading.Lock()
+        self._queue = deque()        # _Tasks waiting for a free slot
+        self._connections = set()
+        self._ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        # (path, size, mtime, file id, bytes) of the file read last, which
+        # the next frames of a multi-frame file share
+        self._last_file = None
+        self._closed = threading.Event()
+        for target, name in ((self._accept_loop, "ocr-coordinator"),
+                             (self._heartbeat_loop, "ocr-coordinator-heartbeat")):
+            threading.Thread(target=target, name=name, daemon=True).start()
+
+    @property
+    def slots(self):
+        """
+        Total worker slots currently connected.
+        """
+        with self._lock:
+            return sum(conn.slots for conn in self._connections)
+
+    def submit(self, fn, /, *args, **kwargs):
+        if fn is not ocr_timed:
+            raise TypeError("Coordinator can only run ocr.engine.ocr_timed")
+        if self._closed.is_set():
+            raise RuntimeError("Coordinator is shut down")
+        call = inspect.signature(ocr_timed).bind(*args, **kwargs)
+        call.apply_defaults()
+        arguments = call.arguments
+        path = arguments["image_path"]
+        preprocess = arguments["preprocess_options"]
+        engine = arguments["engine_options"]
+        # The memory budget isn't sent: each worker sizes its own
+        header = {
+            "type": "task",
+            "id": next(self._ids),
+            "name": os.path.basename(path),
+            "format": arguments["output_format"],
+            "backend": arguments["backend"],
+            "frame": arguments["frame"],
+            "preprocess": asdict(preprocess) if preprocess is not None else None,
+            "engine": asdict(engine) if engine is not None else None,
+        }
+        try:
+            file_id, data = self._read_file(path)
+        except (OSError, ValueError) as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+        task = _Task(header, data, file_id)
+        with self._lock:
+            self._queue.append(task)
+        self._dispatch()
+        return task.future
+
+    def _read_file(self, path):
+        """
+        Returns (file id, bytes) for a page's file, reusing the last file
+        read if it is the same one, unchanged.
+        """
+        # Read now: rasterized PDF pages are deleted once OCR'd
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            with self._lock:
+                last = self._last_file
+            if last is not None and last[:3] == (path, stat.st_size, stat.st_mtime_ns):
+                return last[3], last[4]
+            if stat.st_size > MAX_PAYLOAD_BYTES:
+                raise ValueError(f"{os.path.basename(path)} is larger than "
+                                 f"{MAX_PAYLOAD_BYTES // 1024 ** 2} MB and can't be sent")
+            data = f.read()
+        file_id = next(self._file_ids)
+        with self._lock:
+            self._last_file = (path, stat.st_size, stat.st_mtime_ns, file_id, data)
+        return file_id, data
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        """
+        Stops listening and disconnects the workers. Pages not finished
+        yet are cancelled or fail.
+        """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._server.close()
+        with self._lock:
+            queued = list(self._queue)
+            self._queue.clear()
+            self._last_file = None
+            connections = list(self._connections)
+            self._connections.clear()
+        for conn in connections:
+            queued.extend(conn.tasks.values())
+            conn.close()
+        for task in queued:
+            if not task.future.cancel() and not task.future.done():
+                task.future.set_exception(RemoteError("Coordinator shut down"))
+
+    def _dispatch(self):
+        """
+        Sends queued pages to workers with free slots, the least busy first.
+        """
+        while True:
+            with self._lock:
+                free = [conn for conn in self._connections
+                        if conn.alive and len(conn.tasks) < conn.slots]
+                if not free or not self._queue:
+                    return
+                conn = max(free, key=lambda conn: conn.slots - len(conn.tasks))
+                task = self._queue.popleft()
+                if not task.started:
+                    if not task.future.set_running_or_notify_cancel():
+                        continue
+                    task.started = True
+                conn.tasks[task.id] = task
+            try:
+                conn.send_task(task)
+            except OSError as e:
+                self._lose(conn, str(e))
+
+    def _lose(self, conn, reason):
+        """
+        Drops a worker and puts its unanswered pages back at the front of
+        the queue (or fails those lost MAX_ATTEMPTS times).
+        """
+        with self._lock:
+            if not conn.alive:
+                return
+            conn.alive = False
+            self._connections.discard(conn)
+            lost = sorted(conn.tasks.values(), key=lambda task: task.id)
+            conn.tasks.clear()
+            failed = []
+            for task in reversed(lost):
+                task.attempts += 1
+                if task.attempts >= self.max_attempts:
+                    failed.append(task)
+                else:
+                    self._queue.appendleft(task)
+        conn.close()
+        if self._closed.is_set():
+            return
+        for task in failed:
+            task.future.set_exception(RemoteError(
+                f"{task.header['name']} was lost with {task.attempts} worker(s)"))
+        self.log(f"Worker {conn.name} lost ({reason}); "
+                 f"{len(lost) - len(failed)} page(s) requeued.")
+        self._dispatch()
+
+    def _accept_loop(self):
+        while not self._closed.is_set():
+            try:
+                sock, peer = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(sock, peer),
+                             name=f"ocr-coordinator-{peer[0]}:{peer[1]}", daemon=True).start()
+
+    def _check_hello(self, hello):
+        """
+        Returns why a worker's hello is refused, or None.
+        """
+        if hello.get("type") != "hello":
+            return "expected hello"
+        if hello.get("protocol") != PROTOCOL_VERSION:
+            return f"protocol {hello.get('protocol')} != {PROTOCOL_VERSION}"
+        if self.token and not hmac.compare_digest(str(hello.get("token") or ""), self.token):
+            return "wrong token"
+        return None
+
+    def _serve(self, sock, peer):
+        """
+        Handles one worker connection: the hello, then results until the
+        connection drops or goes silent.
+        """
+        sock.settimeout(self.lost_after_seconds)
+        try:
+            hello, _ = recv_message(sock, max_header=MAX_HELLO_BYTES, max_payload=0)
+            reason = self._check_hello(hello)
+            if reason is not None:
+                send_message(sock, {"type": "rejected", "reason": reason})
+                sock.close()
+                self.log(f"Refused worker at {peer[0]}:{peer[1]}: {reason}")
+                return
+            conn = _Connection(sock, str(hello.get("name") or f"{peer[0]}:{peer[1]}"),
+                               max(1, int(hello.get("slots", 1))))
+            conn.send({"type": "welcome", "heartbeat_seconds": self.heartbeat_seconds})
+        except (OSError, ValueError, TypeError):
+            sock.close()
+            return
+        with self._lock:
+            if self._closed.is_set():
+                conn.close()
+                return
+            self._connections.add(conn)
+        self.log(f"Worker {conn.name} connected ({conn.slots} slot(s)).")
+        self._dispatch()
+
+        try:
+            while conn.alive:
+                header, payload = recv_message(sock)
+                if header.get("type") not in ("result", "error"):
+                    continue  # heartbeat
+                with self._lock:
+                    task = conn.tasks.pop(header.get("id"), None)
+                if task is None:
+                    continue  # already requeued
+                if header["type"] == "result":
+                    result = payload.decode("utf-8") if header.get("text") else payload
+                    task.future.set_result((result, header.get("timings", {})))
+                else:
+                    task.future.set_exception(RemoteError(header.get("error", "OCR failed")))
+                self._dispatch()
+            reason = "disconnected"
+        except socket.timeout:
+            reason = "no heartbeat"
+        except (OSError, ValueError) as e:
+            reason = str(e) or "disconnected"
+        self._lose(conn, reason)
+
+    def _heartbeat_loop(self):
+        while not self._closed.wait(self.heartbeat_seconds):
+            with self._lock:
+                connections = list(self._connections)
+            for conn in connections:
+                try:
+                    conn.send({"type": "heartbeat"})
+                except OSError as e:
+                    self._lose(conn, str(e))
+
+
+class RemoteWorker:
+    """
+    A stateless OCR worker node: connects to a Coordinator, offers
+    `workers` slots and OCRs the pages it is sent on a local process (or
+    thread) pool, sending each result back as soon as it is done. If the
+    coordinator goes away, it keeps trying to reconnect until stop().
+
+    memory_budget (bytes per slot) defaults to this machine's share; see
+    ocr.tiling.default_memory_budget.
+    """
+
+    def __init__(self, address, workers=None, token=None, executor="process",
+                 memory_budget=None, name=None, log=None):
+        if executor not in ("process", "thread"):
+            raise ValueError(f"Unknown executor {executor!r}; expected 'process' or 'thread'")
+        self.address = address
+        self.workers = max(1, workers or default_worker_count())
+        self.token = token
+        self.executor = executor
+        self.memory_budget = memory_budget or default_memory_budget(self.workers)
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.log = log or (lambda message: None)
+        self._stop = threading.Event()
+        self._conn = None
+        self._temp_dir = None
+        # file id -> [temp path, pages using it]; the current file is kept
+        # for later frames even while no page uses it
+        self._files = {}
+        self._current_file = None
+        self._files_lock = threading.Lock()
+
+    def stop(self):
+        """
+        Ends run(). Safe to call from any thread (and signal handlers).
+        """
+        self._stop.set()
+        conn = self._conn
+        if conn is not None:
+            conn.close()
+
+    def run(self):
+        """
+        Serves coordinators until stop(). Raises WorkerRejected if the
+        coordinator refuses this worker.
+        """
+        if self.executor == "process":
+            pool = process_pool(self.workers)
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.workers, initializer=limit_tesseract_threads)
+        self._temp_dir = tempfile.mkdtemp(prefix="ocr_worker_")
+        host, port = self.address
+        waiting = False
+        try:
+            while not self._stop.is_set():
+                try:
+                    sock = socket.create_connection(self.address, timeout=LOST_AFTER_SECONDS)
+                except OSError as e:
+                    if not waiting:
+                        self.log(f"Waiting for the coordinator at {host}:{port} ({e}).")
+                        waiting = True
+                    self._stop.wait(RECONNECT_SECONDS)
+                    continue
+                waiting = False
+                try:
+                    self._session(sock, pool)
+                except (OSError, ValueError) as e:
+                    if not self._stop.is_set():
+                        self.log(f"Connection to the coordinator lost ({e}).")
+                finally:
+                    sock.close()
+                    self._conn = None
+        finally:
+            pool.shutdown(cancel_futures=True)
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._files.clear()
+
+    def _session(self, sock, pool):
+        sock.settimeout(LOST_AFTER_SECONDS)
+        send_message(sock, {"type": "hello", "protocol": PROTOCOL_VERSION, "name": self.name,
+                            "slots": self.workers, "token": self.token})
+        reply, _ = recv_message(sock, max_header=MAX_HELLO_BYTES, max_payload=0)
+        if reply.get("type") == "rejected":
+            raise WorkerRejected(reply.get("reason", "refused"))
+        conn = self._conn = _Connection(sock, "coordinator")
+        if self._stop.is_set():
+            return
+        heartbeat = float(reply.get("heartbeat_seconds", HEARTBEAT_SECONDS))
+        threading.Thread(target=self._heartbeat_loop, args=(conn, heartbeat),
+                         name="ocr-worker-heartbeat", daemon=True).start()
+        host, port = self.address
+        self.log(f"Connected to the coordinator at {host}:{port} ({self.workers} slot(s)).")
+        try:
+            while not self._stop.is_set():
+                header, payload = recv_message(sock)
+                if header.get("type") == "task":
+                    self._start(conn, pool, header, payload)
+        finally:
+            conn.alive = False
+            # The next coordinator connection starts without a current file
+            with self._files_lock:
+                self._current_file = None
+                idle = [fid for fid, (_, users) in self._files.items() if not users]
+            for fid in idle:
+                self._release_file(fid, use=False)
+
+    def _heartbeat_loop(self, conn, interval):
+        while conn.alive and not self._stop.wait(interval):
+            try:
+                conn.send({"type": "heartbeat"})
+            except OSError:
+                return
+
+    def _start(self, conn, pool, header, payload):
+        """
+        Runs one page on the local pool; its result is sent back when done.
+        """
+        try:
+            file_id, path = self._take_file(header, payload)
+        except (OSError, KeyError) as e:
+            conn.send({"type": "error", "id": header["id"],
+                       "error": f"{header.get('name')}: page file unavailable ({e})"})
+            return
+        backend = header["backend"]
+        if backend == "tesserocr" and not tesserocr_support():
+            backend = "pytesseract"
+        preprocess = header.get("preprocess")
+        engine = header.get("engine")
+        try:
+            preprocess = PreprocessOptions(**preprocess) if preprocess else None
+            engine = EngineOptions(**engine) if engine else None
+        except (TypeError, ValueError) as e:
+            # Options from a coordinator of another version, or invalid ones
+            self._release_file(file_id)
+            conn.send({"type": "error", "id": header["id"],
+                       "error": f"{header.get('name')}: unusable options ({e})"})
+            return
+        future = pool.submit(ocr_timed, path, header["format"], backend, preprocess,
+                             header.get("frame", 0), engine, self.memory_budget)
+        future.add_done_callback(
+            lambda future: self._finished(conn, header, file_id, path, future))
+
+    def _take_file(self, header, payload):
+        """
+        Returns (file id, temp path) of a page's file: the one sent with
+        it, or the current one when the coordinator says to reuse it.
+        """
+        file_id = header["file"]
+        if header.get("reuse"):
+            with self._files_lock:
+                entry = self._files[file_id]
+                entry[1] += 1
+                return file_id, entry[0]
+        suffix = os.path.splitext(header.get("name", ""))[1]
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=self._temp_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        with self._files_lock:
+            previous, self._current_file = self._current_file, file_id
+            self._files[file_id] = [path, 1]
+            idle = previous is not None and not self._files[previous][1]
+        if idle:
+            self._release_file(previous, use=False)
+        return file_id, path
+
+    def _release_file(self, file_id, use=True):
+        """
+        Drops one page's use of a file (use=False: just checks), deleting
+        it once unused unless it is still the current one.
+        """
+        with self._files_lock:
+            entry = self._files.get(file_id)
+            if entry is None:
+                return
+            if use:
+                entry[1] -= 1
+            if entry[1] or file_id == self._current_file:
+                return
+            del self._files[file_id]
+        try:
+            os.remove(entry[0])
+        except OSError:
+            pass
+
+    def _finished(self, conn, header, file_id, path, future):
+        self._release_file(file_id)
+        if future.cancelled():
+            return
+        try:
+            result, timings = future.result()
+        except Exception as e:
+            # Name the page as the coordinator knows it, not by its temp file
+            error = str(e).replace(path, header.get("name", path))
+            reply, payload = {"type": "error", "id": header["id"], "error": error}, b""
+        else:
+            text = isinstance(result, str)
+            reply = {"type": "result", "id": header["id"], "text": text, "timings": timings}
+            payload = result.encode("utf-8") if text else result
+        if not conn.alive:
+            return  # the coordinator has requeued the page
+        try:
+            conn.send(reply, payload)
+        except OSError:
+            pass
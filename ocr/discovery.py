@@ -0,0 +1,61 @@
+# ocr/discovery.py
+import os
+
+# Input file patterns picked up when a folder is given
+INPUT_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.bmp", "*.gif", "*.tif", "*.tiff", "*.pdf"]
+INPUT_EXTENSIONS = frozenset(pattern[1:] for pattern in INPUT_PATTERNS)
+
+
+def scan_folder(folder: str, recurse: bool):
+    """
+    Yields the images/PDFs in a folder as os.DirEntry objects, in sorted
+    order. The tree is walked once with os.scandir, and results stream out
+    as they are found. Unreadable folders are skipped; symlinked folders
+    are not followed.
+    """
+    try:
+        with os.scandir(folder) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if recurse:
+                    yield from scan_folder(entry.path, recurse)
+            elif os.path.splitext(entry.name)[1].lower() in INPUT_EXTENSIONS:
+                yield entry
+        except OSError:
+            continue
+
+
+def get_files_in_folder(folder: str, recurse: bool):
+    """
+    Returns the sorted image/PDF paths in a folder, optionally recursing.
+    """
+    return [entry.path for entry in scan_folder(folder, recurse)]
+
+
+def iter_inputs(inputs, recurse: bool):
+    """
+    Lazily expands files and folders into input files. Folders are replaced
+    by the images/PDFs they contain, as the scan finds them. Yields paths
+    for files given directly and os.DirEntry objects (path-like, with a
+    cached stat()) for files found in folders.
+    """
+    for it in inputs:
+        it = it.strip()
+        if not it:
+            continue
+        if os.path.isdir(it):
+            yield from scan_folder(it, recurse)
+        else:
+            yield it
+
+
+def expand_inputs(inputs, recurse: bool):
+    """
+    Expands a list of files and folders into the final list of input files.
+    Folders are replaced by the images/PDFs they contain.
+    """
+    return [os.fspath(item) for item in iter_inputs(inputs, recurse)]
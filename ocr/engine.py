@@ -1,24 +1,500 @@
-import pytesseract
-from PIL import Image
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from functools import lru_cache
 
-# Point to Tesseract installation:
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+from ocr.languages import (
+    DEFAULT_LANG, languages_for_script, languages_from_stopwords, split_langs
+)
+from ocr.optional import optional_module
+from ocr.preprocess import apply_draft, preprocess
+from ocr.tiling import (
+    REDUCE, TILES, open_image, plan_image, render_hocr_page, render_text, shrink_to, stitch,
+    tile_grid
+)
+from ocr.wordboxes import TSV_HEADER, encode_words, read_tsv
 
+# Point to Tesseract installation. The TESSERACT_CMD environment variable
+# overrides it; elsewhere than Windows, `tesseract` is looked up on PATH.
+WINDOWS_TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
-def ocr_preserve_format(image_path: str, output_format: str = "txt"):
+# Valid Tesseract page segmentation (--psm) and engine (--oem) modes
+PSM_MODES = list(range(14))
+OEM_MODES = list(range(4))
+
+# The language pre-pass works on a copy shrunk to this longest side
+DETECT_MAX_SIDE = 1600
+# OSD answers below these confidences are ignored
+MIN_ORIENTATION_CONFIDENCE = 10.0
+MIN_SCRIPT_CONFIDENCE = 2.0
+
+# tesserocr APIs kept per thread, one per language/PSM/OEM combination
+MAX_APIS_PER_THREAD = 4
+
+
+@dataclass
+class EngineOptions:
+    """
+    Per-run Tesseract settings. lang is a Tesseract language string
+    ("eng+deu+fra"). With detect, a quick pre-pass on a shrunk copy of
+    each page (OSD, then common words) picks the page's orientation and
+    the smallest subset of lang to run the full OCR with.
+    """
+    lang: str = DEFAULT_LANG
+    psm: int = 3
+    oem: int = 3
+    detect: bool = False
+
+    def __post_init__(self):
+        if not split_langs(self.lang):
+            raise ValueError("No OCR language given")
+        if self.psm not in PSM_MODES:
+            raise ValueError(f"Unknown page segmentation mode {self.psm!r}; expected 0-13")
+        if self.oem not in OEM_MODES:
+            raise ValueError(f"Unknown OCR engine mode {self.oem!r}; expected 0-3")
+
+    def config(self):
+        return f"--oem {self.oem} --psm {self.psm} -c preserve_interword_spaces=1"
+
+    def describe(self):
+        """
+        Stable description of the options, used in the OCR cache key.
+        """
+        return f"lang={self.lang} psm={self.psm} oem={self.oem} detect={int(self.detect)}"
+
+
+TESSERACT_CONFIG = EngineOptions().config()
+
+# "auto" uses the persistent tesserocr API when installed, else pytesseract
+ENGINE_BACKENDS = ["auto", "tesserocr", "pytesseract"]
+
+# Wraps the single ocr_page div tesserocr returns into a document shaped
+# like the one the tesseract CLI (and so pytesseract) writes.
+HOCR_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"
+    "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en" lang="en">
+ <head>
+  <title></title>
+  <meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>
+  <meta name='ocr-system' content='tesseract {version}' />
+  <meta name='ocr-capabilities' content='ocr_page ocr_carea ocr_par ocr_line ocrx_word ocrp_wconf'/>
+ </head>
+ <body>
+"""
+HOCR_FOOTER = """ </body>
+</html>
+"""
+
+# Initialized tesserocr APIs per worker thread (and so per pool process)
+_api_local = threading.local()
+
+
+@lru_cache(maxsize=None)
+def _pytesseract():
+    """
+    Imports pytesseract on first use (it pulls in PIL) and points it at
+    the Tesseract binary.
+    """
+    import pytesseract
+    if os.environ.get("TESSERACT_CMD"):
+        pytesseract.pytesseract.tesseract_cmd = os.environ["TESSERACT_CMD"]
+    elif os.name == "nt":
+        pytesseract.pytesseract.tesseract_cmd = WINDOWS_TESSERACT_CMD
+    return pytesseract
+
+
+def tesserocr_support():
+    """
+    True if tesserocr is installed. The first call imports it, which
+    loads libtesseract.
+    """
+    return optional_module("tesserocr") is not None
+
+
+def default_worker_count():
+    """
+    Returns the default number of OCR worker processes (one per CPU core).
+    """
+    return os.cpu_count() or 1
+
+
+def process_pool(workers: int):
     """
-    Performs OCR on a single image, optionally producing HOCR or PDF.
+    Returns a ProcessPoolExecutor of OCR workers. They are started with
+    spawn, not fork: pools are fed from pipeline threads while other
+    threads decode PDFs and import modules, and a child forked while one
+    of them holds a lock deadlocks. Workers are started lazily on
+    submit(), so creating the pool early wouldn't avoid that.
+    """
+    return ProcessPoolExecutor(max_workers=workers,
+                               mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_pool_worker)
+
+
+def _init_pool_worker():
+    # Ctrl+C reaches the whole process group; the parent cancels the run
+    # and shuts the pool down, so workers mustn't die with a traceback
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    limit_tesseract_threads()
+
+
+def set_tesseract_cmd(cmd: str):
+    """
+    Points pytesseract at a specific tesseract binary. Also exported through
+    TESSERACT_CMD so pool worker processes pick it up.
+    """
+    os.environ["TESSERACT_CMD"] = cmd
+    # pytesseract picks the command up again on its next use
+    _pytesseract.cache_clear()
+    tesseract_version.cache_clear()
+    available_languages.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def tesseract_version():
+    """
+    Returns the installed Tesseract version as a string (probed once).
+    """
+    try:
+        return str(_pytesseract().get_tesseract_version())
+    except Exception:
+        if not tesserocr_support():
+            raise
+        return optional_module("tesserocr").tesseract_version().split()[1]
+
+
+# The OpenMP thread limit last set in this process
+_thread_limit = None
+
+
+def limit_tesseract_threads(threads: int = 1):
+    """
+    Caps Tesseract's internal OpenMP threads for this process and every
+    tesseract subprocess it spawns. Used as the process-pool initializer so
+    N workers don't each start one thread per core, and again by ocr_timed
+    when the autotuner changes the limit.
+    """
+    global _thread_limit
+    if threads == _thread_limit:
+        return
+    _thread_limit = threads
+    os.environ["OMP_THREAD_LIMIT"] = str(threads)
+
+    # The tesserocr backend runs libtesseract in-process, where OpenMP has
+    # already read the environment; set the limit through the runtime too.
+    if tesserocr_support():
+        import ctypes
+        import ctypes.util
+
+        libgomp = ctypes.util.find_library("gomp")
+        if libgomp:
+            try:
+                ctypes.CDLL(libgomp).omp_set_num_threads(threads)
+            except (OSError, AttributeError):
+                pass
+
+
+@lru_cache(maxsize=None)
+def available_languages():
+    """
+    Returns the set of installed Tesseract languages (probed once), or
+    None if it can't be determined.
+    """
+    try:
+        return set(_pytesseract().get_languages(config=""))
+    except Exception:
+        if not tesserocr_support():
+            return None
+        try:
+            return set(optional_module("tesserocr").get_languages()[1])
+        except Exception:
+            return None
+
+
+def missing_languages(lang: str):
+    """
+    Returns the languages of a Tesseract language string that aren't
+    installed (empty if that can't be determined).
+    """
+    installed = available_languages()
+    if installed is None:
+        return []
+    return [part for part in split_langs(lang) if part not in installed]
+
+
+def resolve_backend(backend: str, output_format: str):
+    """
+    Returns the backend that will actually run for this output format.
+    tesserocr can't render searchable PDFs in memory, so "pdf" always
+    goes through pytesseract.
+    """
+    if backend not in ENGINE_BACKENDS:
+        raise ValueError(f"Unknown OCR backend {backend!r}; expected one of {ENGINE_BACKENDS}")
+    if backend == "tesserocr" and not tesserocr_support():
+        raise RuntimeError("tesserocr is not installed; cannot use the tesserocr backend.")
+    if backend == "pytesseract" or output_format == "pdf" or not tesserocr_support():
+        return "pytesseract"
+    return "tesserocr"
+
+
+def _tesserocr_api(lang=DEFAULT_LANG, psm=3, oem=3):
+    """
+    Returns this thread's tesserocr API for these settings, initializing
+    it (and loading the traineddata) on first use only. The most recently
+    used few are kept, for runs whose pages need different languages.
+    """
+    apis = getattr(_api_local, "apis", None)
+    if apis is None:
+        apis = _api_local.apis = OrderedDict()
+    key = (lang, psm, oem)
+    api = apis.get(key)
+    if api is not None:
+        apis.move_to_end(key)
+        return api
+    if len(apis) >= MAX_APIS_PER_THREAD:
+        apis.popitem(last=False)[1].End()
+    api = optional_module("tesserocr").PyTessBaseAPI(lang=lang, psm=psm, oem=oem)
+    api.SetVariable("preserve_interword_spaces", "1")
+    apis[key] = api
+    return api
+
+
+def _ocr_tesserocr(img, output_format: str, options):
+    api = _tesserocr_api(options.lang, options.psm, options.oem)
+    api.SetImage(img)
+    dpi = img.info.get("dpi")
+    if dpi and dpi[0]:
+        api.SetSourceResolution(int(dpi[0]))
+    try:
+        if output_format == "txt":
+            return api.GetUTF8Text()
+        if output_format == "tsv":
+            return TSV_HEADER + "\n" + api.GetTSVText(0)
+        page = api.GetHOCRText(0)
+        version = optional_module("tesserocr").tesseract_version().split()[1]
+        return (HOCR_HEADER.format(version=version)
+                + page + HOCR_FOOTER).encode("utf-8")
+    finally:
+        api.Clear()
+
+
+def ocr_image(img, output_format: str = "txt", backend: str = "auto", options=None):
+    """
+    Performs OCR on an already opened PIL image. options is an optional
+    EngineOptions (default: English, --psm 3, --oem 3).
     Return:
       - if "txt": a string
       - if "pdf"/"hocr": bytes
+      - if "words": a single-page ocr.wordboxes file (bytes)
     """
-    config = r"--oem 3 --psm 3 -c preserve_interword_spaces=1"
+    options = options or EngineOptions()
+    config = options.config()
+
+    if output_format == "words":
+        return encode_words(*ocr_words(img, backend, options))
+
+    if resolve_backend(backend, output_format) == "tesserocr":
+        return _ocr_tesserocr(img, output_format, options)
 
+    pytesseract = _pytesseract()
     if output_format == "txt":
-        with Image.open(image_path) as img:
-            return pytesseract.image_to_string(img, config=config)
+        return pytesseract.image_to_string(img, lang=options.lang, config=config)
     else:
         # HOCR or PDF
         extension = "pdf" if output_format == "pdf" else "hocr"
-        with Image.open(image_path) as img:
-            return pytesseract.image_to_pdf_or_hocr(img, extension=extension, config=config)
+        return pytesseract.image_to_pdf_or_hocr(img, lang=options.lang, extension=extension,
+                                                config=config)
+
+
+def ocr_words(img, backend: str = "auto", options=None):
+    """
+    Performs OCR on a PIL image and returns (words, width, height): its
+    ocr.wordboxes.Word rows (boxes, confidences, block/line numbers) and
+    the page size, from Tesseract's TSV output.
+    """
+    options = options or EngineOptions()
+    if resolve_backend(backend, "words") == "tesserocr":
+        tsv = _ocr_tesserocr(img, "tsv", options)
+    else:
+        tsv = _pytesseract().image_to_data(img, lang=options.lang, config=options.config())
+    words, width, height = read_tsv(tsv)
+    return words, width or img.width, height or img.height
+
+
+def ocr_tiled(img, output_format: str, backend: str, options, tile_side: int):
+    """
+    OCRs an image too large for Tesseract's working memory as
+    overlapping tiles of at most tile_side pixels, one at a time, and
+    stitches the words back into one page of text, HOCR or word boxes.
+    """
+    tiles = []
+    for box, core in tile_grid(img.width, img.height, tile_side):
+        tile = img.crop(box)
+        tile.info["dpi"] = img.info.get("dpi")
+        tiles.append((box, core, ocr_words(tile, backend, options)[0]))
+        del tile
+    words = stitch(tiles)
+    if output_format == "txt":
+        return render_text(words)
+    if output_format == "words":
+        return encode_words(words, img.width, img.height)
+    version = tesseract_version().split()[-1]
+    return (HOCR_HEADER.format(version=version) + render_hocr_page(words, img.width, img.height)
+            + HOCR_FOOTER).encode("utf-8")
+
+
+def detect_orientation_script(img, backend: str = "auto"):
+    """
+    Runs Tesseract's orientation and script detection (OSD) on an image.
+    Returns {"rotate", "orientation_conf", "script", "script_conf"}, where
+    rotate is the clockwise rotation in degrees that makes the page
+    upright, or None if OSD can't tell (too little text, no osd data).
+    """
+    try:
+        if resolve_backend(backend, "txt") == "tesserocr":
+            tesserocr = optional_module("tesserocr")
+            api = _tesserocr_api("osd", tesserocr.PSM.OSD_ONLY, tesserocr.OEM.DEFAULT)
+            api.SetImage(img)
+            try:
+                osd = api.DetectOrientationScript()
+            finally:
+                api.Clear()
+            if not osd:
+                return None
+            return {"rotate": (360 - osd["orient_deg"]) % 360,
+                    "orientation_conf": osd["orient_conf"],
+                    "script": osd["script_name"],
+                    "script_conf": osd["script_conf"]}
+        pytesseract = _pytesseract()
+        osd = pytesseract.image_to_osd(img, output_type=pytesseract.Output.DICT)
+        return {key: osd[key] for key in ("rotate", "orientation_conf", "script", "script_conf")}
+    except Exception:
+        return None
+
+
+def rotate_upright(img, rotate: int):
+    """
+    Rotates an image clockwise by a multiple of 90 degrees (losslessly).
+    """
+    from PIL import Image
+
+    transpose = {90: Image.Transpose.ROTATE_270, 180: Image.Transpose.ROTATE_180,
+                 270: Image.Transpose.ROTATE_90}.get(rotate % 360)
+    return img.transpose(transpose) if transpose is not None else img
+
+
+def detect_page(img, options, backend: str = "auto"):
+    """
+    The optional language pre-pass. Returns (lang, rotate) for one page:
+    the subset of options.lang the page seems to need, and the clockwise
+    rotation that makes it upright (0 when unsure). OSD picks the script
+    and orientation. If several languages of that script remain, a quick
+    OCR with the first of them is checked for each one's common words.
+    """
+    from PIL import Image
+
+    langs = split_langs(options.lang)
+    small = img
+    scale = DETECT_MAX_SIDE / max(img.size)
+    if scale < 1:
+        small = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))),
+                           Image.BILINEAR)
+
+    rotate = 0
+    osd = detect_orientation_script(small, backend)
+    if osd is not None:
+        if osd["orientation_conf"] >= MIN_ORIENTATION_CONFIDENCE:
+            rotate = osd["rotate"]
+        if osd["script_conf"] >= MIN_SCRIPT_CONFIDENCE:
+            langs = languages_for_script(langs, osd["script"])
+
+    if len(langs) > 1:
+        try:
+            sample = ocr_image(rotate_upright(small, rotate), "txt", backend,
+                               replace(options, lang=langs[0]))
+            langs = languages_from_stopwords(sample, langs)
+        except Exception:
+            pass
+    return "+".join(langs), rotate
+
+
+def ocr_preserve_format(image_path: str, output_format: str = "txt", backend: str = "auto",
+                        preprocess_options=None, engine_options=None):
+    """
+    Performs OCR on a single image, optionally producing HOCR, PDF or
+    word boxes.
+    With the tesserocr backend the image is fed in memory to a Tesseract
+    instance that stays alive between calls; pytesseract starts a new
+    tesseract process per image. preprocess_options is an optional
+    ocr.preprocess.PreprocessOptions, engine_options an optional
+    EngineOptions.
+    Return:
+      - if "txt": a string
+      - if "pdf"/"hocr"/"words": bytes
+    """
+    return ocr_timed(image_path, output_format, backend, preprocess_options,
+                     engine_options=engine_options)[0]
+
+
+def frame_count(image_path: str):
+    """
+    Returns the number of frames (pages) in an image file. Only headers
+    are read for TIFFs; GIFs have to be walked frame by frame.
+    """
+    with open_image(image_path) as img:
+        return getattr(img, "n_frames", 1)
+
+
+def ocr_timed(image_path: str, output_format: str = "txt", backend: str = "auto",
+              preprocess_options=None, frame: int = 0, engine_options=None,
+              memory_budget=None, threads=None):
+    """
+    Same as ocr_preserve_format, but returns (result, timings) where
+    timings holds the seconds spent decoding ("load"), preprocessing, in
+    the language pre-pass ("detect") and in Tesseract ("ocr"). `frame`
+    selects the page of a multi-frame TIFF/GIF; only that frame is
+    decoded. Picklable, so it can run in a process pool.
+
+    With a memory_budget (bytes), images too large for it are OCR'd in
+    tiles or shrunk first, as decided from their header by
+    ocr.tiling.plan_image. `threads` sets Tesseract's OpenMP thread limit
+    first (see ocr.autotune).
+    """
+    if threads:
+        limit_tesseract_threads(threads)
+    options = engine_options or EngineOptions()
+    started = time.perf_counter()
+    with open_image(image_path) as img:
+        if frame:
+            img.seek(frame)
+        plan = plan_image(img.width, img.height, img.mode, memory_budget, output_format,
+                          can_draft=img.format == "JPEG")
+        apply_draft(img, preprocess_options, plan.max_size)
+        # Other formats are decoded at full size once, then shrunk
+        img.load()
+        if plan.mode == REDUCE:
+            img = shrink_to(img, plan.max_size)
+        loaded = time.perf_counter()
+        prepared = preprocess(img, preprocess_options)
+        prepared_at = time.perf_counter()
+        if options.detect:
+            lang, rotate = detect_page(prepared, options, backend)
+            prepared = rotate_upright(prepared, rotate)
+            options = replace(options, lang=lang)
+        detected_at = time.perf_counter()
+        if plan.mode == TILES:
+            result = ocr_tiled(prepared, output_format, backend, options, plan.tile_side)
+        else:
+            result = ocr_image(prepared, output_format, backend, options)
+    return result, {
+        "load": loaded - started,
+        "preprocess": prepared_at - loaded,
+        "detect": detected_at - prepared_at,
+        "ocr": time.perf_counter() - detected_at,
+    }
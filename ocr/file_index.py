@@ -0,0 +1,98 @@
+# ocr/file_index.py
+import json
+import os
+import sqlite3
+import threading
+
+# Stored in the output folder, next to the results
+INDEX_NAME = ".ocr_index.sqlite"
+
+# Recorded files are committed in batches
+COMMIT_EVERY = 200
+
+
+class FileIndex:
+    """
+    Persistent path/size/mtime index of the inputs an output folder was
+    built from. Every run records the sources it finished, so a later run
+    with the same settings can skip files that haven't changed instead of
+    re-OCRing everything.
+
+    Safe to share between the pipeline's stage threads.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, INDEX_NAME)
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._uncommitted = 0
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime REAL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS job (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._db.commit()
+
+    def start(self, settings: dict):
+        """
+        Forgets all recorded files if the output settings changed since the
+        index was written, as their outputs no longer match.
+        """
+        encoded = json.dumps(settings, sort_keys=True)
+        with self._lock:
+            row = self._db.execute("SELECT value FROM job WHERE key = 'settings'").fetchone()
+            if row is None or row[0] != encoded:
+                self._db.execute("DELETE FROM files")
+            self._db.execute("INSERT OR REPLACE INTO job VALUES ('settings', ?)", (encoded,))
+            self._db.commit()
+
+    def changed(self, path, stat=None):
+        """
+        Returns True if path is new or its size/mtime differ from the index.
+        stat may be passed in (e.g. from os.DirEntry.stat()) to save a call.
+        """
+        try:
+            st = stat or os.stat(path)
+        except OSError:
+            return True
+        key = os.path.abspath(path)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT size, mtime FROM files WHERE path = ?", (key,)
+            ).fetchone()
+            if row is not None and tuple(row) == (st.st_size, st.st_mtime):
+                return False
+            # Recorded as seen now, so edits during the run aren't missed
+            self._seen[key] = (st.st_size, st.st_mtime)
+        return True
+
+    def record(self, path):
+        """
+        Marks path as processed, with the size/mtime it had when scanned.
+        """
+        key = os.path.abspath(path)
+        with self._lock:
+            size_mtime = self._seen.pop(key, None)
+        if size_mtime is None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return
+            size_mtime = (st.st_size, st.st_mtime)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                             (key,) + size_mtime)
+            self._uncommitted += 1
+            if self._uncommitted >= COMMIT_EVERY:
+                self._db.commit()
+                self._uncommitted = 0
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
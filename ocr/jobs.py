@@ -0,0 +1,396 @@
+# ocr/jobs.py
+"""
+Several OCR batches at once, each with a priority, on one shared worker
+pool:
+
+    jobs = JobQueue(workers=8)
+    big = jobs.submit(archive_files, "out/archive", priority="low")
+    urgent = jobs.submit(today_files, "out/today", priority="high")
+    jobs.pause(big.id)
+
+Pages are scheduled one at a time by ocr.scheduler.SharedPool, so an
+urgent batch starts getting workers as soon as the next page finishes,
+not when the big batch does. QueueDirectory drives a JobQueue from job
+files in a folder, for headless use.
+"""
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from ocr.pipeline import BatchProcessor, DoneEvent, ErrorEvent, LogEvent, PageEvent, ProgressEvent
+from ocr.scheduler import PRIORITIES, SharedPool, priority_level
+
+JOB_STATES = ["queued", "running", "paused", "done", "cancelled", "failed"]
+FINISHED_STATES = ("done", "cancelled", "failed")
+
+# Batches running at the same time (each has its own stage threads); more
+# wait as "queued" unless they outrank every running batch
+DEFAULT_MAX_RUNNING = 4
+
+
+@dataclass
+class Job:
+    """One batch in a JobQueue. Use JobQueue methods to change it."""
+    id: str
+    name: str
+    priority: int
+    output_dir: str
+    processor: BatchProcessor = field(repr=False)
+    state: str = "queued"  # one of JOB_STATES except "paused"
+    paused: bool = False
+    progress: int = 0
+    pages: int = 0
+    errors: int = 0
+    error: Optional[str] = None
+    submitted: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    thread: Optional[threading.Thread] = field(default=None, repr=False)
+
+    @property
+    def status(self):
+        if self.paused and self.state in ("queued", "running"):
+            return "paused"
+        return self.state
+
+    @property
+    def active(self):
+        return self.state not in FINISHED_STATES
+
+    def snapshot(self) -> dict:
+        """
+        Returns the job's state as a JSON-serializable dict.
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "priority": PRIORITIES[self.priority],
+            "state": self.status,
+            "progress": self.progress,
+            "pages": self.pages,
+            "errors": self.errors,
+            "error": self.error,
+            "output_dir": self.output_dir,
+            "submitted": self.submitted,
+            "finished": self.finished,
+        }
+
+
+class JobQueue:
+    """
+    Runs submitted batches concurrently on one SharedPool of `workers`
+    OCR workers. Higher-priority jobs get every free worker first; jobs of
+    the same priority share them page by page.
+
+    on_event(job, event) is called with every pipeline event of every job,
+    from that job's own thread.
+    """
+
+    def __init__(self, workers=None, executor="process", max_running=DEFAULT_MAX_RUNNING,
+                 on_event=None):
+        self.pool = SharedPool(workers, executor)
+        self.max_running = max_running
+        self.on_event = on_event
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._closed = False
+
+    @property
+    def workers(self):
+        return self.pool.workers
+
+    def submit(self, file_list, output_dir, priority="normal", name=None, **options):
+        """
+        Queues a batch and returns its Job. options are passed on to
+        BatchProcessor (except workers and executor, which come from the
+        shared pool). Raises ValueError if an unfinished job already writes
+        to output_dir.
+        """
+        level = priority_level(priority)
+        output_dir = os.path.abspath(output_dir)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("JobQueue is shut down")
+            if any(job.active and job.output_dir == output_dir for job in self._jobs.values()):
+                raise ValueError(f"Another job is already writing to {output_dir}")
+            job_id = f"job-{next(self._ids)}"
+            processor = BatchProcessor(file_list, output_dir, workers=self.pool.workers,
+                                       executor=self.pool.executor(job_id, level), **options)
+            job = Job(job_id, name or job_id, level, output_dir, processor)
+            self._jobs[job_id] = job
+            self._start_next()
+        return job
+
+    def get(self, job_id) -> Job:
+        return self._jobs[job_id]
+
+    def jobs(self):
+        """
+        Returns all jobs, in submission order.
+        """
+        with self._cond:
+            return list(self._jobs.values())
+
+    def set_priority(self, job_id, priority):
+        with self._cond:
+            job = self._jobs[job_id]
+            job.priority = priority_level(priority)
+            self.pool.set_priority(job_id, job.priority)
+            self._start_next()
+
+    def pause(self, job_id):
+        """
+        Stops giving the job workers. Its pages already being OCR'd finish.
+        """
+        with self._cond:
+            job = self._jobs[job_id]
+            if job.active:
+                job.paused = True
+                self.pool.pause(job_id)
+
+    def resume(self, job_id):
+        with self._cond:
+            job = self._jobs[job_id]
+            if job.paused:
+                job.paused = False
+                self.pool.resume(job_id)
+                self._start_next()
+
+    def cancel(self, job_id):
+        """
+        Cancels a job. A running job stops after its current pages, leaving
+        what it already wrote (and its manifest, for --resume).
+        """
+        with self._cond:
+            job = self._jobs[job_id]
+            if not job.active:
+                return
+            job.processor.cancel()
+            if job.thread is None:
+                self._finish(job, "cancelled")
+        # Unblocks the job's OCR stage if it is waiting on a queued page
+        self.pool.release(job_id)
+
+    def remove(self, job_id):
+        """
+        Forgets a finished job.
+        """
+        with self._cond:
+            if not self._jobs[job_id].active:
+                del self._jobs[job_id]
+
+    def wait(self, timeout=None):
+        """
+        Blocks until every job has finished. Returns False on timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not any(job.active for job in self._jobs.values()), timeout)
+
+    def shutdown(self, wait=True):
+        """
+        Cancels all unfinished jobs and stops the pool.
+        """
+        with self._cond:
+            self._closed = True
+            active = [job.id for job in self._jobs.values() if job.active]
+        for job_id in active:
+            self.cancel(job_id)
+        if wait:
+            self.wait()
+        self.pool.shutdown()
+
+    def _start_next(self):
+        """
+        Starts queued jobs, highest priority and then oldest first, while
+        there is room. A job that outranks every running job always
+        starts. Called with the lock held.
+        """
+        while not self._closed:
+            running = [job for job in self._jobs.values() if job.state == "running"]
+            waiting = [job for job in self._jobs.values()
+                       if job.state == "queued" and not job.paused]
+            if not waiting:
+                return
+            job = max(waiting, key=lambda job: (job.priority, -job.submitted))
+            if (self.max_running and len(running) >= self.max_running
+                    and job.priority <= min(other.priority for other in running)):
+                return
+            job.state = "running"
+            job.thread = threading.Thread(target=self._run, args=(job,),
+                                          name=f"ocr-{job.id}", daemon=True)
+            job.thread.start()
+
+    def _finish(self, job, state, error=None):
+        job.state = state
+        job.error = error
+        job.finished = time.time()
+        self._start_next()
+        self._cond.notify_all()
+
+    def _emit(self, job, event):
+        if self.on_event is not None:
+            try:
+                self.on_event(job, event)
+            except Exception:
+                pass
+
+    def _run(self, job):
+        state, error = "failed", None
+        try:
+            for event in job.processor.events():
+                if isinstance(event, ProgressEvent):
+                    job.progress = event.percent
+                elif isinstance(event, PageEvent):
+                    job.pages += 1
+                elif isinstance(event, ErrorEvent):
+                    job.errors += 1
+                elif isinstance(event, DoneEvent):
+                    state = "cancelled" if event.cancelled else "done"
+                self._emit(job, event)
+        except Exception as e:
+            error = str(e)
+            self._emit(job, LogEvent(f"Job failed: {e}"))
+        finally:
+            self.pool.release(job.id)
+            with self._cond:
+                self._finish(job, state, error)
+
+
+class QueueDirectory:
+    """
+    Headless front end for a JobQueue: each `<name>.job.json` dropped into
+    the folder becomes a job, and its state is kept in `<name>.status.json`.
+    An empty `<name>.pause`, `<name>.resume` or `<name>.cancel` file, or a
+    `<name>.priority` file holding "low", "normal" or "high", controls a
+    job and is deleted once applied.
+
+    parse_job(spec) turns a loaded job file into (file_list, output_dir,
+    options) for JobQueue.submit, raising ValueError for invalid ones.
+    Jobs whose status file says they finished are not run again.
+    """
+
+    JOB_SUFFIX = ".job.json"
+    STATUS_SUFFIX = ".status.json"
+    CONTROLS = ("pause", "resume", "cancel", "priority")
+
+    def __init__(self, folder, jobs: JobQueue, parse_job, log=None, poll_seconds=1.0):
+        self.folder = folder
+        self.jobs = jobs
+        self.parse_job = parse_job
+        self.log = log or (lambda message: None)
+        self.poll_seconds = poll_seconds
+        self._by_name = {}    # job file name -> job id
+        self._written = {}    # job file name -> last status written
+        self._cancelled = set()  # job file names cancelled through a .cancel file
+        self._stop = threading.Event()
+
+    def stop(self):
+        """
+        Ends run(). Safe to call from any thread (and signal handlers).
+        """
+        self._stop.set()
+
+    def _path(self, name, suffix):
+        return os.path.join(self.folder, name + suffix)
+
+    def _write_status(self, name, status):
+        if self._written.get(name) == status:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(status, f, indent=2)
+        os.replace(tmp, self._path(name, self.STATUS_SUFFIX))
+        self._written[name] = status
+
+    def _finished_before(self, name):
+        try:
+            with open(self._path(name, self.STATUS_SUFFIX), encoding="utf-8") as f:
+                return json.load(f).get("state") in FINISHED_STATES
+        except (OSError, ValueError):
+            return False
+
+    def _submit_new(self):
+        for entry in sorted(os.scandir(self.folder), key=lambda e: e.name):
+            if not entry.name.endswith(self.JOB_SUFFIX):
+                continue
+            name = entry.name[:-len(self.JOB_SUFFIX)]
+            if name in self._by_name or name in self._written or self._finished_before(name):
+                continue
+            try:
+                with open(entry.path, encoding="utf-8") as f:
+                    spec = json.load(f)
+                file_list, output_dir, options = self.parse_job(spec)
+                job = self.jobs.submit(file_list, output_dir,
+                                       priority=spec.get("priority", "normal"),
+                                       name=spec.get("name", name), **options)
+            except Exception as e:
+                # Any bad job file (not an object, unusable backend, ...) is
+                # rejected; it mustn't stop the folder loop for later jobs
+                self.log(f"Rejected {entry.name}: {e}")
+                try:
+                    self._write_status(name, {"name": name, "state": "failed", "error": str(e)})
+                except OSError as e:
+                    self.log(f"Failed to write the status of {entry.name}: {e}")
+                    # Not retried until the next start, like other rejected jobs
+                    self._written[name] = None
+                continue
+            self._by_name[name] = job.id
+            self.log(f"Queued {entry.name} as {job.id} ({PRIORITIES[job.priority]} priority).")
+
+    def _apply_controls(self):
+        for name, job_id in self._by_name.items():
+            for control in self.CONTROLS:
+                path = self._path(name, "." + control)
+                if not os.path.exists(path):
+                    continue
+                try:
+                    if control == "priority":
+                        with open(path, encoding="utf-8") as f:
+                            self.jobs.set_priority(job_id, f.read().strip())
+                    else:
+                        getattr(self.jobs, control)(job_id)
+                        if control == "cancel":
+                            self._cancelled.add(name)
+                    self.log(f"{control.capitalize()}: {name}")
+                except (OSError, ValueError) as e:
+                    self.log(f"Ignored {os.path.basename(path)}: {e}")
+                finally:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def _update_statuses(self, interrupted=False):
+        for name, job_id in list(self._by_name.items()):
+            status = self.jobs.get(job_id).snapshot()
+            # Jobs cut short by shutdown run again on the next start
+            if interrupted and status["state"] == "cancelled" and name not in self._cancelled:
+                status["state"] = "interrupted"
+            self._write_status(name, status)
+            if status["state"] in FINISHED_STATES:
+                del self._by_name[name]
+                self.jobs.remove(job_id)
+
+    def run(self):
+        """
+        Picks up job files until stop() is called, then cancels unfinished
+        jobs and marks them "interrupted" so the next run picks them up
+        again.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        self.log(f"Watching {self.folder} for *{self.JOB_SUFFIX} files; press Ctrl+C to stop.")
+        try:
+            while not self._stop.is_set():
+                self._submit_new()
+                self._apply_controls()
+                self._update_statuses()
+                self._stop.wait(self.poll_seconds)
+        finally:
+            self.jobs.shutdown()
+            self._update_statuses(interrupted=True)
@@ -0,0 +1,97 @@
+# ocr/languages.py
+"""
+Language data for the optional per-page language pre-pass: which
+Tesseract languages are written in which script (as named by Tesseract's
+OSD), and a few very common words per language for telling languages of
+the same script apart.
+"""
+import unicodedata
+
+DEFAULT_LANG = "eng"
+
+# OSD script name -> Tesseract languages written in it
+SCRIPT_LANGUAGES = {
+    "Latin": {"eng", "deu", "fra", "spa", "ita", "por", "nld", "dan", "swe", "nor", "fin",
+              "pol", "ces", "slk", "slv", "hrv", "hun", "ron", "tur", "cat", "lat", "vie",
+              "ind", "msa", "est", "lav", "lit"},
+    "Cyrillic": {"rus", "ukr", "bel", "bul", "srp", "mkd", "kaz"},
+    "Greek": {"ell", "grc"},
+    "Arabic": {"ara", "fas", "urd", "pus"},
+    "Hebrew": {"heb", "yid"},
+    "Devanagari": {"hin", "mar", "nep", "san"},
+    "Bengali": {"ben", "asm"},
+    "Thai": {"tha"},
+    "Han": {"chi_sim", "chi_tra", "chi_sim_vert", "chi_tra_vert"},
+    "Japanese": {"jpn", "jpn_vert"},
+    "Katakana": {"jpn", "jpn_vert"},
+    "Hiragana": {"jpn", "jpn_vert"},
+    "Hangul": {"kor", "kor_vert"},
+    "Korean": {"kor", "kor_vert"},
+}
+
+# Frequent short words, without accents, that survive OCR with any Latin
+# language model
+STOPWORDS = {
+    "eng": {"the", "and", "of", "to", "in", "is", "that", "for", "it", "with", "as", "was",
+            "on", "are", "this", "be", "by", "not", "or", "have"},
+    "deu": {"der", "die", "das", "und", "ist", "nicht", "mit", "sich", "auf", "ein", "eine",
+            "den", "von", "zu", "im", "dem", "des", "auch", "fur", "wird"},
+    "fra": {"le", "la", "les", "et", "des", "est", "une", "pour", "dans", "que", "qui", "pas",
+            "sur", "au", "du", "par", "il", "ce", "sont", "avec"},
+    "spa": {"el", "la", "los", "las", "y", "de", "que", "en", "es", "por", "para", "una",
+            "con", "no", "del", "se", "al", "lo", "como", "mas"},
+    "ita": {"il", "la", "di", "che", "e", "un", "una", "per", "non", "sono", "del", "della",
+            "con", "si", "nel", "gli", "le", "da", "al", "come"},
+    "por": {"o", "a", "os", "as", "de", "que", "e", "do", "da", "em", "um", "uma", "para",
+            "com", "nao", "por", "se", "dos", "das", "mais"},
+    "nld": {"de", "het", "een", "en", "van", "is", "dat", "op", "te", "in", "niet", "zijn",
+            "voor", "met", "die", "aan", "er", "ook", "als", "bij"},
+}
+
+# A language is kept if it scores at least this share of the best one's
+# stopword hits (mixed-language pages keep both)
+STOPWORD_KEEP_RATIO = 0.5
+
+# Fewer hits than this is too little evidence to drop any language
+MIN_STOPWORD_HITS = 3
+
+
+def split_langs(lang: str):
+    """
+    Splits a Tesseract language string ("eng+deu") into a list.
+    """
+    return [part for part in lang.split("+") if part]
+
+
+def languages_for_script(langs, script: str):
+    """
+    Returns the languages in `langs` that are written in `script`, keeping
+    ones whose script isn't known. Returns `langs` unchanged if none match.
+    """
+    known = set().union(*SCRIPT_LANGUAGES.values())
+    script_langs = SCRIPT_LANGUAGES.get(script, set())
+    kept = [lang for lang in langs if lang in script_langs or lang not in known]
+    return kept or list(langs)
+
+
+def _normalize(word: str):
+    word = unicodedata.normalize("NFKD", word.lower())
+    return "".join(c for c in word if c.isalpha() and not unicodedata.combining(c))
+
+
+def languages_from_stopwords(text: str, langs):
+    """
+    Narrows `langs` down to the languages whose common words appear in
+    `text`. Languages without a stopword list are always kept, and
+    nothing is dropped when the text has too few hits to tell.
+    """
+    scored = [lang for lang in langs if lang in STOPWORDS]
+    if len(scored) < 2:
+        return list(langs)
+    words = [_normalize(word) for word in text.split()]
+    hits = {lang: sum(1 for word in words if word in STOPWORDS[lang]) for lang in scored}
+    best = max(hits.values())
+    if best < MIN_STOPWORD_HITS:
+        return list(langs)
+    return [lang for lang in langs
+            if lang not in STOPWORDS or hits[lang] >= best * STOPWORD_KEEP_RATIO]
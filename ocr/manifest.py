@@ -0,0 +1,119 @@
+# ocr/manifest.py
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+# Stored in the output folder, next to the results
+MANIFEST_NAME = ".ocr_job.sqlite"
+PAGES_DIR_NAME = ".ocr_job_pages"
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class JobManifest:
+    """
+    On-disk record of a batch job, used to resume interrupted runs.
+
+    One row per page of each input (page 0 for plain images) records the
+    source path, its size and mtime, the status and where the result was
+    written. A page only counts as done while its source is unchanged and
+    its output still exists. Concatenated runs keep each page's result in
+    PAGES_DIR_NAME, so a resumed run can rebuild the final file without
+    re-OCRing finished pages.
+
+    Safe to share between the pipeline's stage threads.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.pages_dir = os.path.join(output_dir, PAGES_DIR_NAME)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " source TEXT NOT NULL, page INTEGER NOT NULL,"
+            " size INTEGER, mtime REAL, status TEXT, output TEXT, error TEXT,"
+            " updated REAL, PRIMARY KEY (source, page))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS job (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._db.commit()
+
+    def start(self, settings: dict, resume: bool):
+        """
+        Prepares the manifest for a run. Returns True if earlier progress
+        is kept: resume was requested and the job settings are unchanged.
+        Otherwise the manifest and intermediate pages are reset.
+        """
+        encoded = json.dumps(settings, sort_keys=True)
+        row = self._db.execute("SELECT value FROM job WHERE key = 'settings'").fetchone()
+        keep = resume and row is not None and row[0] == encoded
+        if not keep:
+            self._db.execute("DELETE FROM items")
+            shutil.rmtree(self.pages_dir, ignore_errors=True)
+        self._db.execute("INSERT OR REPLACE INTO job VALUES ('settings', ?)", (encoded,))
+        self._db.commit()
+        return keep
+
+    def done_pages(self, source):
+        """
+        Returns {page: output_path} for finished pages of an unchanged source.
+        """
+        try:
+            st = os.stat(source)
+        except OSError:
+            return {}
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT page, output FROM items"
+                " WHERE source = ? AND size = ? AND mtime = ? AND status = ?",
+                (os.path.abspath(source), st.st_size, st.st_mtime, STATUS_DONE),
+            ).fetchall()
+        return {page: output for page, output in rows if output and os.path.exists(output)}
+
+    def _record(self, source, page, status, output=None, error=None):
+        try:
+            st = os.stat(source)
+            size, mtime = st.st_size, st.st_mtime
+        except OSError:
+            size = mtime = None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(source), page, size, mtime, status, output, error, time.time()),
+            )
+            self._db.commit()
+
+    def mark_done(self, source, page, output):
+        self._record(source, page, STATUS_DONE, output=output)
+
+    def mark_failed(self, source, page, error):
+        self._record(source, page, STATUS_FAILED, error=str(error))
+
+    def page_result_path(self, source, page, output_format):
+        """
+        Returns where a concatenated run keeps one page's intermediate result.
+        """
+        os.makedirs(self.pages_dir, exist_ok=True)
+        digest = hashlib.sha1(os.path.abspath(source).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.pages_dir, f"{digest}_p{page}.{output_format}")
+
+    def finish(self):
+        """
+        Called after a complete, successful run: intermediate pages are no
+        longer needed once the final output is written.
+        """
+        shutil.rmtree(self.pages_dir, ignore_errors=True)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
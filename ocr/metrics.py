@@ -0,0 +1,133 @@
+# ocr/metrics.py
+import csv
+import json
+import os
+import time
+from collections import deque
+
+# Pipeline stages that are timed, in pipeline order
+STAGES = ["rasterize", "load", "preprocess", "detect", "ocr", "write", "merge"]
+
+# Written next to the outputs at the end of each run
+REPORT_NAME = "ocr_report"
+
+
+class RunStats:
+    """
+    Collects per-page and per-stage timings for one batch run and turns
+    them into a live throughput/ETA readout and a JSON/CSV report.
+    Stage times are summed across workers, so with a pool they can add up
+    to more than the wall-clock time. With max_rows, only the newest
+    per-page rows are kept (the totals still cover every page), so a run
+    that never ends doesn't grow without bound.
+    """
+
+    def __init__(self, max_rows=None):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.stage_totals = dict.fromkeys(STAGES, 0.0)
+        self.page_rows = deque(maxlen=max_rows) if max_rows else []
+        self.pages = 0
+        self.cached = 0
+        self.text_layer = 0
+        self.errors = 0
+        self.bytes_processed = 0
+        # stage -> [samples, sum, max] of the pipeline queue depths
+        self.queue_depths = {}
+
+    def add_stage(self, stage, seconds):
+        self.stage_totals[stage] += seconds
+
+    def add_page(self, name, source, page, status, timings, nbytes=0):
+        """
+        Records one handled page. status is "ocr", "cached", "resumed",
+        "text" (PDF text layer) or "error"; timings maps stage name to
+        seconds.
+        """
+        for stage, seconds in timings.items():
+            self.add_stage(stage, seconds)
+        if status == "error":
+            self.errors += 1
+        else:
+            self.pages += 1
+            if status == "text":
+                self.text_layer += 1
+            elif status != "ocr":
+                self.cached += 1
+        self.bytes_processed += nbytes
+
+        row = {"name": name, "source": source, "page": page, "status": status, "bytes": nbytes}
+        for stage in STAGES:
+            row[stage] = round(timings.get(stage, 0.0), 6)
+        self.page_rows.append(row)
+
+    def add_queue_depths(self, depths):
+        """
+        Records one sample of the pipeline's queue depths ({stage: pages}).
+        """
+        for stage, depth in depths.items():
+            entry = self.queue_depths.setdefault(stage, [0, 0, 0])
+            entry[0] += 1
+            entry[1] += depth
+            entry[2] = max(entry[2], depth)
+
+    def elapsed(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    def pages_per_second(self):
+        elapsed = self.elapsed()
+        return self.pages / elapsed if elapsed > 0 else 0.0
+
+    def eta(self, progress):
+        """
+        Returns the estimated seconds left given the fraction done, or None.
+        """
+        if progress <= 0:
+            return None
+        return self.elapsed() * (1 - progress) / progress
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self):
+        elapsed = self.elapsed()
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "pages": self.pages,
+            "cached_pages": self.cached,
+            "text_layer_pages": self.text_layer,
+            "errors": self.errors,
+            "pages_per_second": round(self.pages_per_second(), 3),
+            "bytes_processed": self.bytes_processed,
+            "megabytes_per_second": round(self.bytes_processed / 1e6 / elapsed, 3) if elapsed > 0 else 0.0,
+            "stage_seconds": {stage: round(t, 3) for stage, t in self.stage_totals.items()},
+            "queue_depths": {
+                stage: {"mean": round(total / samples, 2), "max": peak}
+                for stage, (samples, total, peak) in self.queue_depths.items()
+            },
+        }
+
+    def write_report(self, output_dir, name=REPORT_NAME):
+        """
+        Writes <name>.json (summary plus per-page rows) and <name>.csv
+        (per-page rows) to output_dir and returns both paths.
+        """
+        json_path = os.path.join(output_dir, name + ".json")
+        csv_path = os.path.join(output_dir, name + ".csv")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), "pages": list(self.page_rows)}, f, indent=2)
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            fields = ["name", "source", "page", "status", "bytes"] + STAGES
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self.page_rows)
+        return json_path, csv_path
+
+
+def format_duration(seconds):
+    """
+    Formats seconds as H:MM:SS.
+    """
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
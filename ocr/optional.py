@@ -0,0 +1,24 @@
+# ocr/optional.py
+"""
+Optional dependencies (pdf2image, PyPDF2, tesserocr, watchdog, NumPy)
+are imported on first use rather than at startup, so the window and the
+command line come up without paying for libraries a run may not need:
+
+    pdf2image = optional_module("pdf2image")
+    if pdf2image is None:
+        ...  # not installed
+"""
+import importlib
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def optional_module(name: str):
+    """
+    Imports and returns a module, or None if it isn't installed. The
+    import is only attempted once.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
@@ -1,16 +1,34 @@
 # ocr/pdf_utils.py
+import io
+import uuid
 
-try:
-    from pdf2image import convert_from_path as _pdf2image_convert
-    PDF_SUPPORT = True
-except ImportError:
-    PDF_SUPPORT = False
+from ocr.optional import optional_module
 
-try:
-    from PyPDF2 import PdfMerger
-    PDF_MERGE_SUPPORT = True
-except ImportError:
-    PDF_MERGE_SUPPORT = False
+# A page counts as having a text layer when it yields at least this many
+# characters, mostly letters, digits and whitespace (not font garbage).
+MIN_TEXT_LAYER_CHARS = 25
+MIN_TEXT_LAYER_CLEAN_RATIO = 0.7
+# A page with one image drawn over at least this share of it is a scan.
+# Its text only counts when there is this much per square inch (an earlier
+# OCR layer); a Bates stamp, fax header or page footer is far below it.
+SCAN_IMAGE_COVERAGE = 0.5
+MIN_SCAN_TEXT_PER_SQ_INCH = 4
+# Nested form XObjects followed when looking for images
+MAX_FORM_DEPTH = 4
+
+
+def pdf_support():
+    """
+    True if pdf2image is installed (imported on the first call).
+    """
+    return optional_module("pdf2image") is not None
+
+
+def pdf_merge_support():
+    """
+    True if PyPDF2 is installed (imported on the first call).
+    """
+    return optional_module("PyPDF2") is not None
 
 
 def convert_from_path(pdf_path):
@@ -18,19 +36,171 @@ def convert_from_path(pdf_path):
     Wrapper for pdf2image.convert_from_path.
     Raises an error if pdf2image is not installed.
     """
-    if not PDF_SUPPORT:
+    if not pdf_support():
+        raise RuntimeError("pdf2image is not installed; cannot convert PDFs.")
+    return optional_module("pdf2image").convert_from_path(pdf_path)
+
+
+def pdf_page_count(pdf_path):
+    """
+    Returns the number of pages in a PDF without rasterizing it.
+    """
+    if not pdf_support():
+        raise RuntimeError("pdf2image is not installed; cannot convert PDFs.")
+    return int(optional_module("pdf2image").pdfinfo_from_path(pdf_path)["Pages"])
+
+
+def iter_pdf_pages(pdf_path, output_folder, window=1, page_count=None, pages=None):
+    """
+    Lazily rasterizes a PDF, `window` pages at a time.
+    Yields (page_index, png_path) with page_index starting at 0. Pages are
+    written to output_folder and never held in memory; the caller owns the
+    files and should delete them once they have been OCR'd. `pages`
+    optionally restricts rasterization to a sorted list of page indexes.
+    """
+    if not pdf_support():
         raise RuntimeError("pdf2image is not installed; cannot convert PDFs.")
-    return _pdf2image_convert(pdf_path)
+    pdf2image = optional_module("pdf2image")
+    if page_count is None:
+        page_count = pdf_page_count(pdf_path)
+    if pages is None:
+        pages = range(page_count)
+
+    # Group the wanted pages into runs of consecutive pages, at most
+    # `window` long, so each run is one pdf2image call.
+    runs = []
+    for idx in pages:
+        if runs and idx == runs[-1][-1] + 1 and len(runs[-1]) < window:
+            runs[-1].append(idx)
+        else:
+            runs.append([idx])
+
+    prefix = uuid.uuid4().hex
+    for run in runs:
+        first, last = run[0] + 1, run[-1] + 1
+        paths = pdf2image.convert_from_path(
+            pdf_path,
+            first_page=first,
+            last_page=last,
+            output_folder=output_folder,
+            output_file=f"{prefix}_{first:06d}",
+            fmt="png",
+            paths_only=True,
+        )
+        # pdf2image zero-pads page numbers, so a sort restores page order
+        for offset, page_path in enumerate(sorted(paths)):
+            yield first - 1 + offset, page_path
+
+
+def open_pdf(pdf_path):
+    """
+    Returns a PyPDF2 PdfReader for reading text layers and copying pages.
+    """
+    if not pdf_merge_support():
+        raise RuntimeError("PyPDF2 is not installed; cannot read PDF text.")
+    return optional_module("PyPDF2").PdfReader(pdf_path)
+
+
+def page_text_layer(reader, index):
+    """
+    Returns the text of a page if it has a usable text layer (born-digital
+    or already OCR'd), else None. On a scanned page, only text dense
+    enough to cover the scan counts.
+    """
+    try:
+        page = reader.pages[index]
+        text = page.extract_text() or ""
+    except Exception:
+        return None
+    stripped = text.strip()
+    if len(stripped) < MIN_TEXT_LAYER_CHARS:
+        return None
+    clean = sum(1 for c in stripped if c.isalnum() or c.isspace() or c in ".,;:!?'\"()-%$/")
+    if clean / len(stripped) < MIN_TEXT_LAYER_CLEAN_RATIO:
+        return None
+    try:
+        area = abs(float(page.mediabox.width) * float(page.mediabox.height))
+    except Exception:
+        return None
+    try:
+        scanned = _largest_image_area(page) >= area * SCAN_IMAGE_COVERAGE
+    except Exception:
+        # Can't tell; only text dense enough for a scan is trusted then
+        scanned = True
+    if scanned:
+        chars = sum(1 for c in stripped if not c.isspace())
+        if chars < MIN_SCAN_TEXT_PER_SQ_INCH * area / 72 ** 2:
+            return None
+    return text
+
+
+def _largest_image_area(page):
+    """
+    Returns the largest area, in square points, that one image is drawn
+    over on a page.
+    """
+    contents = page.get_contents()
+    if contents is None:
+        return 0.0
+    content_stream = optional_module("PyPDF2.generic").ContentStream
+    return _image_area(content_stream, content_stream(contents, page.pdf), page.pdf,
+                       page.get("/Resources"), 1.0, 0)
+
+
+def _image_area(content_stream, stream, pdf, resources, scale, depth):
+    """
+    Walks a content stream (and the forms it draws) for _largest_image_area.
+    Only areas matter, so the transformation is tracked by its determinant,
+    how much it scales areas, rather than the full matrix.
+    """
+    resources = resources.get_object() if resources is not None else {}
+    xobjects = resources.get("/XObject")
+    xobjects = xobjects.get_object() if xobjects is not None else {}
+    largest, saved = 0.0, []
+    for operands, operator in stream.operations:
+        if operator == b"q":
+            saved.append(scale)
+        elif operator == b"Q":
+            scale = saved.pop() if saved else scale
+        elif operator == b"cm" and len(operands) == 6:
+            a, b, c, d = (float(x) for x in operands[:4])
+            scale *= a * d - b * c
+        elif operator == b"INLINE IMAGE":
+            largest = max(largest, abs(scale))
+        elif operator == b"Do" and operands and operands[0] in xobjects:
+            xobject = xobjects[operands[0]].get_object()
+            subtype = xobject.get("/Subtype")
+            if subtype == "/Image":
+                # Images are drawn over the unit square
+                largest = max(largest, abs(scale))
+            elif subtype == "/Form" and depth < MAX_FORM_DEPTH:
+                a, b, c, d = (float(x) for x in xobject.get("/Matrix", (1, 0, 0, 1))[:4])
+                largest = max(largest, _image_area(
+                    content_stream, content_stream(xobject, pdf), pdf,
+                    xobject.get("/Resources", resources), scale * (a * d - b * c), depth + 1))
+    return largest
+
+
+def page_pdf_bytes(reader, index):
+    """
+    Returns one page of a PDF as a standalone single-page PDF.
+    """
+    writer = optional_module("PyPDF2").PdfWriter()
+    writer.add_page(reader.pages[index])
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
 
 
 def merge_pdfs(pdf_paths, output_path):
     """
-    Merges single-page PDFs into a single multi-page PDF, if PDF_MERGE_SUPPORT is True.
+    Merges single-page PDFs into a single multi-page PDF, if PyPDF2 is installed.
+    Entries may be paths or file-like objects (e.g. io.BytesIO).
     """
-    if not PDF_MERGE_SUPPORT:
+    if not pdf_merge_support():
         raise RuntimeError("PyPDF2 is not installed; cannot merge PDFs.")
 
-    merger = PdfMerger()
+    merger = optional_module("PyPDF2").PdfMerger()
     for pdf_page in pdf_paths:
         merger.append(pdf_page)
     merger.write(output_path)
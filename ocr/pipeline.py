@@ -0,0 +1,898 @@
+# ocr/pipeline.py
+"""
+Qt-free batch OCR pipeline shared by the GUI worker and the command line.
+
+    processor = BatchProcessor(files, "out", output_format="pdf", concatenate=True)
+    for event in processor.events():
+        if isinstance(event, PageEvent):
+            ...
+
+BatchProcessor.run(callback) does the same with a callback, and cancel()
+may be called from any thread.
+"""
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from ocr.engine import (
+    EngineOptions, default_worker_count, frame_count, limit_tesseract_threads,
+    missing_languages, ocr_timed, process_pool, resolve_backend, tesseract_version
+)
+from ocr.file_index import FileIndex
+from ocr.manifest import JobManifest
+from ocr.metrics import RunStats, format_duration
+from ocr.pdf_utils import (
+    iter_pdf_pages, open_pdf, page_pdf_bytes, page_text_layer, pdf_merge_support,
+    pdf_page_count, pdf_support
+)
+from ocr.scheduler import SharedPool
+from ocr.tiling import default_memory_budget, describe_plan, plan_file
+from ocr.writers import create_concat_writer
+
+# Number of PDF pages rasterized per pdf2image call
+PDF_PAGE_WINDOW = 2
+
+# Image formats that can hold several pages (frames)
+MULTI_FRAME_EXTENSIONS = (".tif", ".tiff", ".gif")
+
+# Executor names accepted by BatchProcessor
+EXECUTORS = ["serial", "thread", "process"]
+
+# How often blocked pipeline stages check for cancellation
+STAGE_POLL_SECONDS = 0.1
+
+# Continuous runs (watch folders) keep this many page rows in the report
+# and rewrite it at this interval instead of only at the end
+CONTINUOUS_REPORT_ROWS = 10000
+CONTINUOUS_REPORT_SECONDS = 300
+
+# Marks the end of a stage's output
+_END = object()
+
+
+@dataclass
+class LogEvent:
+    """A human-readable status message."""
+    message: str
+
+
+@dataclass
+class ProgressEvent:
+    """Overall progress of the batch, 0-100."""
+    percent: int
+
+
+@dataclass
+class PageEvent:
+    """One page was OCR'd. output_path is None when concatenating."""
+    index: int
+    name: str
+    result: Any
+    output_path: Optional[str] = None
+
+
+@dataclass
+class ErrorEvent:
+    """OCR failed for one page; the batch carries on."""
+    index: int
+    name: str
+    error: Exception
+
+
+@dataclass
+class StatsEvent:
+    """
+    Live throughput after each page. eta_seconds is None until known.
+    queue_depths maps each pipeline stage to the pages waiting in it.
+    """
+    pages: int
+    pages_per_second: float
+    eta_seconds: Optional[float]
+    bytes_processed: int
+    queue_depths: Optional[dict] = None
+
+
+@dataclass
+class DoneEvent:
+    """Always the last event of a run. stats is RunStats.summary()."""
+    pages: int
+    errors: int
+    cancelled: bool
+    output_path: Optional[str] = None
+    stats: Optional[dict] = None
+
+
+# One page to OCR. path is None for pages resumed from the job manifest,
+# whose finished output is in `resumed`. progress is the fraction of input
+# files done once this page is handled.
+# rasterize is the seconds spent rasterizing the page (PDFs only); frame
+# is the page of a multi-frame TIFF/GIF; direct is a ready-made result for
+# PDF pages that already have a text layer (path is None then too); last
+# marks the final page of its source; error is why the rest of the source
+# couldn't be read (the task then stands for all of its remaining pages).
+PageTask = namedtuple("PageTask",
+                      "name path is_temp progress source page resumed rasterize frame direct "
+                      "last error",
+                      defaults=(0.0, 0, None, True, None))
+
+
+def read_result(path, output_format):
+    """
+    Reads an OCR result back from disk (str for "txt", bytes otherwise).
+    """
+    if output_format == "txt":
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def write_result(path, output_format, result):
+    """
+    Writes one OCR result (str for "txt", bytes otherwise) to disk.
+    """
+    if output_format == "txt":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(result)
+    else:
+        with open(path, "wb") as f:
+            f.write(result)
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class BatchProcessor:
+    """
+    Runs OCR over a list of images and PDFs and writes the outputs.
+    Creates single-page outputs, then merges them if needed (for PDF).
+
+    The run is a pipeline of stages connected by queues: discover (a
+    thread consuming file_list, which may be a lazy iterable such as
+    ocr.discovery.iter_inputs or the never-ending
+    ocr.watch.FolderWatcher.iter_ready) -> rasterize (a thread decoding inputs and
+    rasterizing PDF pages a few at a time) -> OCR (the executor) -> write
+    (the thread consuming events). Each stage works while the others do.
+    The queues after discovery are bounded, so a slow stage applies
+    backpressure instead of letting pages pile up in memory or on disk.
+
+    Every run records the sources it finished in a FileIndex in the output
+    folder. With only_changed, sources whose path, size and mtime are
+    already in the index are skipped.
+
+    `executor` picks where OCR runs: "serial" (this thread), "thread",
+    "process", or an existing concurrent.futures.Executor, which is left
+    running afterwards. By default a process pool is used when workers > 1.
+    Whatever the executor, results are consumed in input order, so
+    concatenated outputs keep page order.
+
+    With an ocr.autotune.AutoTuner as `autotune`, an owned pool is
+    created with `workers` processes (or threads) and the tuner decides
+    how many of them take pages, and with how many Tesseract threads.
+
+    Set continuous for inputs that never end, such as a watch folder: the
+    performance report then keeps only the newest pages and is rewritten
+    every few minutes rather than only when the run ends.
+    """
+
+    def __init__(self, file_list, output_dir, concatenate=False, output_format="txt",
+                 concat_filename=None, workers=None, executor=None, cache=None,
+                 backend="auto", resume=False, preprocess=None, use_text_layer=True,
+                 only_changed=False, engine_options=None, memory_budget=None,
+                 autotune=None, continuous=False):
+        if only_changed and concatenate:
+            raise ValueError("only_changed can't be combined with concatenate: "
+                             "the combined file would miss the unchanged inputs")
+        self._inputs = file_list
+        self._expected = len(file_list) if hasattr(file_list, "__len__") else None
+        self.found = 0  # sources found so far by the discover stage
+        self.skipped = 0  # sources skipped as unchanged
+        self.output_dir = output_dir
+        self.concatenate = concatenate
+        self.output_format = output_format  # "txt", "hocr", "pdf" or "words"
+        self.concat_filename = concat_filename or f"all_ocr_results.{output_format}"
+        self.workers = max(1, workers or default_worker_count())
+        # Bytes each OCR worker may use; larger images are tiled or shrunk
+        self.memory_budget = memory_budget or default_memory_budget(self.workers)
+        if executor is None:
+            executor = "process" if self.workers > 1 else "serial"
+        if isinstance(executor, str) and executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor {executor!r}; expected one of {EXECUTORS}")
+        self.executor = executor
+        # Remote workers (ocr.cluster) size pages against their own memory,
+        # so the budget here doesn't decide how pages are tiled or shrunk
+        self._local_plan = not getattr(executor, "remote", False)
+        self.cache = cache  # optional ocr.cache.OCRCache
+        # Resolved up front so an unusable backend fails before the run
+        self.backend = resolve_backend(backend, output_format)
+        self.preprocess = preprocess  # optional ocr.preprocess.PreprocessOptions
+        self.engine_options = engine_options or EngineOptions()
+        self.autotune = autotune
+        # Workers taking pages at once, and Tesseract's threads (None = as
+        # the pool set them up); the autotuner changes both during a run
+        self._concurrency = self.workers
+        self._threads = None
+        self.resume = resume
+        self.use_text_layer = use_text_layer
+        self.only_changed = only_changed
+        # Inputs never end (e.g. a watch folder); see CONTINUOUS_REPORT_ROWS
+        self.continuous = continuous
+        self.manifest = None
+        self.index = None
+        self._discovered = threading.Event()
+        self._failed_sources = set()
+        self.resuming = False
+        self.temp_dir = None
+        self._cancel = threading.Event()
+        self._stop = threading.Event()
+        self._pending_events = deque()
+        self._queues = None
+        self._in_flight = deque()
+
+    def cancel(self):
+        """
+        Stops the run after the page currently being consumed.
+        Pending tasks are cancelled. Safe to call from any thread.
+        """
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def log(self, message):
+        # deque appends are thread-safe, so any stage may log
+        self._pending_events.append(LogEvent(message))
+
+    def _drain(self):
+        while self._pending_events:
+            yield self._pending_events.popleft()
+
+    def _create_pool(self):
+        """
+        Returns (pool, owned). pool is None for serial runs; owned pools are
+        shut down at the end of the run.
+        """
+        if isinstance(self.executor, Executor):
+            return self.executor, False
+        if self.executor == "process":
+            return process_pool(self.workers), True
+        if self.executor == "thread":
+            # Each thread drives its own tesseract subprocess
+            return ThreadPoolExecutor(max_workers=self.workers,
+                                      initializer=limit_tesseract_threads), True
+        return None, False
+
+    def _total(self, i):
+        """
+        Returns the number of sources to use for progress while source i
+        is handled: the final count once discovery is done, else the best
+        guess so far.
+        """
+        if self._discovered.is_set():
+            return self.found
+        return max(self._expected or 0, self.found, i + 1)
+
+    def iter_pages(self, sources):
+        """
+        Yields a PageTask for every page of the sources read from the
+        `sources` queue, in input order. PDFs are rasterized lazily into
+        self.temp_dir, PDF_PAGE_WINDOW pages at a time, so only a few pages
+        exist on disk at once. When resuming, pages the manifest has as
+        done are yielded without an image.
+        """
+        i = -1
+        while True:
+            source = self._get(sources)
+            if source is _END:
+                return
+            i += 1
+            total = self._total(i)
+            filename = os.path.basename(source)
+            done = self.manifest.done_pages(source) if self.resuming else {}
+            ext = os.path.splitext(source)[1].lower()
+            if ext in MULTI_FRAME_EXTENSIONS:
+                yield from self.iter_frames(i, total, source, done)
+                continue
+            if ext != ".pdf":
+                yield PageTask(filename, source, False, (i + 1) / total, source, 0, done.get(0))
+                continue
+
+            yield from self.iter_pdf(i, total, source, done)
+
+    def iter_pdf(self, i, total, source, done):
+        """
+        Yields one PageTask per PDF page. Pages with a usable text layer
+        take a fast path when the output allows it: their text (TXT) or
+        the original page (searchable PDF) is used as is. Only image-only
+        pages are rasterized and OCR'd.
+        """
+        filename = os.path.basename(source)
+        fast_path = (self.use_text_layer and pdf_merge_support()
+                     and self.output_format in ("txt", "pdf"))
+        if not pdf_support() and not fast_path:
+            self.log("PDF support not installed; skipping " + filename)
+            return
+        idx = 0
+        try:
+            # Pre-scan for pages that already have text
+            reader, text_pages = None, {}
+            if fast_path:
+                try:
+                    reader = open_pdf(source)
+                    page_count = len(reader.pages)
+                    for page in range(page_count):
+                        if page not in done:
+                            text = page_text_layer(reader, page)
+                            if text is not None:
+                                text_pages[page] = text
+                except Exception as e:
+                    # Poppler may still rasterize what PyPDF2 can't parse
+                    self.log(f"{filename}: can't read its text layer ({e}); OCRing every page.")
+                    reader, text_pages = None, {}
+                if text_pages:
+                    self.log(f"{filename}: {len(text_pages)} of {page_count} page(s) "
+                             f"already have a text layer; skipping OCR for them.")
+            if reader is None:
+                page_count = pdf_page_count(source)
+
+            todo = [idx for idx in range(page_count)
+                    if idx not in done and idx not in text_pages]
+            if done:
+                self.log(f"Resuming {filename}: {len(done)} of "
+                         f"{page_count} page(s) already done.")
+            if todo and not pdf_support():
+                self.log(f"PDF support not installed; skipping {len(todo)} "
+                         f"image-only page(s) of {filename}")
+                self._failed_sources.add(source)
+                todo = []
+            elif todo:
+                self.log(f"Rasterizing {filename} ({len(todo)} page(s))...")
+            rasterized = iter_pdf_pages(source, self.temp_dir, window=PDF_PAGE_WINDOW,
+                                        page_count=page_count, pages=todo) if todo else iter(())
+            todo = set(todo)
+
+            for idx in range(page_count):
+                name = f"{filename}_page_{idx}.png"
+                progress = (i + (idx + 1) / page_count) / total
+                last = idx == page_count - 1
+                if idx in done:
+                    yield PageTask(name, None, False, progress, source, idx, done[idx],
+                                   last=last)
+                elif idx in text_pages:
+                    direct = (text_pages[idx] if self.output_format == "txt"
+                              else page_pdf_bytes(reader, idx))
+                    yield PageTask(name, None, False, progress, source, idx, None,
+                                   direct=direct, last=last)
+                elif idx in todo:
+                    started = time.perf_counter()
+                    _, page_path = next(rasterized)
+                    yield PageTask(name, page_path, True, progress, source, idx, None,
+                                   time.perf_counter() - started, last=last)
+        except Exception as e:
+            self._failed_sources.add(source)
+            self.log(f"Failed to convert PDF {source}: {e}")
+            # Reported like a failed page, so the job isn't finished and can be resumed
+            yield PageTask(f"{filename}_page_{idx}.png", None, False, (i + 1) / total, source,
+                           idx, None, error=e)
+
+    def iter_frames(self, i, total, source, done):
+        """
+        Yields one PageTask per frame of a TIFF/GIF. Frames are not decoded
+        here; each OCR task seeks to its own frame.
+        """
+        filename = os.path.basename(source)
+        try:
+            frames = frame_count(source)
+        except Exception:
+            # Let OCR report the unreadable file like any other image
+            frames = 1
+        if frames == 1:
+            yield PageTask(filename, source, False, (i + 1) / total, source, 0, done.get(0))
+            return
+
+        self.log(f"{filename} has {frames} page(s).")
+        for idx in range(frames):
+            yield PageTask(f"{filename}_page_{idx}.png", source, False,
+                           (i + (idx + 1) / frames) / total, source, idx, done.get(idx),
+                           frame=idx, last=idx == frames - 1)
+
+    def submit(self, pool, task):
+        """
+        Returns (future, cache_key, status) for one page. The future
+        resolves to (result, timings). status is "resumed", "text" (PDF
+        text layer), "cached", "error" (unreadable source) or "ocr"; all but
+        "ocr" resolve immediately and get no key (nothing to store). Without a pool, OCR runs synchronously in
+        this thread.
+        """
+        if task.error is not None:
+            future = Future()
+            future.set_exception(task.error)
+            return future, None, "error"
+
+        if task.resumed is not None:
+            future = Future()
+            try:
+                # Per-file outputs are already on disk; concatenated runs
+                # need the page's intermediate result for the final file.
+                future.set_result((read_result(task.resumed, self.output_format)
+                                   if self.concatenate else None, {}))
+            except Exception as e:
+                future.set_exception(e)
+            return future, None, "resumed"
+
+        if task.direct is not None:
+            future = Future()
+            future.set_result((task.direct, {}))
+            return future, None, "text"
+
+        key = None
+        if self.cache is not None:
+            try:
+                config = (f"{self.engine_options.config()} backend={self.backend} "
+                          f"{self.engine_options.describe()}")
+                if self.preprocess is not None and self.preprocess.enabled():
+                    config += " " + self.preprocess.describe()
+                # The memory budget decides whether the page is OCR'd whole,
+                # in tiles or shrunk, and each gives a different result
+                if self._local_plan:
+                    plan = plan_file(task.path, task.frame, self.memory_budget,
+                                     self.output_format)
+                    config += f" plan={describe_plan(plan)}"
+                key = self.cache.key(task.path, self.output_format, config,
+                                     tesseract_version(), task.frame)
+                cached = self.cache.get(key, self.output_format)
+            except Exception as e:
+                self.log(f"Cache lookup failed: {e}")
+                key, cached = None, None
+            if cached is not None:
+                future = Future()
+                future.set_result((cached, {}))
+                return future, None, "cached"
+
+        args = (ocr_timed, task.path, self.output_format, self.backend, self.preprocess,
+                task.frame, self.engine_options, self.memory_budget, self._threads)
+        if pool is not None:
+            return pool.submit(*args), key, "ocr"
+
+        future = Future()
+        try:
+            future.set_result(args[0](*args[1:]))
+        except Exception as e:
+            future.set_exception(e)
+        return future, key, "ocr"
+
+    def _stopping(self):
+        return self._stop.is_set() or self.cancelled
+
+    def _put(self, q, item):
+        """
+        Blocks until q has room (backpressure). Returns False instead if
+        the run stops first.
+        """
+        while not self._stopping():
+            try:
+                q.put(item, timeout=STAGE_POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q):
+        """
+        Blocks until q has an item. Returns _END instead if the run stops
+        first.
+        """
+        while not self._stopping():
+            try:
+                return q.get(timeout=STAGE_POLL_SECONDS)
+            except queue.Empty:
+                pass
+        return _END
+
+    def queue_depths(self):
+        """
+        Returns the current number of items waiting in each stage: sources
+        found but not yet opened, pages rasterized but not yet submitted,
+        being OCR'd, and OCR'd but not yet written.
+        """
+        return {
+            "discovered": self._queues["discovered"].qsize() if self._queues else 0,
+            "rasterized": self._queues["rasterized"].qsize() if self._queues else 0,
+            "ocr": len(self._in_flight),
+            "write": self._queues["ocr_done"].qsize() if self._queues else 0,
+        }
+
+    def _discover_stage(self, out_q):
+        """
+        Stage 1: reads the inputs (which may still be being scanned), skips
+        unchanged ones when only_changed is set and feeds the rest to the
+        rasterize stage. Paths are small, so this queue is unbounded and
+        the scan can run ahead to establish the total.
+        """
+        try:
+            for item in self._inputs:
+                if self._stopping():
+                    return
+                if item is None:
+                    # The input is waiting for more files (see FolderWatcher)
+                    continue
+                path = os.fspath(item)
+                if self.only_changed:
+                    try:
+                        stat = item.stat() if isinstance(item, os.DirEntry) else None
+                    except OSError:
+                        stat = None
+                    if not self.index.changed(path, stat):
+                        self.skipped += 1
+                        continue
+                self.found += 1
+                out_q.put(path)
+        except Exception as e:
+            self.log(f"Scanning inputs failed: {e}")
+        finally:
+            # Lets a generator input (e.g. a folder watcher) clean up now
+            close = getattr(self._inputs, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            self._discovered.set()
+            out_q.put(_END)
+
+    def _rasterize_stage(self, in_q, out_q):
+        """
+        Stage 2: decodes the inputs into PageTasks (rasterizing PDFs) and
+        feeds them to the OCR stage.
+        """
+        try:
+            for task in self.iter_pages(in_q):
+                if not self._put(out_q, task):
+                    if task.is_temp:
+                        _remove_quietly(task.path)
+                    return
+        except Exception as e:
+            self.log(f"Reading inputs failed: {e}")
+        finally:
+            self._put(out_q, _END)
+
+    def _ocr_stage(self, in_q, out_q):
+        """
+        Stage 3: submits PageTasks to the OCR pool and passes the results
+        on in input order. At most twice as many pages as there are
+        workers taking them are in flight, which bounds memory and means
+        cancelling doesn't wait for the batch.
+        """
+        pool, owned = self._create_pool()
+        owned_pool = pool if owned else None
+        tuner = shared = None
+        self._concurrency, self._threads = self.workers, None
+        if self.autotune is not None and owned:
+            tuner, shared = self.autotune, SharedPool(self.workers, pool)
+            tuner.log = self.log
+
+            def apply(point):
+                shared.resize(point.workers)
+                self._concurrency, self._threads = point.workers, point.threads
+
+            apply(tuner.start(self.workers))
+            pool = shared.executor("autotune")
+        elif self.autotune is not None:
+            self.log("Autotune needs a process or thread pool of its own; running without it.")
+        pending = self._in_flight
+        exhausted = False
+        try:
+            while not self._stopping():
+                max_pending = self._concurrency * 2 if pool is not None else 1
+                while not exhausted and len(pending) < max_pending:
+                    if pending:
+                        # Keep the pool fed, but don't wait while work is in flight
+                        try:
+                            task = in_q.get_nowait()
+                        except queue.Empty:
+                            break
+                    else:
+                        task = self._get(in_q)
+                    if task is _END:
+                        exhausted = True
+                        break
+                    if task.resumed is None and task.direct is None and task.error is None:
+                        self.log(f"Extracting from {task.name}...")
+                    pending.append((task,) + self.submit(pool, task))
+                if not pending:
+                    break
+
+                task, future, key, status = pending[0]
+                try:
+                    (result, timings), error = future.result(), None
+                except Exception as e:
+                    result, timings, error = None, {}, e
+                pending.popleft()
+                if tuner is not None and status == "ocr":
+                    point = tuner.page_done(len(pending))
+                    if point is not None:
+                        apply(point)
+                if task.rasterize:
+                    timings["rasterize"] = task.rasterize
+                if key is not None and error is None:
+                    try:
+                        self.cache.put(key, self.output_format, result)
+                    except Exception as e:
+                        self.log(f"Cache write failed: {e}")
+                nbytes = 0
+                # A multi-frame file's bytes are counted once, on its first page
+                if task.path is not None and task.frame == 0:
+                    try:
+                        nbytes = os.path.getsize(task.path)
+                    except OSError:
+                        pass
+                if task.is_temp:
+                    _remove_quietly(task.path)
+                if not self._put(out_q, (task, result, timings, status, nbytes, error)):
+                    break
+        except Exception as e:
+            self.log(f"OCR stage failed: {e}")
+        finally:
+            while pending:
+                pending.popleft()[1].cancel()
+            if shared is not None:
+                shared.shutdown()
+            if owned_pool is not None:
+                owned_pool.shutdown()
+            self._put(out_q, _END)
+
+    def iter_results(self):
+        """
+        Yields (task, result, timings, status, nbytes, error) for each page,
+        in input order. nbytes is the size of the OCR'd image.
+
+        Discovery, rasterizing and OCR run on their own threads, connected
+        by queues, so scanning, decoding, OCR and the caller's writing
+        overlap and a slow stage holds back the ones before it. Rasterized PDF pages are
+        deleted once OCR'd. Stops early when the run is cancelled.
+        """
+        depth = self.workers * 2
+        self._stop.clear()
+        self._in_flight = deque()
+        self._discovered.clear()
+        self._queues = {
+            "discovered": queue.Queue(),
+            "rasterized": queue.Queue(depth),
+            "ocr_done": queue.Queue(depth),
+        }
+        stages = [
+            threading.Thread(target=self._discover_stage, name="ocr-discover", daemon=True,
+                             args=(self._queues["discovered"],)),
+            threading.Thread(target=self._rasterize_stage, name="ocr-rasterize", daemon=True,
+                             args=(self._queues["discovered"], self._queues["rasterized"])),
+            threading.Thread(target=self._ocr_stage, name="ocr-dispatch", daemon=True,
+                             args=(self._queues["rasterized"], self._queues["ocr_done"])),
+        ]
+        for stage in stages:
+            stage.start()
+        try:
+            while True:
+                item = self._get(self._queues["ocr_done"])
+                if item is _END:
+                    break
+                yield item
+        finally:
+            self._stop.set()
+            for stage in stages:
+                stage.join()
+
+    def handle_result(self, task, result, writer):
+        """
+        Writes one page's result and records it in the manifest. Returns
+        the per-page output path, or None when concatenating.
+        """
+        if not self.concatenate:
+            if task.resumed is not None:
+                return task.resumed
+            out_path = self.write_single(task.name, result)
+            self.manifest.mark_done(task.source, task.page, out_path)
+            return out_path
+
+        if task.resumed is None:
+            # Keep the page's result so a resumed run can rebuild the file
+            page_path = self.manifest.page_result_path(task.source, task.page,
+                                                       self.output_format)
+            write_result(page_path, self.output_format, result)
+            self.manifest.mark_done(task.source, task.page, page_path)
+        writer.add(task.name, result)
+        return None
+
+    def record_source(self, source):
+        """
+        Records a fully processed source in the file index, unless part of
+        it couldn't be read.
+        """
+        if source in self._failed_sources:
+            return
+        try:
+            self.index.record(source)
+        except Exception as e:
+            self.log(f"File index update failed: {e}")
+
+    def write_single(self, filename, result):
+        """
+        Writes one page's result to its own output file and returns the path.
+        """
+        base_name, _ = os.path.splitext(filename)
+        if self.output_format == "pdf":
+            # single-page PDF
+            out_path = os.path.join(self.output_dir, base_name + "_ocr.pdf")
+        else:
+            out_path = os.path.join(self.output_dir, f"{base_name}.{self.output_format}")
+        write_result(out_path, self.output_format, result)
+        return out_path
+
+    def events(self):
+        """
+        Runs the batch, yielding LogEvent, ProgressEvent, PageEvent,
+        StatsEvent and ErrorEvent objects as it goes, and a DoneEvent at
+        the end. A performance report is written next to the outputs.
+        """
+        pages = errors = 0
+        final_path = None
+        if self._expected == 0:
+            yield DoneEvent(pages, errors, self.cancelled)
+            return
+
+        # The manifest records every finished page so the job can be resumed
+        self.manifest = JobManifest(self.output_dir)
+        settings = {
+            "output_format": self.output_format,
+            "concatenate": self.concatenate,
+            "concat_filename": self.concat_filename if self.concatenate else None,
+            "backend": self.backend,
+            "preprocess": self.preprocess.describe() if self.preprocess else None,
+            "use_text_layer": self.use_text_layer,
+            "engine": self.engine_options.describe(),
+            # Decides which pages are tiled or shrunk, so it changes results;
+            # remote workers decide that for themselves
+            "memory_budget": self.memory_budget if self._local_plan else None,
+        }
+        self.resuming = self.manifest.start(settings, self.resume)
+        if self.resume and not self.resuming:
+            self.log("No matching earlier job to resume; starting from scratch.")
+        self.index = FileIndex(self.output_dir)
+        self.index.start(settings)
+
+        # When concatenating, pages are streamed into the output in order
+        writer = None
+        if self.concatenate:
+            final_path = os.path.join(self.output_dir, self.concat_filename)
+            writer = create_concat_writer(self.output_format, final_path)
+
+        # A run that never ends (a watch) keeps only the newest page rows
+        # and rewrites its report every so often
+        stats = RunStats(max_rows=CONTINUOUS_REPORT_ROWS if self.continuous else None)
+        report_at = time.monotonic() + CONTINUOUS_REPORT_SECONDS
+        self.log(f"Running OCR with {self.workers} worker(s) ({self.backend} backend).")
+        if self.preprocess is not None and self.preprocess.enabled():
+            self.log(f"Preprocessing: {self.preprocess.describe()}")
+        self.log(f"Tesseract: {self.engine_options.describe()}")
+        if self._local_plan:
+            self.log(f"Memory budget: {self.memory_budget // 1024 ** 2} MB per worker.")
+        missing = missing_languages(self.engine_options.lang
+                                    + ("+osd" if self.engine_options.detect else ""))
+        if missing:
+            self.log(f"Tesseract language data not installed: {', '.join(missing)}")
+        yield from self._drain()
+        self.temp_dir = tempfile.mkdtemp(prefix="ocr_pages_")
+
+        results = self.iter_results()
+        # A source goes into the index once all of its pages are written
+        source, source_ok = None, False
+        try:
+            for i, (task, result, timings, status, nbytes, error) in enumerate(results):
+                yield from self._drain()
+                yield ProgressEvent(int(task.progress * 100))
+                if task.source != source:
+                    source, source_ok = task.source, True
+
+                if error is not None:
+                    source_ok = False
+                    errors += 1
+                    stats.add_page(task.name, task.source, task.page, "error", timings, nbytes)
+                    self.manifest.mark_failed(task.source, task.page, error)
+                    yield LogEvent(f"ERROR on {task.name}: {error}")
+                    yield ErrorEvent(i, task.name, error)
+                    continue
+
+                if task.resumed is not None:
+                    yield LogEvent(f"Reusing finished result for {task.name}.")
+                elif status == "text":
+                    yield LogEvent(f"Used existing text layer of {task.name}.")
+                else:
+                    yield LogEvent("OCR done.")
+
+                started = time.perf_counter()
+                try:
+                    out_path = self.handle_result(task, result, writer)
+                except Exception as e:
+                    source_ok = False
+                    errors += 1
+                    stats.add_page(task.name, task.source, task.page, "error", timings, nbytes)
+                    self.manifest.mark_failed(task.source, task.page, e)
+                    yield LogEvent(f"ERROR writing {task.name}: {e}")
+                    yield ErrorEvent(i, task.name, e)
+                    continue
+                timings["write"] = time.perf_counter() - started
+                if task.last and source_ok:
+                    self.record_source(task.source)
+                stats.add_page(task.name, task.source, task.page, status, timings, nbytes)
+                depths = self.queue_depths()
+                stats.add_queue_depths(depths)
+                pages += 1
+                yield PageEvent(i, task.name, result, out_path)
+                yield StatsEvent(stats.pages, stats.pages_per_second(),
+                                 stats.eta(task.progress), stats.bytes_processed, depths)
+                if self.continuous and time.monotonic() >= report_at:
+                    report_at = time.monotonic() + CONTINUOUS_REPORT_SECONDS
+                    try:
+                        stats.write_report(self.output_dir)
+                    except OSError as e:
+                        self.log(f"Failed to write performance report: {e}")
+        finally:
+            # Stops the stage threads before their temp files and manifest go
+            results.close()
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            if writer is not None:
+                started = time.perf_counter()
+                try:
+                    message = writer.close()
+                    if message:
+                        self.log(message)
+                except Exception as e:
+                    errors += 1
+                    self.log(f"Failed to write {final_path}: {e}")
+                stats.add_stage("merge", time.perf_counter() - started)
+            if not self.cancelled and not errors:
+                self.manifest.finish()
+            self.manifest.close()
+            self.index.close()
+
+        if self.skipped:
+            self.log(f"Skipped {self.skipped} unchanged file(s).")
+        elif not self.found and not self.cancelled:
+            self.log("No valid images or PDFs found.")
+        stats.finish()
+        summary = stats.summary()
+        self.log(f"{summary['pages']} page(s) in {format_duration(summary['elapsed_seconds'])} "
+                 f"({summary['pages_per_second']:.2f} pages/s).")
+        try:
+            report_path, _ = stats.write_report(self.output_dir)
+            self.log(f"Performance report -> {report_path}")
+        except OSError as e:
+            self.log(f"Failed to write performance report: {e}")
+
+        yield from self._drain()
+        if self.cancelled:
+            yield LogEvent("OCR cancelled.")
+        yield ProgressEvent(100)
+        yield DoneEvent(pages, errors, self.cancelled, final_path, summary)
+
+    def run(self, callback=None):
+        """
+        Runs the batch to completion, passing every event to callback(event).
+        Returns the final DoneEvent.
+        """
+        event = None
+        for event in self.events():
+            if callback is not None:
+                callback(event)
+        return event
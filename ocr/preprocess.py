@@ -0,0 +1,220 @@
+# ocr/preprocess.py
+"""
+Optional image clean-up between decoding a page and running OCR.
+Every step uses PIL's C-level operations (point tables, filters,
+histograms), so it doesn't touch pixels from Python.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+# PIL is imported inside the functions below, so importing this module
+# for PreprocessOptions (as the GUI does at startup) doesn't load it.
+
+BINARIZE_METHODS = ["otsu", "adaptive"]
+
+# Deskew search range and step, in degrees
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.5
+# Width the page is shrunk to while searching for the skew angle
+DESKEW_SAMPLE_WIDTH = 800
+
+
+@dataclass
+class PreprocessOptions:
+    """
+    Which preprocessing steps to run. Everything is off by default.
+    target_dpi only downscales, and only images that record their DPI.
+    """
+    target_dpi: Optional[int] = None
+    grayscale: bool = False
+    binarize: Optional[str] = None  # one of BINARIZE_METHODS
+    deskew: bool = False
+
+    def __post_init__(self):
+        if self.binarize is not None and self.binarize not in BINARIZE_METHODS:
+            raise ValueError(f"Unknown binarize method {self.binarize!r}; "
+                             f"expected one of {BINARIZE_METHODS}")
+
+    def enabled(self):
+        return bool(self.target_dpi or self.grayscale or self.binarize or self.deskew)
+
+    def describe(self):
+        """
+        Stable description of the options, used in the OCR cache key.
+        """
+        return (f"dpi={self.target_dpi} gray={int(self.grayscale)} "
+                f"bin={self.binarize} deskew={int(self.deskew)}")
+
+
+def image_dpi(img):
+    dpi = img.info.get("dpi")
+    if not dpi or not dpi[0]:
+        return None
+    return float(dpi[0])
+
+
+def apply_draft(img, options, max_size=None):
+    """
+    For JPEGs, asks the decoder for a smaller, grayscale image before the
+    pixels are decoded (DCT scaling), which saves memory and decode time.
+    max_size optionally caps the decoded size further (large images).
+    Must be called before img.load().
+    """
+    if img.format != "JPEG" or (options is None and max_size is None):
+        return
+    dpi = image_dpi(img)
+    gray = options is not None and (options.grayscale or options.binarize)
+    mode = "L" if gray else img.mode
+    size = img.size
+    if options is not None and options.target_dpi and dpi and dpi > options.target_dpi:
+        scale = options.target_dpi / dpi
+        size = (int(img.width * scale), int(img.height * scale))
+    if max_size is not None:
+        size = (min(size[0], max_size[0]), min(size[1], max_size[1]))
+    original_width = img.width
+    img.draft(mode, size)
+    if dpi and img.width < original_width:
+        # The decoder scaled the pixels, so the page is now at a lower DPI
+        scale = img.width / original_width
+        img.info["dpi"] = (dpi * scale, dpi * scale)
+
+
+def to_grayscale(img):
+    from PIL import Image
+
+    if img.mode == "L":
+        return img
+    info = dict(img.info)
+    if img.mode in ("I", "I;16", "I;16B", "I;16L"):
+        # 16/32-bit samples: scale into 8 bits instead of clipping
+        img = img.convert("I").point(lambda v: v * (1 / 256))
+    elif img.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white rather than black
+        img = img.convert("RGBA")
+        background = Image.new("RGBA", img.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(background, img)
+    img = img.convert("L")
+    img.info.update(info)
+    return img
+
+
+def downscale_to_dpi(img, target_dpi):
+    from PIL import Image
+
+    dpi = image_dpi(img)
+    if not dpi or dpi <= target_dpi:
+        return img
+    factor = dpi / target_dpi
+    if factor >= 2 and factor == int(factor):
+        img = img.reduce(int(factor))
+    else:
+        size = (max(1, round(img.width / factor)), max(1, round(img.height / factor)))
+        img = img.resize(size, Image.LANCZOS)
+    img.info["dpi"] = (target_dpi, target_dpi)
+    return img
+
+
+def otsu_threshold(img):
+    """
+    Returns the Otsu threshold of a grayscale image from its histogram.
+    """
+    hist = img.histogram()[:256]
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_bg = weight_bg = 0
+    best_t, best_var = 127, -1.0
+    for t in range(256):
+        weight_bg += hist[t]
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += t * hist[t]
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        var = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if var > best_var:
+            best_t, best_var = t, var
+    return best_t
+
+
+def binarize(img, method):
+    """
+    Returns a black-and-white "L" image. "otsu" uses one global threshold;
+    "adaptive" compares each pixel with its local mean, which copes with
+    shadows and uneven lighting in photos.
+    """
+    from PIL import ImageChops, ImageFilter
+
+    img = to_grayscale(img)
+    if method == "otsu":
+        t = otsu_threshold(img)
+        return img.point([0 if v <= t else 255 for v in range(256)])
+
+    dpi = image_dpi(img) or 300
+    radius = max(5, int(dpi / 20))
+    local_mean = img.filter(ImageFilter.BoxBlur(radius))
+    # How much darker each pixel is than its surroundings
+    darker = ImageChops.subtract(local_mean, img)
+    return darker.point([255 if v <= 10 else 0 for v in range(256)])
+
+
+def estimate_skew(img):
+    """
+    Returns the rotation (degrees) that best straightens the text lines,
+    found by maximising the variance of the row profile on a small copy.
+    """
+    from PIL import Image, ImageChops
+
+    sample = to_grayscale(img)
+    if sample.width > DESKEW_SAMPLE_WIDTH:
+        ratio = DESKEW_SAMPLE_WIDTH / sample.width
+        sample = sample.resize((DESKEW_SAMPLE_WIDTH, max(1, int(sample.height * ratio))),
+                               Image.BILINEAR)
+    # Ink as bright pixels, so rotation padding (black) adds nothing
+    sample = ImageChops.invert(sample)
+
+    best_angle, best_score = 0.0, -1.0
+    steps = int(DESKEW_MAX_ANGLE / DESKEW_STEP)
+    for i in range(-steps, steps + 1):
+        angle = i * DESKEW_STEP
+        rotated = sample.rotate(angle, resample=Image.BILINEAR)
+        # Mean ink per row, computed by PIL
+        profile = rotated.resize((1, rotated.height), Image.BOX).tobytes()
+        mean = sum(profile) / len(profile)
+        score = sum((v - mean) ** 2 for v in profile)
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def deskew(img):
+    from PIL import Image
+
+    angle = estimate_skew(img)
+    if not angle:
+        return img
+    fill = 255 if img.mode in ("L", "1") else (255,) * len(img.getbands())
+    info = dict(img.info)
+    img = img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=fill)
+    img.info.update(info)
+    return img
+
+
+def preprocess(img, options):
+    """
+    Runs the selected steps in order: downscale, grayscale, deskew,
+    binarize. Returns a new image (or img itself if nothing applies).
+    """
+    if options is None or not options.enabled():
+        return img
+    if options.target_dpi:
+        img = downscale_to_dpi(img, options.target_dpi)
+    if options.grayscale or options.binarize:
+        img = to_grayscale(img)
+    if options.deskew:
+        img = deskew(img)
+    if options.binarize:
+        img = binarize(img, options.binarize)
+    return img
@@ -0,0 +1,203 @@
+# ocr/scheduler.py
+"""
+A fixed-size OCR worker pool shared by several batches, scheduled one
+page at a time:
+
+    pool = SharedPool(workers=8)
+    urgent = BatchProcessor(files, "out", executor=pool.executor("a", HIGH), workers=pool.workers)
+
+Each job submits pages through its own JobExecutor. Whenever a worker is
+free, the next page comes from the highest-priority job that isn't
+paused. Jobs of equal priority take turns, so a small batch isn't stuck
+behind a large one.
+"""
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+
+from ocr.engine import default_worker_count, limit_tesseract_threads, process_pool
+
+# Job priorities, lowest first; a higher level always runs first
+PRIORITIES = ["low", "normal", "high"]
+LOW, NORMAL, HIGH = range(len(PRIORITIES))
+
+
+def priority_level(priority):
+    """
+    Accepts a level (0-2) or a name from PRIORITIES and returns the level.
+    """
+    if isinstance(priority, str):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}; expected one of {PRIORITIES}")
+        return PRIORITIES.index(priority)
+    if priority not in range(len(PRIORITIES)):
+        raise ValueError(f"Unknown priority {priority!r}; expected 0-{len(PRIORITIES) - 1}")
+    return priority
+
+
+class JobExecutor(Executor):
+    """
+    One job's view of a SharedPool. Submitted calls wait in the job's
+    queue until the pool schedules them, and come back cancelled once the
+    job is released. shutdown() is a no-op; the pool belongs to whoever
+    created it.
+    """
+
+    def __init__(self, pool, job_id):
+        self.pool = pool
+        self.job_id = job_id
+
+    @property
+    def remote(self):
+        return self.pool.remote
+
+    def submit(self, fn, /, *args, **kwargs):
+        return self.pool._submit(self.job_id, fn, args, kwargs)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        pass
+
+
+class SharedPool:
+    """
+    Runs pages of several jobs on one fixed-size process (or thread) pool,
+    at most `workers` at a time. Queued pages are picked by job priority,
+    then round-robin between jobs, and paused jobs are skipped. Pages
+    already running are never interrupted.
+    """
+
+    def __init__(self, workers=None, executor="process"):
+        self.workers = max(1, workers or default_worker_count())
+        if isinstance(executor, Executor):
+            self._pool, self._owned = executor, False
+        elif executor == "process":
+            self._pool = process_pool(self.workers)
+            self._owned = True
+        elif executor == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                            initializer=limit_tesseract_threads)
+            self._owned = True
+        else:
+            raise ValueError(f"Unknown executor {executor!r}; expected 'process' or 'thread'")
+        # True when pages run on ocr.cluster workers
+        self.remote = getattr(self._pool, "remote", False)
+        # Reentrant: a page that finishes inside pool.submit() re-dispatches
+        self._lock = threading.RLock()
+        self._queues = {}      # job_id -> deque of (future, fn, args, kwargs)
+        self._priorities = {}  # job_id -> level
+        self._paused = set()
+        self._last_turn = {}   # job_id -> when the job last had a page started
+        self._turns = 0
+        self._running = 0
+
+    def executor(self, job_id, priority=NORMAL):
+        """
+        Registers a job and returns the Executor its BatchProcessor should use.
+        """
+        with self._lock:
+            self._queues[job_id] = deque()
+            self._priorities[job_id] = priority_level(priority)
+            self._last_turn[job_id] = 0
+        return JobExecutor(self, job_id)
+
+    def set_priority(self, job_id, priority):
+        with self._lock:
+            if job_id in self._priorities:
+                self._priorities[job_id] = priority_level(priority)
+
+    def pause(self, job_id):
+        """
+        Stops starting the job's pages. Pages already running finish.
+        """
+        with self._lock:
+            self._paused.add(job_id)
+
+    def resume(self, job_id):
+        with self._lock:
+            self._paused.discard(job_id)
+            self._dispatch()
+
+    def release(self, job_id):
+        """
+        Unregisters a job and cancels its queued pages.
+        """
+        with self._lock:
+            queued = self._queues.pop(job_id, ())
+            self._priorities.pop(job_id, None)
+            self._last_turn.pop(job_id, None)
+            self._paused.discard(job_id)
+        for future, _, _, _ in queued:
+            future.cancel()
+
+    def resize(self, workers):
+        """
+        Changes how many pages run at once, up to the size the underlying
+        pool was created with. Pages already running finish.
+        """
+        with self._lock:
+            self.workers = max(1, workers)
+            self._dispatch()
+
+    def queued(self, job_id):
+        """
+        Returns the number of the job's pages waiting for a worker.
+        """
+        with self._lock:
+            return len(self._queues.get(job_id, ()))
+
+    def shutdown(self):
+        for job_id in list(self._queues):
+            self.release(job_id)
+        if self._owned:
+            self._pool.shutdown()
+
+    def _submit(self, job_id, fn, args, kwargs):
+        future = Future()
+        with self._lock:
+            if job_id not in self._queues:
+                # Released (cancelled) while its OCR stage was still submitting
+                future.cancel()
+                return future
+            self._queues[job_id].append((future, fn, args, kwargs))
+            self._dispatch()
+        return future
+
+    def _next_job(self):
+        ready = [job_id for job_id, queue in self._queues.items()
+                 if queue and job_id not in self._paused]
+        if not ready:
+            return None
+        # Highest priority first; among equals, whoever waited longest
+        return max(ready, key=lambda job_id: (self._priorities[job_id],
+                                              -self._last_turn[job_id]))
+
+    def _dispatch(self):
+        """
+        Starts queued pages while workers are free. Called with the lock held.
+        """
+        while self._running < self.workers:
+            job_id = self._next_job()
+            if job_id is None:
+                return
+            future, fn, args, kwargs = self._queues[job_id].popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._turns += 1
+            self._last_turn[job_id] = self._turns
+            self._running += 1
+            try:
+                inner = self._pool.submit(fn, *args, **kwargs)
+            except Exception as e:
+                self._running -= 1
+                future.set_exception(e)
+                continue
+            inner.add_done_callback(lambda inner, future=future: self._finished(future, inner))
+
+    def _finished(self, future, inner):
+        try:
+            future.set_result(inner.result())
+        except BaseException as e:
+            future.set_exception(e)
+        with self._lock:
+            self._running -= 1
+            self._dispatch()
@@ -0,0 +1,345 @@
+# ocr/tiling.py
+"""
+Large-image mode: keeps huge scans (engineering drawings, 1200-DPI A0
+pages) within a per-worker memory budget.
+
+plan_image() looks only at the header size. An image whose decoded
+pixels plus Tesseract's working copies fit the budget is OCR'd as usual.
+If only the decoded pixels fit, it is cut into overlapping tiles that
+are OCR'd one at a time and stitched back into one page (text, HOCR or
+word boxes) with page coordinates. Otherwise it is shrunk, by the JPEG
+decoder itself where possible (draft) and with Image.reduce otherwise.
+"""
+import html
+import math
+import os
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import groupby
+
+# Rough peak memory per pixel while Tesseract works on an image: its own
+# 32-bit copy plus grayscale, binarized and line images
+TESSERACT_BYTES_PER_PIXEL = 8
+
+# Decoded bytes per pixel for PIL modes; anything else counts as 4
+MODE_BYTES = {"1": 1, "L": 1, "P": 1, "LA": 2, "La": 2, "I;16": 2, "I;16B": 2, "I;16L": 2,
+              "RGB": 3, "YCbCr": 3, "LAB": 3, "HSV": 3}
+
+# Automatic budget: this share of physical memory, split between workers
+AUTO_BUDGET_SHARE = 0.5
+MIN_MEMORY_BUDGET = 256 * 1024 ** 2
+MAX_AUTO_MEMORY_BUDGET = 4 * 1024 ** 3
+# Assumed when physical memory can't be read
+FALLBACK_TOTAL_MEMORY = 8 * 1024 ** 3
+
+# Smaller tiles cut through too much text; such images are shrunk instead
+MIN_TILE_SIDE = 1024
+# Overlap between neighbouring tiles, so every word is whole in one of them
+MIN_TILE_OVERLAP = 256
+
+# Images that can't be decoded at a reduced size and need more than this
+# many budgets just to decode are refused. This replaces PIL's
+# decompression-bomb guard, which would reject them before a plan is made.
+MAX_DECODE_BUDGETS = 4
+
+FULL, TILES, REDUCE = "full", "tiles", "reduce"
+
+# Output formats that can be stitched from tiles; PDFs are shrunk instead
+STITCHABLE_FORMATS = ("txt", "hocr", "words")
+
+# mode is FULL, TILES or REDUCE; tile_side is the longest tile edge and
+# max_size the size to shrink to
+ImagePlan = namedtuple("ImagePlan", "mode tile_side max_size", defaults=(None, None))
+
+def _windows_memory_status():
+    """
+    Returns GlobalMemoryStatusEx's answer, or None.
+    """
+    if os.name == "nt":
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong),
+                        ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong),
+                        ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status
+    return None
+
+
+def total_memory():
+    """
+    Returns the physical memory in bytes (FALLBACK_TOTAL_MEMORY if unknown).
+    """
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        pass
+    status = _windows_memory_status()
+    return status.ullTotalPhys if status is not None else FALLBACK_TOTAL_MEMORY
+
+
+def available_memory():
+    """
+    Returns the memory in bytes that can still be used without swapping,
+    or None if it can't be read. Counts reclaimable page cache on Linux.
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    status = _windows_memory_status()
+    if status is not None:
+        return status.ullAvailPhys
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_memory_budget(workers: int):
+    """
+    Returns the per-worker memory budget in bytes when none is set.
+    """
+    budget = int(total_memory() * AUTO_BUDGET_SHARE / max(1, workers))
+    return max(MIN_MEMORY_BUDGET, min(MAX_AUTO_MEMORY_BUDGET, budget))
+
+
+@contextmanager
+def open_image(path):
+    """
+    Opens an image (headers only, like Image.open). One over PIL's
+    decompression-bomb limit is opened anyway; plan_image() decides how
+    big is too big, against the memory budget.
+    """
+    from PIL import Image
+
+    try:
+        img = Image.open(path)
+    except Image.DecompressionBombError:
+        img = _open_over_limit(Image, path)
+    with img:
+        yield img
+
+
+def _open_over_limit(Image, path):
+    """
+    Opens an image with its format's plugin, as Image.open does but
+    without the size check. PIL's limit is process-wide and guards every
+    other thread's images, so it is left alone.
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(16)
+    for name in Image.ID:
+        factory, accept = Image.OPEN[name]
+        accepted = accept(prefix) if accept else True
+        if not accepted or isinstance(accepted, str):
+            continue
+        try:
+            return factory(path)
+        except SyntaxError:
+            continue
+    raise Image.UnidentifiedImageError(f"cannot identify image file {path!r}")
+
+
+def decoded_bytes(width, height, mode):
+    return width * height * MODE_BYTES.get(mode, 4)
+
+
+def plan_image(width, height, mode, budget, output_format="txt", can_draft=False):
+    """
+    Returns the ImagePlan for an image of this size and mode under a
+    memory budget in bytes (None = no limit). Raises ValueError for
+    images too large to even decode (see MAX_DECODE_BUDGETS).
+    """
+    decoded = decoded_bytes(width, height, mode)
+    pixels = width * height
+    if budget is None or decoded + pixels * TESSERACT_BYTES_PER_PIXEL <= budget:
+        return ImagePlan(FULL)
+
+    if output_format in STITCHABLE_FORMATS and decoded * 2 <= budget:
+        # Each tile needs its cropped copy plus Tesseract's working memory
+        per_pixel = TESSERACT_BYTES_PER_PIXEL + MODE_BYTES.get(mode, 4)
+        side = math.isqrt((budget - decoded) // per_pixel)
+        if side >= MIN_TILE_SIDE:
+            return ImagePlan(TILES, tile_side=side)
+
+    if not can_draft and decoded > budget * MAX_DECODE_BUDGETS:
+        raise ValueError(f"Image of {width}x{height} pixels needs about "
+                         f"{decoded // 1024 ** 2} MB to decode, more than the memory budget "
+                         f"allows; raise the memory budget to OCR it")
+    # Shrink until decoded pixels and Tesseract's copies fit
+    per_pixel = MODE_BYTES.get(mode, 4) + TESSERACT_BYTES_PER_PIXEL
+    factor = math.sqrt(pixels * per_pixel / budget)
+    max_size = (max(1, int(width / factor)), max(1, int(height / factor)))
+    return ImagePlan(REDUCE, max_size=max_size)
+
+
+def plan_file(path, frame=0, budget=None, output_format="txt"):
+    """
+    Returns the ImagePlan ocr_timed will use for one frame of an image
+    file, from its header alone.
+    """
+    with open_image(path) as img:
+        if frame:
+            img.seek(frame)
+        return plan_image(img.width, img.height, img.mode, budget, output_format,
+                          can_draft=img.format == "JPEG")
+
+
+def describe_plan(plan):
+    """
+    Returns a short description of an ImagePlan, e.g. "tiles 2048".
+    """
+    if plan.mode == TILES:
+        return f"tiles {plan.tile_side}"
+    if plan.mode == REDUCE:
+        return f"reduce {plan.max_size[0]}x{plan.max_size[1]}"
+    return plan.mode
+
+
+def shrink_to(img, max_size):
+    """
+    Shrinks a decoded image to fit max_size with Image.reduce (fast box
+    averaging by an integer factor), keeping its DPI consistent with the
+    physical page size.
+    """
+    factor = math.ceil(max(img.width / max_size[0], img.height / max_size[1]))
+    if factor < 2:
+        return img
+    info = dict(img.info)
+    reduced = img.reduce(factor)
+    reduced.info.update(info)
+    dpi = info.get("dpi")
+    if dpi and dpi[0]:
+        reduced.info["dpi"] = (dpi[0] / factor, dpi[1] / factor)
+    return reduced
+
+
+def _starts(length, side):
+    """
+    Returns the start offsets of overlapping tiles of `side` along `length`.
+    """
+    if length <= side:
+        return [0]
+    overlap = max(MIN_TILE_OVERLAP, side // 8)
+    step = side - overlap
+    starts = list(range(0, length - side, step))
+    return starts + [length - side]
+
+
+def _cores(starts, side, length):
+    """
+    Returns the [start, end) range each tile owns: tiles split their
+    overlap down the middle.
+    """
+    bounds = [0] + [(nxt + prev + side) // 2 for prev, nxt in zip(starts, starts[1:])] + [length]
+    return list(zip(bounds, bounds[1:]))
+
+
+def tile_grid(width, height, side):
+    """
+    Returns [(box, core)] for the tiles covering a width x height image,
+    row by row. box is the (left, top, right, bottom) crop; core is the
+    part of the page whose words are taken from this tile.
+    """
+    xs, ys = _starts(width, side), _starts(height, side)
+    x_cores, y_cores = _cores(xs, side, width), _cores(ys, side, height)
+    tiles = []
+    for y, (core_top, core_bottom) in zip(ys, y_cores):
+        for x, (core_left, core_right) in zip(xs, x_cores):
+            box = (x, y, min(width, x + side), min(height, y + side))
+            tiles.append((box, (core_left, core_top, core_right, core_bottom)))
+    return tiles
+
+
+def stitch(tiles):
+    """
+    Merges per-tile words into page words. tiles is [(box, core, words)]
+    with words (ocr.wordboxes.Word) in tile coordinates. A word is kept only from
+    the tile whose core holds its centre, so words in the overlaps aren't
+    doubled, and block numbers are offset to stay unique across tiles.
+    """
+    merged, block_base = [], 0
+    for (left, top, _, _), (core_left, core_top, core_right, core_bottom), words in tiles:
+        last_block = 0
+        for w in words:
+            x, y = left + w.left, top + w.top
+            cx, cy = x + w.width // 2, y + w.height // 2
+            last_block = max(last_block, w.block)
+            if core_left <= cx < core_right and core_top <= cy < core_bottom:
+                merged.append(w._replace(block=block_base + w.block, left=x, top=y))
+        block_base += last_block
+    return merged
+
+
+def render_text(words):
+    """
+    Returns words as plain text: one line per Tesseract line, a blank
+    line between paragraphs.
+    """
+    parts, prev = [], None
+    for w in words:
+        if prev is not None:
+            if (w.block, w.par) != (prev.block, prev.par):
+                parts.append("\n\n")
+            elif w.line != prev.line:
+                parts.append("\n")
+            else:
+                parts.append(" ")
+        parts.append(w.text)
+        prev = w
+    return "".join(parts) + "\n" if parts else ""
+
+
+def _bbox(words):
+    words = list(words)
+    return (min(w.left for w in words), min(w.top for w in words),
+            max(w.left + w.width for w in words), max(w.top + w.height for w in words))
+
+
+def render_hocr_page(words, width, height):
+    """
+    Returns the ocr_page div for words on a width x height page, nested
+    into blocks, paragraphs and lines the way Tesseract writes it.
+    """
+    out = [f"  <div class='ocr_page' id='page_1' title='image \"\"; bbox 0 0 {width} {height}; "
+           f"ppageno 0'>\n"]
+    counters = {"block": 0, "par": 0, "line": 0, "word": 0}
+
+    def next_id(kind):
+        counters[kind] += 1
+        return f"{kind}_1_{counters[kind]}"
+
+    for _, block in groupby(words, key=lambda w: w.block):
+        block = list(block)
+        out.append("   <div class='ocr_carea' id='%s' title=\"bbox %d %d %d %d\">\n"
+                   % ((next_id("block"),) + _bbox(block)))
+        for _, par in groupby(block, key=lambda w: w.par):
+            par = list(par)
+            out.append("    <p class='ocr_par' id='%s' title=\"bbox %d %d %d %d\">\n"
+                       % ((next_id("par"),) + _bbox(par)))
+            for _, line in groupby(par, key=lambda w: w.line):
+                line = list(line)
+                out.append("     <span class='ocr_line' id='%s' title=\"bbox %d %d %d %d\">"
+                           % ((next_id("line"),) + _bbox(line)))
+                for w in line:
+                    out.append(" <span class='ocrx_word' id='%s' title='bbox %d %d %d %d; "
+                               "x_wconf %d'>%s</span>"
+                               % (next_id("word"), w.left, w.top, w.left + w.width,
+                                  w.top + w.height, round(w.conf), html.escape(w.text)))
+                out.append("\n     </span>\n")
+            out.append("    </p>\n")
+        out.append("   </div>\n")
+    out.append("  </div>\n")
+    return "".join(out)
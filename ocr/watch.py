@@ -0,0 +1,173 @@
+# ocr/watch.py
+"""
+Watch-folder input for long-running runs:
+
+    watcher = FolderWatcher("inbox", ignore=["results"])
+    BatchProcessor(watcher.iter_ready(), "results", only_changed=True).run()
+
+New and modified images/PDFs are yielded once they stop changing. The
+BatchProcessor keeps its worker pool for the whole run, so each new file
+only pays for its own OCR.
+"""
+import os
+import threading
+import time
+
+from ocr.discovery import INPUT_EXTENSIONS, scan_folder
+from ocr.optional import optional_module
+
+# A file is picked up once its size and mtime stay the same this long
+DEFAULT_SETTLE_SECONDS = 2.0
+
+# How often pending files are checked (and, without watchdog, the folder
+# is rescanned)
+DEFAULT_POLL_SECONDS = 1.0
+
+
+def watchdog_support():
+    """
+    True if watchdog is installed (imported on the first call).
+    """
+    return optional_module("watchdog.observers") is not None
+
+
+class _ChangeHandler:
+    """
+    Passes created, modified and moved-in files to the watcher. Observers
+    only call dispatch(), so this needn't subclass watchdog's
+    FileSystemEventHandler (which would import watchdog with this module).
+    """
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def dispatch(self, event):
+        if event.is_directory:
+            return
+        if event.event_type in ("created", "modified"):
+            self.watcher.notify(event.src_path)
+        elif event.event_type == "moved":
+            self.watcher.notify(event.dest_path)
+
+
+class FolderWatcher:
+    """
+    Watches a folder for images/PDFs to OCR. Uses inotify (or the
+    platform's equivalent) through the optional watchdog package, and falls
+    back to rescanning the folder every poll_seconds without it.
+
+    Files under `ignore` (e.g. an output folder inside the input folder)
+    are never picked up.
+    """
+
+    def __init__(self, folder, recurse=False, ignore=(),
+                 settle_seconds=DEFAULT_SETTLE_SECONDS, poll_seconds=DEFAULT_POLL_SECONDS,
+                 use_watchdog=True):
+        self.folder = folder
+        self.recurse = recurse
+        self.ignore = [os.path.join(os.path.abspath(p), "") for p in ignore]
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.use_watchdog = use_watchdog and watchdog_support()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._changed = set()   # paths reported since the last check
+        self._pending = {}      # path -> (size, mtime, unchanged since)
+        self._yielded = {}      # path -> (size, mtime) when last yielded
+
+    @property
+    def mode(self):
+        return "watchdog" if self.use_watchdog else "polling"
+
+    def stop(self):
+        """
+        Ends iter_ready(). Safe to call from any thread.
+        """
+        self._stop.set()
+        self._wake.set()
+
+    def notify(self, path):
+        """
+        Reports a created or modified file. Called by the watchdog handler.
+        """
+        with self._lock:
+            self._changed.add(os.path.abspath(path))
+        self._wake.set()
+
+    def _wanted(self, path):
+        if os.path.splitext(path)[1].lower() not in INPUT_EXTENSIONS:
+            return False
+        if any(path.startswith(prefix) for prefix in self.ignore):
+            return False
+        if not self.recurse and os.path.dirname(path) != os.path.abspath(self.folder):
+            return False
+        return True
+
+    def _scan(self):
+        for entry in scan_folder(self.folder, self.recurse):
+            if self._wanted(entry.path):
+                self.notify(entry.path)
+
+    def _check(self):
+        """
+        Moves reported files into the pending set and returns the ones
+        that have settled.
+        """
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        now = time.monotonic()
+        for path in changed:
+            if path in self._pending or not self._wanted(path):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            # Rescans report every file; only new or modified ones matter
+            if self._yielded.get(path) != (st.st_size, st.st_mtime):
+                self._pending[path] = (st.st_size, st.st_mtime, now)
+
+        ready = []
+        for path, (size, mtime, since) in list(self._pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                # Deleted or moved away before it settled
+                del self._pending[path]
+                continue
+            if (st.st_size, st.st_mtime) != (size, mtime):
+                self._pending[path] = (st.st_size, st.st_mtime, now)
+            elif now - since >= self.settle_seconds:
+                del self._pending[path]
+                self._yielded[path] = (size, mtime)
+                ready.append(path)
+        return sorted(ready)
+
+    def iter_ready(self):
+        """
+        Yields files already in the folder and then new or modified ones,
+        each once it has stopped changing, until stop() is called. Yields
+        None whenever a check finds nothing, so a consumer blocked on this
+        generator still gets a chance to notice it should stop.
+        """
+        observer = None
+        if self.use_watchdog:
+            observer = optional_module("watchdog.observers").Observer()
+            observer.schedule(_ChangeHandler(self), self.folder, recursive=self.recurse)
+            observer.start()
+        try:
+            self._scan()
+            while not self._stop.is_set():
+                ready = self._check()
+                yield from ready
+                if not ready:
+                    yield None
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                if observer is None and not self._stop.is_set():
+                    self._scan()
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
@@ -0,0 +1,319 @@
+# ocr/wordboxes.py
+"""
+The "words" output format: every recognized word with its bounding box,
+confidence and block/paragraph/line/word numbers, stored column by
+column so an indexer can read positions without parsing HOCR:
+
+    with WordBoxes.open("out/all_ocr_results.words") as words:
+        lefts = words.column("left")     # numpy array, memory-mapped
+        for page in words.pages:
+            ...
+
+File layout (all numbers little-endian):
+
+    b"OCRWORDS"  uint32 version  uint32 header length  header (JSON)
+    data section: one contiguous, 8-byte aligned array per column
+
+The JSON header lists the row count, each column's dtype (NumPy
+notation), offset in the data section and size, and the pages as
+{"name", "width", "height", "start", "rows"}. Text is stored as UTF-8 in
+"text_data", word i being text_data[text_offsets[i]:text_offsets[i + 1]].
+"""
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from collections import namedtuple
+
+from ocr.optional import optional_module
+
+MAGIC = b"OCRWORDS"
+VERSION = 1
+_PREFIX = struct.Struct("<8sII")
+_ALIGN = 8
+
+# name -> (NumPy dtype, array typecode); one entry per word
+COLUMNS = {
+    "page": ("<u4", "I"),
+    "block": ("<u2", "H"),
+    "par": ("<u2", "H"),
+    "line": ("<u2", "H"),
+    "word": ("<u2", "H"),
+    "left": ("<i4", "i"),
+    "top": ("<i4", "i"),
+    "width": ("<i4", "i"),
+    "height": ("<i4", "i"),
+    "conf": ("<f4", "f"),
+}
+# Word text: len(rows) + 1 offsets into a UTF-8 heap
+TEXT_COLUMNS = {
+    "text_offsets": ("<u8", "Q"),
+    "text_data": ("|u1", "B"),
+}
+ALL_COLUMNS = {**COLUMNS, **TEXT_COLUMNS}
+
+# Header row of Tesseract's TSV output; tesserocr's GetTSVText() omits it
+TSV_HEADER = ("level\tpage_num\tblock_num\tpar_num\tline_num\tword_num"
+              "\tleft\ttop\twidth\theight\tconf\ttext")
+
+# image_to_data / GetTSVText columns used, and the level of word rows
+_TSV_FIELDS = ["block_num", "par_num", "line_num", "word_num",
+               "left", "top", "width", "height", "conf"]
+_PAGE_LEVEL, _WORD_LEVEL = "1", "5"
+
+# One recognized word, as read from the TSV output
+Word = namedtuple("Word", "block par line word left top width height conf text")
+
+
+def _aligned(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _le_bytes(values: array):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def read_tsv(tsv: str):
+    """
+    Reads Tesseract's TSV output (pytesseract.image_to_data) and returns
+    (words, width, height): the Word rows with text, in reading order,
+    and the page size. The header row is optional.
+    """
+    words, width, height = [], 0, 0
+    lines = tsv.splitlines()
+    if not lines or not lines[0].startswith("level"):
+        lines.insert(0, TSV_HEADER)
+    header = lines[0].split("\t")
+    fields = [header.index(name) for name in _TSV_FIELDS]
+    level_at, text_at = header.index("level"), header.index("text")
+    for line in lines[1:]:
+        row = line.split("\t")
+        if len(row) < len(header):
+            row += [""] * (len(header) - len(row))
+        level = row[level_at]
+        if level == _PAGE_LEVEL:
+            width, height = int(row[fields[6]]), int(row[fields[7]])
+            continue
+        text = row[text_at].strip()
+        if level != _WORD_LEVEL or not text:
+            continue
+        numbers = [int(row[at]) for at in fields[:8]]
+        words.append(Word(*numbers, float(row[fields[8]]), text))
+    return words, width, height
+
+
+def word_columns(words):
+    """
+    Returns words as arrays keyed by COLUMNS and TEXT_COLUMNS.
+    """
+    columns = {name: array(code) for name, (_, code) in ALL_COLUMNS.items()}
+    text_data = bytearray()
+    offsets = columns["text_offsets"]
+    offsets.append(0)
+    for name in ("block", "par", "line", "word", "left", "top", "width", "height", "conf"):
+        columns[name].extend(getattr(w, name) for w in words)
+    columns["page"].extend(0 for _ in words)
+    for w in words:
+        text_data += w.text.encode("utf-8")
+        offsets.append(len(text_data))
+    columns["text_data"] = array("B", text_data)
+    return columns
+
+
+def _write_file(f, rows, pages, sources):
+    """
+    Writes a words file: the header, then each column from `sources`
+    (name -> (binary file object or bytes, size)).
+    """
+    layout, offset = {}, 0
+    for name, (dtype, _) in ALL_COLUMNS.items():
+        size = sources[name][1]
+        layout[name] = {"dtype": dtype, "offset": offset, "size": size}
+        offset = _aligned(offset + size)
+    header = json.dumps({"rows": rows, "columns": layout, "pages": pages},
+                        separators=(",", ":")).encode("utf-8")
+    prefix = _PREFIX.pack(MAGIC, VERSION, len(header)) + header
+    f.write(prefix + b"\0" * (_aligned(len(prefix)) - len(prefix)))
+    for name in ALL_COLUMNS:
+        source, size = sources[name]
+        if isinstance(source, bytes):
+            f.write(source)
+        else:
+            shutil.copyfileobj(source, f)
+        f.write(b"\0" * (_aligned(size) - size))
+
+
+def encode_page(tsv: str):
+    """
+    Returns a single-page words file (bytes) for one page's TSV output.
+    Its page has no name; WordsConcatWriter fills names in.
+    """
+    return encode_words(*read_tsv(tsv))
+
+
+def encode_words(words, width, height):
+    """
+    Returns a single-page words file (bytes) for a list of Words.
+    """
+    columns = word_columns(words)
+    rows = len(words)
+    pages = [{"name": "", "width": width, "height": height, "start": 0, "rows": rows}]
+    sources = {}
+    for name, values in columns.items():
+        data = _le_bytes(values)
+        sources[name] = (data, len(data))
+    with tempfile.SpooledTemporaryFile() as f:
+        _write_file(f, rows, pages, sources)
+        f.seek(0)
+        return f.read()
+
+
+class WordBoxes:
+    """
+    Read-only view of a words file or of single-page words bytes. Columns
+    are zero-copy views: NumPy arrays when NumPy is installed, memoryviews
+    otherwise. Keep the WordBoxes open while using them.
+    """
+
+    def __init__(self, buffer, closer=None):
+        self._buffer = buffer
+        self._closer = closer
+        magic, version, header_len = _PREFIX.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a words file")
+        if version > VERSION:
+            raise ValueError(f"Unsupported words file version {version}")
+        header = json.loads(bytes(buffer[_PREFIX.size:_PREFIX.size + header_len]))
+        self.rows = header["rows"]
+        self.pages = header["pages"]
+        self._columns = header["columns"]
+        self._data_start = _aligned(_PREFIX.size + header_len)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Memory-maps a words file.
+        """
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped.close)
+
+    def close(self):
+        if self._closer is not None:
+            try:
+                self._closer()
+            except BufferError:
+                # Columns are still in use; the mapping goes when they do
+                pass
+            self._closer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.rows
+
+    def column(self, name):
+        """
+        Returns one column (see COLUMNS and TEXT_COLUMNS) without copying it.
+        """
+        info = self._columns[name]
+        start = self._data_start + info["offset"]
+        numpy = optional_module("numpy")
+        if numpy is not None:
+            dtype = numpy.dtype(info["dtype"])
+            return numpy.frombuffer(self._buffer, dtype, info["size"] // dtype.itemsize, start)
+        view = memoryview(self._buffer)[start:start + info["size"]]
+        code = ALL_COLUMNS[name][1]
+        if sys.byteorder == "big" and code != "B":
+            # Not zero-copy: memoryview can't swap bytes
+            values = array(code, view.tobytes())
+            values.byteswap()
+            return memoryview(values)
+        return view.cast(code)
+
+    def text(self, i):
+        offsets = self.column("text_offsets")
+        start = self._data_start + self._columns["text_data"]["offset"]
+        return bytes(self._buffer[start + int(offsets[i]):start + int(offsets[i + 1])]).decode("utf-8")
+
+    def texts(self):
+        """
+        Returns every word's text, in row order.
+        """
+        offsets = self.column("text_offsets")
+        start = self._data_start + self._columns["text_data"]["offset"]
+        data = bytes(self._buffer[start:start + self._columns["text_data"]["size"]])
+        return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(self.rows)]
+
+    def raw(self, name):
+        """
+        Returns a column's little-endian bytes, as stored.
+        """
+        info = self._columns[name]
+        start = self._data_start + info["offset"]
+        return memoryview(self._buffer)[start:start + info["size"]]
+
+
+class WordsConcatWriter:
+    """
+    Streams single-page words results into one words file. Each column
+    is appended to its own spill file next to the output while pages
+    arrive, so memory stays flat; close() lays the columns out one after
+    another.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = 0
+        self._page_table = []
+        self._rows = 0
+        self._text_bytes = 0
+        self._spill_dir = tempfile.mkdtemp(prefix=".words_", dir=os.path.dirname(path) or ".")
+        self._spills = {name: open(os.path.join(self._spill_dir, name), "w+b")
+                        for name in ALL_COLUMNS}
+        self._spills["text_offsets"].write(_le_bytes(array("Q", [0])))
+
+    def add(self, name, result: bytes):
+        page = WordBoxes(result)
+        rows = page.rows
+        for column in COLUMNS:
+            if column == "page":
+                self._spills[column].write(_le_bytes(array("I", [self.pages]) * rows))
+            else:
+                self._spills[column].write(page.raw(column))
+        offsets = array("Q", page.column("text_offsets")[1:])
+        self._spills["text_offsets"].write(
+            _le_bytes(array("Q", (offset + self._text_bytes for offset in offsets))))
+        self._spills["text_data"].write(page.raw("text_data"))
+        self._text_bytes += offsets[-1] if rows else 0
+        info = page.pages[0] if page.pages else {}
+        self._page_table.append({"name": name, "width": info.get("width", 0),
+                                 "height": info.get("height", 0),
+                                 "start": self._rows, "rows": rows})
+        self._rows += rows
+        self.pages += 1
+
+    def close(self):
+        try:
+            sources = {}
+            for name, spill in self._spills.items():
+                sources[name] = (spill, spill.tell())
+                spill.seek(0)
+            with open(self.path, "wb") as f:
+                _write_file(f, self._rows, self._page_table, sources)
+        finally:
+            for spill in self._spills.values():
+                spill.close()
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+        return f"Wrote {self._rows} word(s) from {self.pages} page(s) -> {self.path}"
@@ -0,0 +1,131 @@
+# ocr/writers.py
+"""
+Writers that assemble per-page OCR results into one concatenated output.
+Each writer has add(name, result), called once per page in order, and
+close(), which finishes the file and returns a log message (or None).
+"""
+import io
+import re
+
+from ocr.engine import HOCR_FOOTER
+from ocr.optional import optional_module
+from ocr.wordboxes import WordsConcatWriter
+
+# id='block_1_2' -> page number is the first number after the element type
+_HOCR_ID_RE = re.compile(rb"""(\bid=['"][A-Za-z]+_)\d+""")
+_HOCR_PPAGENO_RE = re.compile(rb"ppageno \d+")
+_HOCR_BODY_RE = re.compile(rb"<body[^>]*>(.*)</body>", re.DOTALL | re.IGNORECASE)
+
+
+def create_concat_writer(output_format, path):
+    """
+    Returns the concatenating writer for an output format.
+    """
+    if output_format == "txt":
+        return TextConcatWriter(path)
+    if output_format == "hocr":
+        return HocrConcatWriter(path)
+    if output_format == "words":
+        return WordsConcatWriter(path)
+    return PdfConcatWriter(path)
+
+
+class TextConcatWriter:
+    """
+    Appends each page's text to the output file as soon as it is OCR'd,
+    so memory stays flat and a crashed run keeps every finished page.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = 0
+        self._file = open(path, "w", encoding="utf-8")
+
+    def add(self, name, result: str):
+        if self.pages:
+            self._file.write("\n")
+        self._file.write(f"--- OCR from {name} ---\n{result}\n")
+        self._file.flush()
+        self.pages += 1
+
+    def close(self):
+        self._file.close()
+        return f"All text combined into: {self.path}"
+
+
+class HocrConcatWriter:
+    """
+    Streams single-page HOCR documents into one multi-page document.
+    The head comes from the first page; each page's ocr_page div is moved
+    into the shared body, with element ids and ppageno renumbered so they
+    stay unique.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = 0
+        self._file = open(path, "wb")
+
+    def add(self, name, result: bytes):
+        match = _HOCR_BODY_RE.search(result)
+        if match is None:
+            raise ValueError(f"No HOCR body found for {name}")
+
+        if self.pages == 0:
+            self._file.write(result[:match.start(1)])
+
+        page_no = self.pages + 1
+        body = _HOCR_ID_RE.sub(lambda m: m.group(1) + str(page_no).encode(), match.group(1))
+        body = _HOCR_PPAGENO_RE.sub(b"ppageno %d" % self.pages, body)
+        self._file.write(body)
+        self._file.flush()
+        self.pages += 1
+
+    def close(self):
+        if self.pages:
+            self._file.write(HOCR_FOOTER.encode("utf-8"))
+        self._file.close()
+        if not self.pages:
+            return None
+        return f"Merged {self.pages} HOCR page(s) -> {self.path}"
+
+
+class PdfConcatWriter:
+    """
+    Assembles single-page searchable PDFs into one multi-page PDF.
+    Pages are appended straight from the in-memory bytes Tesseract
+    returned, so no temp files are written. If PyPDF2 isn't installed,
+    only the last page can be written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pages = 0
+        pypdf2 = optional_module("PyPDF2")
+        self._merger = pypdf2.PdfMerger() if pypdf2 is not None else None
+        self._last_page = None
+
+    def add(self, name, result: bytes):
+        if self._merger is not None:
+            self._merger.append(io.BytesIO(result))
+        else:
+            self._last_page = result
+        self.pages += 1
+
+    def close(self):
+        """
+        Writes the document and returns a log message describing it.
+        """
+        if self._merger is None:
+            if self._last_page is None:
+                return None
+            with open(self.path, "wb") as f:
+                f.write(self._last_page)
+            return f"No PyPDF2 installed. Wrote last PDF only -> {self.path}"
+
+        try:
+            if self.pages:
+                self._merger.write(self.path)
+        finally:
+            self._merger.close()
+        return f"Merged multi-page PDF -> {self.path}" if self.pages else None
@@ -0,0 +1,80 @@
+# tests/test_pdf_utils.py
+import io
+
+import pytest
+
+PyPDF2 = pytest.importorskip("PyPDF2")
+
+from ocr.pdf_utils import page_text_layer  # noqa: E402
+
+LETTER = (612, 792)
+STAMP = "CONFIDENTIAL - BATES ABC000123 - Page 3 of 12"
+BODY = ("The quick brown fox jumps over the lazy dog while the scanner hums along. " * 40)
+
+
+def make_pdf(content, image=True):
+    """
+    Builds a one-page letter-size PDF drawing `content`, with a 1x1 gray
+    image as /Im0 and Helvetica as /F1.
+    """
+    resources = "/Font << /F1 4 0 R >>" + (" /XObject << /Im0 5 0 R >>" if image else "")
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {LETTER[0]} {LETTER[1]}] "
+        f"/Resources << {resources} >> /Contents 6 0 R >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        "<< /Type /XObject /Subtype /Image /Width 1 /Height 1 /ColorSpace /DeviceGray "
+        "/BitsPerComponent 8 /Length 1 >>\nstream\n\x80\nendstream",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+              f"startxref\n{xref}\n%%EOF\n".encode())
+    out.seek(0)
+    return PyPDF2.PdfReader(out)
+
+
+def text(string, mode=0, size=8):
+    return f"BT /F1 {size} Tf {mode} Tr 20 20 Td ({string}) Tj ET"
+
+
+def full_page_scan(scale=1.0):
+    width, height = LETTER[0] * scale, LETTER[1] * scale
+    return f"q {width} 0 0 {height} 0 0 cm /Im0 Do Q"
+
+
+def test_scan_with_stamp_is_ocrd():
+    reader = make_pdf(full_page_scan() + "\n" + text(STAMP))
+    assert page_text_layer(reader, 0) is None
+
+
+def test_scan_with_stamp_in_nested_state_is_ocrd():
+    # The image's scale comes from two stacked transformations
+    content = "q 2 0 0 2 0 0 cm " + full_page_scan(0.5) + " Q\n" + text(STAMP)
+    assert page_text_layer(make_pdf(content), 0) is None
+
+
+def test_ocrd_scan_keeps_its_text_layer():
+    reader = make_pdf(full_page_scan() + "\n" + text(BODY, mode=3))
+    assert "quick brown fox" in page_text_layer(reader, 0)
+
+
+def test_born_digital_page_keeps_its_text_layer():
+    reader = make_pdf(text(STAMP, size=12), image=False)
+    assert "BATES" in page_text_layer(reader, 0)
+
+
+def test_small_logo_is_not_a_scan():
+    logo = "q 72 0 0 72 500 700 cm /Im0 Do Q"
+    reader = make_pdf(logo + "\n" + text(STAMP, size=12))
+    assert "BATES" in page_text_layer(reader, 0)